@@ -4,13 +4,23 @@ import plotly.express as px
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
+import math
+from fraud_detection.streaming.geo import DEFAULT_BBOX, grid_cells, points_in_bbox, within_bbox
 
 # === Load environment variables ===
 load_dotenv()
-mongo_uri = os.getenv("MONGO_URI")
-client = MongoClient(mongo_uri)
-db = client["txn_db"]
-collection = db["fraud_alerts"]
+
+# === MongoDB (one client per server process, not one per rerun) ===
+@st.cache_resource
+def get_database():
+    client = MongoClient(os.getenv("MONGO_URI"))
+    return client["txn_db"]
+
+collection = get_database()["fraud_alerts"]
+# Maintained incrementally by the streaming consumer (fraud_detection/streaming/rollups.py)
+rollups = get_database()["rollups"]
+# Above this many frauds in the map viewport, show grid cells instead of individual transactions
+MAP_POINT_LIMIT = 2000
 
 # === Streamlit Config ===
 st.set_page_config(page_title="🚨 Fraud Detection Dashboard", layout="wide")
@@ -26,6 +36,46 @@ def load_data(limit=1000):
         df.drop(columns=["_id"], inplace=True)
     return df
 
+@st.cache_data(ttl=30)
+def load_dimension_values(dimension):
+    return sorted(v for v in rollups.distinct("value", {"granularity": "hour", "dimension": dimension}) if v is not None)
+
+@st.cache_data(ttl=30)
+def load_rollup(group_by, dimension="all", values=None):
+    """
+    Sum hourly rollups over all time, grouped by hour of day or by dimension value: O(buckets), not O(transactions).
+    """
+    match = {"granularity": "hour", "dimension": dimension}
+    if values:
+        match["value"] = {"$in": list(values)}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"$hour": "$bucket"} if group_by == "hour" else f"${group_by}",
+            "fraud_count": {"$sum": "$fraud_count"},
+            "non_fraud_count": {"$sum": "$non_fraud_count"},
+            "fraud_amt_sum": {"$sum": "$fraud_amt_sum"},
+            "fraud_amt_max": {"$max": "$fraud_amt_max"},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    df = pd.DataFrame(list(rollups.aggregate(pipeline)))
+    return df.rename(columns={"_id": group_by}).fillna(0) if not df.empty else df
+
+@st.cache_data(ttl=30)
+def load_viewport_count(bbox, match):
+    # Stops counting past the limit, so a wide viewport costs no more than a narrow one
+    return collection.count_documents(within_bbox(bbox, match), limit=MAP_POINT_LIMIT + 1)
+
+@st.cache_data(ttl=30)
+def load_viewport_grid(bbox, match):
+    return grid_cells(collection, bbox, match)
+
+@st.cache_data(ttl=30)
+def load_viewport_points(bbox, match):
+    projection = {"_id": 0, "lat": 1, "long": 1, "amt": 1, "city": 1, "state": 1, "trans_date_trans_time": 1}
+    return points_in_bbox(collection, bbox, match, limit=MAP_POINT_LIMIT, projection=projection)
+
 df = load_data()
 
 if df.empty:
@@ -35,9 +85,9 @@ if df.empty:
 # === Sidebar Filters ===
 with st.sidebar:
     st.header("🔍 Filters")
-    selected_category = st.multiselect("Category", df["category"].unique())
-    selected_gender = st.multiselect("Gender", df["gender"].unique())
-    selected_state = st.multiselect("State", df["state"].unique())
+    selected_category = st.multiselect("Category", load_dimension_values("category"))
+    selected_gender = st.multiselect("Gender", load_dimension_values("gender"))
+    selected_state = st.multiselect("State", load_dimension_values("state"))
     refresh = st.checkbox("Auto-refresh every 30s", value=True)
 
 # === Filter Logic ===
@@ -49,16 +99,27 @@ if selected_gender:
 if selected_state:
     filtered_df = filtered_df[filtered_df["state"].isin(selected_state)]
 
+# Rollups are kept per dimension, so all-time figures honour one filter at a time (the first one set)
+scope_dimension, scope_values = next(
+    ((dimension, values) for dimension, values in
+     (("category", selected_category), ("state", selected_state), ("gender", selected_gender)) if values),
+    ("all", None))
+totals = load_rollup("dimension", scope_dimension, tuple(scope_values or ()))
+
 # === KPI Metrics ===
 st.markdown("### 📊 Key Fraud Metrics")
-col1, col2, col3 = st.columns(3)
-col1.metric("Total Fraud Cases", len(filtered_df))
-col2.metric("Avg. Fraud Amount", f"${filtered_df['amt'].mean():,.2f}")
-col3.metric("Max Amount", f"${filtered_df['amt'].max():,.2f}")
+col1, col2, col3, col4 = st.columns(4)
+fraud_count = int(totals["fraud_count"].sum()) if not totals.empty else 0
+scored_count = fraud_count + (int(totals["non_fraud_count"].sum()) if not totals.empty else 0)
+col1.metric("Total Fraud Cases", f"{fraud_count:,}")
+col2.metric("Fraud Rate", f"{fraud_count / scored_count:.3%}" if scored_count else "n/a")
+col3.metric("Avg. Fraud Amount", f"${totals['fraud_amt_sum'].sum() / fraud_count:,.2f}" if fraud_count else "n/a")
+col4.metric("Max Amount", f"${totals['fraud_amt_max'].max():,.2f}" if fraud_count else "n/a")
+if scope_dimension != "all":
+    st.caption(f"All-time figures filtered by {scope_dimension}; map and table use every filter.")
 
 # === Time Processing ===
 filtered_df["trans_date_trans_time"] = pd.to_datetime(filtered_df["trans_date_trans_time"])
-filtered_df["hour"] = filtered_df["trans_date_trans_time"].dt.hour
 
 # === Tabs ===
 tab1, tab2, tab3 = st.tabs(["📈 Trends", "🗺️ Fraud Map", "📋 Recent Transactions"])
@@ -66,36 +127,50 @@ tab1, tab2, tab3 = st.tabs(["📈 Trends", "🗺️ Fraud Map", "📋 Recent Tra
 # === Trend Tab ===
 with tab1:
     st.subheader("📈 Fraud Trend by Hour")
-    hourly_counts = filtered_df.groupby("hour").size().reset_index(name="fraud_count")
-    fig_line = px.line(hourly_counts, x="hour", y="fraud_count", markers=True,
-                       labels={"hour": "Hour of Day", "fraud_count": "Fraud Count"})
-    st.plotly_chart(fig_line, use_container_width=True)
+    hourly_counts = load_rollup("hour", scope_dimension, tuple(scope_values or ()))
+    if not hourly_counts.empty:
+        fig_line = px.line(hourly_counts, x="hour", y="fraud_count", markers=True,
+                           labels={"hour": "Hour of Day", "fraud_count": "Fraud Count"})
+        st.plotly_chart(fig_line, use_container_width=True)
 
     st.subheader("👥 Gender Split")
-    gender_counts = filtered_df["gender"].value_counts().reset_index()
-    gender_counts.columns = ["gender", "count"]
-    fig_pie = px.pie(gender_counts, values="count", names="gender", title="Gender Distribution")
-    st.plotly_chart(fig_pie, use_container_width=True)
+    gender_counts = load_rollup("value", "gender", tuple(selected_gender))
+    if not gender_counts.empty:
+        gender_counts = gender_counts.rename(columns={"value": "gender", "fraud_count": "count"})
+        fig_pie = px.pie(gender_counts, values="count", names="gender", title="Gender Distribution")
+        st.plotly_chart(fig_pie, use_container_width=True)
 
 # === Map Tab ===
 with tab2:
     st.subheader("🗺️ Fraud Location Map")
-    if {"lat", "long"}.issubset(filtered_df.columns):
-        fig_map = px.scatter_mapbox(
-            filtered_df,
-            lat="lat",
-            lon="long",
-            color="amt",
-            size="amt",
-            hover_data=["city", "state", "amt", "trans_date_trans_time"],
-            zoom=3,
-            height=500,
-            color_continuous_scale="Reds"
-        )
+    # Viewport; frauds inside it are binned into a grid server side, or listed individually once few enough
+    lon_col, lat_col = st.columns(2)
+    min_lon, max_lon = lon_col.slider("Longitude", -180.0, 180.0, (DEFAULT_BBOX[0], DEFAULT_BBOX[2]), step=0.5)
+    min_lat, max_lat = lat_col.slider("Latitude", -90.0, 90.0, (DEFAULT_BBOX[1], DEFAULT_BBOX[3]), step=0.5)
+    bbox = (min_lon, min_lat, max_lon, max_lat)
+    match = {field: {"$in": values} for field, values in
+             (("category", selected_category), ("gender", selected_gender), ("state", selected_state)) if values}
+
+    span = max(max_lon - min_lon, max_lat - min_lat, 0.01)
+    map_view = dict(zoom=max(0.0, math.log2(360 / span) - 0.5), height=500,
+                    center={"lat": (min_lat + max_lat) / 2, "lon": (min_lon + max_lon) / 2})
+    in_view = load_viewport_count(bbox, match)
+    if in_view <= MAP_POINT_LIMIT:
+        points = pd.DataFrame(load_viewport_points(bbox, match))
+        st.caption(f"{in_view:,} frauds in view")
+        fig_map = px.scatter_mapbox(points, lat="lat", lon="long", color="amt", size="amt",
+                                    hover_data=["city", "state", "amt", "trans_date_trans_time"],
+                                    color_continuous_scale="Reds", **map_view) if not points.empty else None
+    else:
+        cells = pd.DataFrame(load_viewport_grid(bbox, match))
+        cells["avg_amt"] = cells["amt_sum"] / cells["count"]
+        fig_map = px.scatter_mapbox(cells, lat="lat", lon="lon", size="count", color="avg_amt",
+                                    hover_data={"count": True, "avg_amt": ":.2f", "amt_max": ":.2f"},
+                                    color_continuous_scale="Reds", **map_view)
+        st.caption(f"{int(cells['count'].sum()):,} frauds in view; zoom in below {MAP_POINT_LIMIT:,} to see individual transactions")
+    if fig_map is not None:
         fig_map.update_layout(mapbox_style="open-street-map")
         st.plotly_chart(fig_map, use_container_width=True)
-    else:
-        st.error("Latitude and Longitude data missing!")
 
 # === Transactions Tab ===
 with tab3:
@@ -0,0 +1,139 @@
+"""
+Async consumer vs the blocking consumer loop on the offline replay harness.
+
+Both paths score the same records with the trained model; the sink sleeps for --write-latency-ms per
+document to stand in for a MongoDB round trip, which is where overlapping in-flight writes pays off.
+Needs the training artifacts (model + vocabulary); run from the repository root.
+
+    python benchmarks/async_vs_sync.py --limit 5000 --write-latency-ms 2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.config.configuration import get_configuration_manager  # noqa: E402
+from fraud_detection.streaming.async_consumer import AsyncConsumer  # noqa: E402
+from fraud_detection.streaming.metrics import StreamingMetrics  # noqa: E402
+from fraud_detection.streaming.replay import ReplayEngine  # noqa: E402
+from fraud_detection.streaming.scorer import FraudScorer  # noqa: E402
+from fraud_detection.streaming.sources import ReplaySource, read_csv_records  # noqa: E402
+
+
+class LatencySink:
+    """
+    Blocking sink that takes `latency` seconds per write.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.written = 0
+
+    def write(self, txn: dict):
+        time.sleep(self.latency)
+        self.written += 1
+
+    def write_many(self, txns: list):
+        # One bulk round trip
+        time.sleep(self.latency)
+        self.written += len(txns)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncLatencySink:
+    """
+    Async sink that awaits `latency` seconds per write.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.written = 0
+
+    async def write(self, txn: dict):
+        await asyncio.sleep(self.latency)
+        self.written += 1
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def summarize(metrics: StreamingMetrics, elapsed: float, written: int) -> dict:
+    return {
+        "written": written,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(written / elapsed, 2) if elapsed > 0 else None,
+        "processing_p50_ms": round(metrics.processing.quantile(0.5) * 1000, 3),
+        "processing_p99_ms": round(metrics.processing.quantile(0.99) * 1000, 3),
+        "score_p50_ms": round(metrics.score.quantile(0.5) * 1000, 3),
+    }
+
+
+def run_sync(scorer, records, latency):
+    sink = LatencySink(latency)
+    engine = ReplayEngine(scorer, sink)
+    start = time.perf_counter()
+    engine.run(ReplaySource((dict(r) for r in records)))
+    return summarize(engine.metrics, time.perf_counter() - start, sink.written)
+
+
+def run_async(scorer, records, latency, max_in_flight, score_workers, score_executor):
+    sink = AsyncLatencySink(latency)
+    metrics = StreamingMetrics()
+    consumer = AsyncConsumer(scorer, sink, metrics=metrics, max_in_flight=max_in_flight,
+                             score_workers=score_workers, score_executor=score_executor)
+    start = time.perf_counter()
+    asyncio.run(consumer.run(ReplaySource((dict(r) for r in records)), poll_timeout=0))
+    return summarize(metrics, time.perf_counter() - start, sink.written)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asyncio consumer against the blocking loop")
+    parser.add_argument("--path", help="Transactions CSV (defaults to clean_data.csv)")
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--write-latency-ms", type=float, default=2.0)
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--score-workers", type=int, default=4)
+    parser.add_argument("--score-executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    app_config = get_configuration_manager()
+    path = args.path or os.path.join(app_config.get_data_validation_config().clean_data_dir, "clean_data.csv")
+    scorer = FraudScorer.from_config(app_config)
+
+    records = []
+    for record in read_csv_records(path):
+        records.append(record)
+        if len(records) >= args.limit:
+            break
+
+    latency = args.write_latency_ms / 1000
+    results = {
+        "records": len(records),
+        "write_latency_ms": args.write_latency_ms,
+        "sync": run_sync(scorer, records, latency),
+        "async": run_async(scorer, records, latency, args.max_in_flight, args.score_workers, args.score_executor),
+    }
+    results["speedup"] = round(results["async"]["throughput_per_s"] / results["sync"]["throughput_per_s"], 2)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
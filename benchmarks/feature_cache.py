@@ -0,0 +1,70 @@
+"""
+Per-event cost of the streaming feature transformer and the load generator, with and without repeat cards.
+
+"repeat" traffic draws from a pool of --cards cardholders who mostly shop at their usual merchants, so the
+per-card caches hit; "unique" traffic creates a new card for every event, i.e. every lookup misses.
+
+    python benchmarks/feature_cache.py --events 20000 --cards 1000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+from fraud_detection.data_generator.producer import CardPool, generate_transaction  # noqa: E402
+from fraud_detection.streaming.feature_transformer import transform_transaction, CATEGORICAL_FEATURES  # noqa: E402
+from fraud_detection.streaming.metrics import CACHES, StreamingMetrics  # noqa: E402
+from fraud_detection.utils.vocabulary import CategoricalVocabulary  # noqa: E402
+
+
+def generate(card_pool: CardPool, events: int):
+    start = time.perf_counter()
+    txns = [generate_transaction(card_pool) for _ in range(events)]
+    return txns, (time.perf_counter() - start) / events * 1e6
+
+
+def transform_all(txns, vocabulary):
+    for cached_function in CACHES.values():
+        cached_function.cache_clear()
+    start = time.perf_counter()
+    for txn in txns:
+        transform_transaction(txn, vocabulary)
+    per_event_us = (time.perf_counter() - start) / len(txns) * 1e6
+    return per_event_us, StreamingMetrics().cache_hit_rates()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot-path caching in the feature transformer")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    repeat_txns, repeat_generate_us = generate(CardPool(size=args.cards, merchants=args.cards), args.events)
+    unique_txns, unique_generate_us = generate(CardPool(size=1, new_card_rate=1.0), args.events)
+
+    vocabulary = CategoricalVocabulary.fit(pd.DataFrame(repeat_txns + unique_txns), CATEGORICAL_FEATURES)
+
+    results = {"events": args.events, "cards": args.cards}
+    for name, txns, generate_us in (("repeat", repeat_txns, repeat_generate_us),
+                                    ("unique", unique_txns, unique_generate_us)):
+        transform_us, hit_rates = transform_all(txns, vocabulary)
+        results[name] = {
+            "generate_us_per_event": round(generate_us, 1),
+            "transform_us_per_event": round(transform_us, 1),
+            "cache_hit_rate": {cache: round(rate, 4) for cache, rate in hit_rates.items()},
+        }
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
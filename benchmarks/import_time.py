@@ -0,0 +1,91 @@
+"""
+Cold-start import cost of each entry point, measured with `python -X importtime`.
+
+Each module is imported in a fresh interpreter (run from the repository root) `--runs` times;
+the median cumulative import time is reported together with the heaviest imports it pulled in.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 5 --output artifacts/reports/benchmarks/import_time.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    "main": "main",
+    "training_pipeline": "fraud_detection.pipeline.training_pipeline",
+    "stage_02_feature_engineering": "fraud_detection.components.stage_02_feature_engineering",
+    "stage_04_model_evaluation": "fraud_detection.components.stage_04_model_evaluation",
+    "consumer": "fraud_detection.streaming.consumer",
+    "replay": "fraud_detection.streaming.replay",
+    "producer": "fraud_detection.data_generator.producer",
+    "alerting": "fraud_detection.utils.alerting",
+}
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Parse `-X importtime` output into {module: (self_us, cumulative_us)}.
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(module: str, runs: int, top: int) -> dict:
+    cumulative = []
+    heaviest = {}
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=REPO_ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {"module": module, "error": result.stderr.strip().splitlines()[-1]}
+        timings = parse_importtime(result.stderr)
+        cumulative.append(timings[module][1])
+        for name, (_, cum) in timings.items():
+            # Only top-level packages, so nested submodules are not counted twice
+            if "." not in name and name != module:
+                heaviest[name] = max(heaviest.get(name, 0), cum)
+
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(cumulative) / 1000, 1),
+        "min_ms": round(min(cumulative) / 1000, 1),
+        "heaviest_ms": {name: round(us / 1000, 1)
+                        for name, us in sorted(heaviest.items(), key=lambda kv: -kv[1])[:top]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark of each entry point")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Heaviest top-level imports to list per entry point")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {name: measure(module, args.runs, args.top) for name, module in ENTRY_POINTS.items()}
+
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<30} ERROR {result['error']}")
+            continue
+        heaviest = ", ".join(f"{mod} {ms}ms" for mod, ms in result["heaviest_ms"].items())
+        print(f"{name:<30} {result['median_ms']:>8.1f} ms   [{heaviest}]")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Memory and lookup cost of the Bloom filters used for transaction-id dedup and watchlists,
+against a plain Python set holding the same keys.
+
+    python benchmarks/membership.py --keys 1000000 --error-rates 0.01 0.001 0.0001
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.utils.bloom_filter import BloomFilter  # noqa: E402
+
+
+def set_bytes(keys: list) -> int:
+    """
+    Memory a Python set of the keys costs, including the key strings themselves.
+    """
+    tracemalloc.start()
+    exact = set(str(key) for key in keys)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del exact
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Bloom filter memory and lookups")
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--probes", type=int, default=200_000, help="Unseen keys probed to measure the false-positive rate")
+    parser.add_argument("--error-rates", type=float, nargs="+", default=[0.01, 0.001, 0.0001])
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    keys = [str(uuid.uuid4()) for _ in range(args.keys)]
+    probes = [str(uuid.uuid4()) for _ in range(args.probes)]
+    per_million = 1_000_000 / args.keys
+
+    results = {"keys": args.keys, "python_set_mib_per_million_keys": round(set_bytes(keys) * per_million / 2 ** 20, 2),
+               "filters": {}}
+    for error_rate in args.error_rates:
+        bloom = BloomFilter(args.keys, error_rate)
+
+        start = time.perf_counter()
+        bloom.update(keys)
+        insert_us = (time.perf_counter() - start) / args.keys * 1e6
+
+        start = time.perf_counter()
+        false_positives = sum(probe in bloom for probe in probes)
+        lookup_us = (time.perf_counter() - start) / args.probes * 1e6
+
+        results["filters"][str(error_rate)] = {
+            "mib_per_million_keys": round(bloom.memory_bytes * per_million / 2 ** 20, 3),
+            "hashes": bloom.num_hashes,
+            "measured_error_rate": round(false_positives / args.probes, 6),
+            "insert_us": round(insert_us, 2),
+            "lookup_us": round(lookup_us, 2),
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Memory of N scoring workers that each load the model themselves vs N workers forked from a parent that loaded it.
+
+Every worker scores --batches batches of --batch-size generated transactions (so whatever scoring allocates is
+counted too), then its memory is read from /proc: RSS counts shared pages in full, PSS divides them among the
+processes sharing them, USS is what the worker alone holds. Linux only.
+Needs the training artifacts (model + vocabulary); run from the repository root.
+
+    python benchmarks/prefork_memory.py --workers 4
+"""
+import gc
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.config.configuration import get_configuration_manager  # noqa: E402
+from fraud_detection.data_generator.producer import CardPool, generate_transaction  # noqa: E402
+from fraud_detection.streaming.consumer import load_shared_artifacts  # noqa: E402
+from fraud_detection.streaming.prefork import memory_usage, warm_up  # noqa: E402
+
+_SHARED = {}
+
+
+def score_and_wait(txns: list, batches: int, ready, done):
+    shared = _SHARED.get("artifacts") or load_shared_artifacts(get_configuration_manager())
+    for _ in range(batches):
+        features_df, _ = shared.scorer.transform_many(txns)
+        shared.scorer.score(features_df)
+    ready.put(os.getpid())
+    done.wait()
+
+
+def run(mode: str, workers: int, txns: list, batches: int) -> dict:
+    """
+    mode: "independent" (spawned workers, each loading the artifacts) or "prefork" (forked after loading them here).
+    """
+    context = multiprocessing.get_context("spawn" if mode == "independent" else "fork")
+    if mode == "prefork":
+        _SHARED["artifacts"] = load_shared_artifacts(get_configuration_manager())
+        warm_up(_SHARED["artifacts"])
+        gc.collect()
+        gc.freeze()
+    ready, done = context.Queue(), context.Event()
+    processes = [context.Process(target=score_and_wait, args=(txns, batches, ready, done)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    pids = [ready.get() for _ in processes]
+    usage = [memory_usage(pid) for pid in pids]
+    parent = memory_usage() if mode == "prefork" else None
+    done.set()
+    for process in processes:
+        process.join()
+    _SHARED.clear()
+    gc.unfreeze()
+
+    result = {"mode": mode, "workers": workers}
+    for key in ("rss_mb", "pss_mb", "uss_mb"):
+        result[f"worker_{key}"] = round(sum(u[key] for u in usage) / workers, 1)
+    # The prefork parent holds the one loaded copy the workers share, so it counts towards the group
+    result["parent_pss_mb"] = parent["pss_mb"] if parent else 0.0
+    result["group_pss_mb"] = round(sum(u["pss_mb"] for u in usage) + result["parent_pss_mb"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory: independent loading vs pre-fork sharing")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if memory_usage() is None or "pss_mb" not in memory_usage():
+        sys.exit("Needs /proc/<pid>/smaps_rollup (Linux)")
+    card_pool = CardPool(size=1000, merchants=1000)
+    txns = [generate_transaction(card_pool) for _ in range(args.batch_size)]
+
+    results = []
+    for mode in ("independent", "prefork"):
+        result = run(mode, args.workers, txns, args.batches)
+        print(f"{mode:>12}: per worker RSS {result['worker_rss_mb']:>6}MB  PSS {result['worker_pss_mb']:>6}MB  "
+              f"USS {result['worker_uss_mb']:>6}MB  parent PSS {result['parent_pss_mb']:>6}MB  group PSS {result['group_pss_mb']:>7}MB")
+        results.append(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
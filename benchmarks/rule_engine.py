@@ -0,0 +1,80 @@
+"""
+Rule engine evaluation cost per transaction for growing rule sets and micro-batch sizes.
+
+Rules are a synthetic mix of global and per-category thresholds, card / merchant lists and an
+impossible-travel rule; transactions come from the load generator's card pool.
+
+    python benchmarks/rule_engine.py --rules 10 1000 10000 --batch-sizes 1 100 1000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.data_generator.producer import CardPool, categories, generate_transaction  # noqa: E402
+from fraud_detection.streaming.rule_engine import RuleEngine  # noqa: E402
+
+ACTIONS = ("flag", "flag", "flag", "allow", "block")
+
+
+def synthetic_rules(count: int, txns: list, rng: random.Random) -> list:
+    rules = [{"name": "impossible_travel", "field": "travel_speed_kmh", "op": ">", "value": 1000, "action": "flag"}]
+    cards = [txn["cc_num"] for txn in txns]
+    merchants = [txn["merchant"] for txn in txns]
+    for i in range(count - 1):
+        kind = rng.random()
+        rule = {"name": f"rule_{i}", "action": rng.choice(ACTIONS)}
+        if kind < 0.1:
+            field, pool = rng.choice((("cc_num", cards), ("merchant", merchants)))
+            rule.update(field=field, op="in", values=rng.sample(pool, 100))
+        else:
+            rule.update(field=rng.choice(("amt", "amt", "city_pop")), op=rng.choice((">", ">=", "<", "<=")),
+                        value=round(rng.uniform(0, 30000), 2))
+            if kind < 0.6:
+                rule["where"] = {"category": rng.choice(categories)}
+        rules.append(rule)
+    return rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rule engine evaluation")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    card_pool = CardPool(size=2000)
+    txns = [generate_transaction(card_pool) for _ in range(args.events)]
+
+    results = {"events": args.events, "us_per_transaction": {}, "compile_ms": {}, "matched_share": {}}
+    for rule_count in args.rules:
+        rules = synthetic_rules(rule_count, txns, rng)
+        start = time.perf_counter()
+        RuleEngine(rules)
+        results["compile_ms"][rule_count] = round((time.perf_counter() - start) * 1000, 1)
+
+        for batch_size in args.batch_sizes:
+            engine = RuleEngine(rules)
+            matched = 0
+            start = time.perf_counter()
+            for i in range(0, len(txns), batch_size):
+                matched += sum(decision is not None for decision in engine.evaluate(txns[i:i + batch_size]))
+            per_txn_us = (time.perf_counter() - start) / len(txns) * 1e6
+            results["us_per_transaction"][f"{rule_count} rules, batch {batch_size}"] = round(per_txn_us, 2)
+            results["matched_share"][rule_count] = round(matched / len(txns), 4)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Load test of the synchronous scoring API: latency percentiles and throughput at increasing concurrency.
+
+Each level runs --concurrency clients in a closed loop (a client sends its next request as soon as it has the
+previous answer), on kept-alive HTTP/1.1 connections. By default the API is started locally in a subprocess,
+once with dynamic batching as configured and, with --compare-unbatched, once more with --max-batch-size 1;
+--url targets an API that is already running. Mean batch size comes from the server's /metrics.
+Needs the training artifacts (model + vocabulary); run from the repository root. Without MONGO_URI the local API
+cannot load the rules' watchlists and is started with --no-rules.
+
+    python benchmarks/scoring_api.py --concurrency 1 4 16 64 --requests 2000
+    python benchmarks/scoring_api.py --compare-unbatched --output reports/scoring_api.json
+    python benchmarks/scoring_api.py --url http://127.0.0.1:8000
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+from collections import Counter
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.data_generator.producer import CardPool, generate_transaction  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, extra_args: list, timeout: float = 120.0) -> subprocess.Popen:
+    """
+    Run the API in a subprocess and wait for /ready.
+    """
+    if not os.getenv("MONGO_URI"):
+        extra_args = extra_args + ["--no-rules"]
+    process = subprocess.Popen([sys.executable, "-m", "fraud_detection.streaming.scoring_api", "--port", str(port)]
+                               + extra_args, env=dict(os.environ, PYTHONPATH=ROOT), stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Scoring API exited with status {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/ready")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Scoring API not ready after {timeout}s")
+
+
+def batch_totals(host: str, port: int) -> tuple:
+    """
+    (transactions scored in batches, batches) so far, from the server's fraud_api_batch_size histogram.
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.request("GET", "/metrics")
+    totals = {}
+    for line in connection.getresponse().read().decode().splitlines():
+        if line.startswith(("fraud_api_batch_size_sum ", "fraud_api_batch_size_count ")):
+            name, value = line.split()
+            totals[name] = float(value)
+    return totals.get("fraud_api_batch_size_sum", 0.0), totals.get("fraud_api_batch_size_count", 0.0)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_level(host: str, port: int, bodies: list, concurrency: int, requests: int) -> dict:
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    next_request = iter(range(requests))
+
+    def client():
+        connection = http.client.HTTPConnection(host, port, timeout=10)
+        own_latencies, own_statuses = [], Counter()
+        while True:
+            with lock:
+                i = next(next_request, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            try:
+                connection.request("POST", "/score", body=bodies[i % len(bodies)],
+                                   headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                own_statuses[response.status] += 1
+            except (OSError, http.client.HTTPException):
+                own_statuses["connection error"] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=10)
+            own_latencies.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            statuses.update(own_statuses)
+
+    batched_before, batches_before = batch_totals(host, port)
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    batched_after, batches_after = batch_totals(host, port)
+
+    latencies.sort()
+    batches = batches_after - batches_before
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "mean_batch_size": round((batched_after - batched_before) / batches, 2) if batches else None,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+def run_all(host: str, port: int, bodies: list, args) -> list:
+    results = []
+    for concurrency in args.concurrency:
+        result = run_level(host, port, bodies, concurrency, args.requests)
+        print(f"  concurrency {concurrency:>4}: {result['throughput_per_s']:>8} req/s  p50 {result['p50_ms']:>7}ms  "
+              f"p99 {result['p99_ms']:>7}ms  batch {result['mean_batch_size']}  {result['statuses']}")
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the scoring API at increasing concurrency")
+    parser.add_argument("--url", help="Running API to test (default: start one locally)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument("--compare-unbatched", action="store_true",
+                        help="Also start the API with --max-batch-size 1 and run the same levels")
+    parser.add_argument("--max-wait-ms", type=float, default=None, help="Batching window of the local API")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    card_pool = CardPool(size=1000, merchants=1000)
+    bodies = [json.dumps(generate_transaction(card_pool)).encode("utf-8") for _ in range(min(args.requests, 5000))]
+
+    runs = {}
+    if args.url:
+        url = urlparse(args.url)
+        print(f"{args.url}:")
+        runs["target"] = run_all(url.hostname, url.port or 80, bodies, args)
+    else:
+        variants = {"batched": []}
+        if args.max_wait_ms is not None:
+            variants["batched"] += ["--max-wait-ms", str(args.max_wait_ms)]
+        if args.compare_unbatched:
+            variants["unbatched"] = ["--max-batch-size", "1"]
+        for name, extra_args in variants.items():
+            port = free_port()
+            process = start_server(port, extra_args)
+            try:
+                print(f"{name}:")
+                runs[name] = run_all("127.0.0.1", port, bodies, args)
+            finally:
+                process.terminate()
+                process.wait()
+
+    results = {"requests_per_level": args.requests, "runs": runs}
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+txn_data wire formats compared: bytes per message (what the broker stores and ships), producer encode and
+consumer decode time, and end-to-end replay throughput when the trained model is available.
+
+"json-stdlib" is the original json.dumps / json.loads payload; "json" uses the fast JSON path of
+streaming.serialization (orjson when installed); "binary" is the schema-versioned WireSchema encoding.
+
+    python benchmarks/serialization.py --events 20000 --replay-limit 5000 --batch-size 100
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.data_generator.producer import CardPool, generate_transaction  # noqa: E402
+from fraud_detection.streaming.serialization import decode, get_serializer  # noqa: E402
+from fraud_detection.streaming.sources import ReplaySource  # noqa: E402
+
+
+class StdlibJsonSerializer:
+    name = "json-stdlib"
+
+    def encode(self, record: dict) -> bytes:
+        return json.dumps(record).encode("utf-8")
+
+    def headers(self, payload: bytes) -> list:
+        return []
+
+
+def per_message_us(function, items: list) -> float:
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return round((time.perf_counter() - start) / len(items) * 1e6, 2)
+
+
+def load_replay_parts():
+    """
+    (scorer, validator) for the replay comparison, or None without a trained model.
+    """
+    try:
+        from fraud_detection.config.configuration import get_configuration_manager
+        from fraud_detection.streaming.consumer import load_validator
+        from fraud_detection.streaming.scorer import FraudScorer
+
+        app_config = get_configuration_manager()
+        return FraudScorer.from_config(app_config), load_validator(app_config, app_config.get_streaming_config())
+    except Exception as e:
+        print(f"Replay comparison skipped, no trained model: {e}", file=sys.stderr)
+        return None
+
+
+def replay_throughput(parts, serializer, records: list, batch_size: int) -> dict:
+    """
+    Messages per second through ReplayEngine (decode -> validate -> rules -> transform -> score).
+    """
+    from fraud_detection.streaming.replay import ReplayEngine
+    from fraud_detection.streaming.sinks import NullSink
+
+    scorer, validator = parts
+    engine = ReplayEngine(scorer, NullSink(), batch_size=batch_size, validator=validator)
+    report = engine.run(ReplaySource((dict(record) for record in records), serializer=serializer))
+    return {"throughput_per_s": report["throughput_per_s"],
+            "decode_and_validate_p50_ms": report.get("stage_latency_ms", {}).get("validate", {}).get("p50")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark txn_data wire formats")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--replay-limit", type=int, default=5000, help="Messages replayed per format (0 to skip)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    card_pool = CardPool(size=2000)
+    records = [generate_transaction(card_pool) for _ in range(args.events)]
+
+    parts = load_replay_parts() if args.replay_limit else None
+    if parts is not None:
+        # Warm the model and the feature caches so the first format is not charged for them
+        replay_throughput(parts, get_serializer("json"), records[:args.replay_limit], args.batch_size)
+
+    results = {"events": args.events, "formats": {}}
+    for serializer in (StdlibJsonSerializer(), get_serializer("json"), get_serializer("binary")):
+        payloads = [serializer.encode(record) for record in records]
+        decoder = json.loads if serializer.name == "json-stdlib" else decode
+        results["formats"][serializer.name] = {
+            "bytes_per_message": round(sum(map(len, payloads)) / len(payloads), 1),
+            "encode_us": per_message_us(serializer.encode, records),
+            "decode_us": per_message_us(decoder, payloads),
+        }
+        if parts is not None:
+            results["formats"][serializer.name]["replay"] = replay_throughput(parts, serializer, records[:args.replay_limit],
+                                                                              args.batch_size)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Schema validation cost next to the scoring it protects: per-message checks on the streaming path,
+column-wise checks on training-size chunks, and (when a trained model is available) the scorer's
+transform + predict for the same micro-batches.
+
+Transactions come from the load generator; --invalid-share of them get one field corrupted.
+
+    python benchmarks/validation.py --events 20000 --batch-sizes 1 100 --chunk-rows 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.data_generator.producer import CardPool, generate_transaction  # noqa: E402
+from fraud_detection.utils.schema_validator import SchemaValidator  # noqa: E402
+
+CORRUPTIONS = (("amt", -5.0), ("amt", "12.50"), ("lat", 123.4), ("gender", "X"), ("dob", "31/12/1990"),
+               ("trans_date_trans_time", None), ("city_pop", 2.5), ("merchant", ""))
+
+
+def corrupt(txns: list, share: float, rng: random.Random) -> list:
+    txns = [dict(txn) for txn in txns]
+    for txn in txns:
+        if rng.random() < share:
+            field, value = rng.choice(CORRUPTIONS)
+            txn[field] = value
+    return txns
+
+
+def load_scorer():
+    try:
+        from fraud_detection.config.configuration import get_configuration_manager
+        from fraud_detection.streaming.scorer import FraudScorer
+        return FraudScorer.from_config(get_configuration_manager())
+    except Exception as e:
+        print(f"Scoring comparison skipped, no trained model: {e}", file=sys.stderr)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark schema validation against scoring")
+    parser.add_argument("--schema", default="schema.yaml")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="Rows per validate_frame() chunk")
+    parser.add_argument("--invalid-share", type=float, default=0.05)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    rng = random.Random(42)
+    card_pool = CardPool(size=2000)
+    txns = corrupt([generate_transaction(card_pool) for _ in range(args.events)], args.invalid_share, rng)
+    validator = SchemaValidator.from_yaml(args.schema)
+    scorer = load_scorer()
+
+    results = {"events": args.events, "rejected_share": None, "validate_us_per_message": {},
+               "score_us_per_message": {}, "validate_frame_us_per_row": None}
+
+    start = time.perf_counter()
+    rejected = sum(bool(reasons) for reasons in validator.validate_records(txns))
+    results["validate_us_per_message"]["scalar"] = round((time.perf_counter() - start) / len(txns) * 1e6, 2)
+    results["rejected_share"] = round(rejected / len(txns), 4)
+
+    valid = [txn for txn in txns if not validator.validate(txn)]
+    for batch_size in args.batch_sizes if scorer is not None else []:
+        start = time.perf_counter()
+        for i in range(0, len(valid), batch_size):
+            features_df, _ = scorer.transform_many(valid[i:i + batch_size])
+            if features_df is not None:
+                scorer.score(features_df)
+        results["score_us_per_message"][f"batch {batch_size}"] = round((time.perf_counter() - start) / len(valid) * 1e6, 2)
+
+    rows = pd.DataFrame(txns * max(1, args.chunk_rows // len(txns)))
+    start = time.perf_counter()
+    validator.validate_frame(rows)
+    results["validate_frame_us_per_row"] = round((time.perf_counter() - start) / len(rows) * 1e6, 3)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
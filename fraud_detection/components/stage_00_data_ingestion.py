@@ -4,17 +4,18 @@ from six.moves import urllib
 import zipfile
 from fraud_detection.logger.log import logging
 from fraud_detection.exception.exception_handler import CustomException
-from fraud_detection.config.configuration import ConfigurationManager
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
 
 
 class DataIngestion:
 
-    def __init__(self, app_config = ConfigurationManager()):
+    def __init__(self, app_config: ConfigurationManager = None):
         """
         DataIngestion Intialization
         data_ingestion_config: DataIngestionConfig 
         """
         try:
+            app_config = app_config or get_configuration_manager()
             logging.info(f"{'='*20}Data Ingestion log started.{'='*20} ")
             self.data_ingestion_config= app_config.get_data_ingestion_config()
         except Exception as e:
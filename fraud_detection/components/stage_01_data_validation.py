@@ -1,18 +1,18 @@
 import os
 import sys
-import ast 
-import pandas as pd
-import pickle
 from fraud_detection.logger.log import logging
-from fraud_detection.config.configuration import ConfigurationManager
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
 from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.utils.schema_validator import SchemaValidator
 
 
 
 class DataValidation:
-    def __init__(self, app_config = ConfigurationManager()):
+    def __init__(self, app_config: ConfigurationManager = None):
         try:
+            app_config = app_config or get_configuration_manager()
             self.data_validation_config= app_config.get_data_validation_config()
+            self.target_column = app_config.get_model_training_config().target_column
         except Exception as e:
             raise CustomException(e, sys) from e
 
@@ -20,19 +20,43 @@ class DataValidation:
     
     def preprocess_data(self):
         try:
-            fraud_transactions = pd.read_csv(self.data_validation_config.credit_card_fraud_transaction_csv_file, sep=",", on_bad_lines='skip', encoding='utf-8', low_memory=False)
-            
-            logging.info(f" Shape of fraud transactions data file: {fraud_transactions.shape}")
-
-            #Here Image URL columns is important for the poster. So, we will keep it
-            fraud_transactions = fraud_transactions[['trans_date_trans_time', 'cc_num', 'merchant', 'category',
-                                                     'amt', 'first', 'last', 'gender', 'street', 'city', 'state', 'zip',
-                                                     'lat', 'long', 'city_pop', 'job', 'dob', 'merch_lat', 'merch_long', 'is_fraud']]
-            
-                        
-            # Saving the cleaned data for feature engineering
+            import pandas as pd
+
+            validator = SchemaValidator.from_yaml(self.data_validation_config.schema_file)
+            clean_data_file = os.path.join(self.data_validation_config.clean_data_dir, 'clean_data.csv')
+            invalid_data_file = self.data_validation_config.invalid_data_file
             os.makedirs(self.data_validation_config.clean_data_dir, exist_ok=True)
-            fraud_transactions.to_csv(os.path.join(self.data_validation_config.clean_data_dir,'clean_data.csv'), index = False)
+
+            # Read and check the ingested file a chunk at a time, so memory stays flat however large it gets
+            chunks = pd.read_csv(self.data_validation_config.credit_card_fraud_transaction_csv_file, sep=",", on_bad_lines='skip',
+                                 encoding='utf-8', low_memory=False, chunksize=self.data_validation_config.chunk_size)
+            total = invalid = 0
+            reason_counts = {}
+            for chunk_number, fraud_transactions in enumerate(chunks):
+                #Here Image URL columns is important for the poster. So, we will keep it
+                fraud_transactions = fraud_transactions[['trans_date_trans_time', 'cc_num', 'merchant', 'category',
+                                                         'amt', 'first', 'last', 'gender', 'street', 'city', 'state', 'zip',
+                                                         'lat', 'long', 'city_pop', 'job', 'dob', 'merch_lat', 'merch_long', 'is_fraud']]
+
+                valid, reasons = validator.validate_frame(fraud_transactions, require=(self.target_column,))
+                first_chunk = chunk_number == 0
+                # Saving the cleaned data for feature engineering
+                # A missing label turns the chunk's target column to float; the valid rows all have one
+                clean = fraud_transactions[valid].astype({self.target_column: int})
+                clean.to_csv(clean_data_file, index=False, mode='w' if first_chunk else 'a', header=first_chunk)
+
+                rejected = fraud_transactions[~valid].assign(validation_errors=["; ".join(reasons[i]) for i in sorted(reasons)])
+                rejected.to_csv(invalid_data_file, index=False, mode='w' if first_chunk else 'a', header=first_chunk)
+                for row_reasons in reasons.values():
+                    for reason in row_reasons:
+                        reason_counts[reason] = reason_counts.get(reason, 0) + 1
+                total += len(fraud_transactions)
+                invalid += len(rejected)
+
+            logging.info(f" Shape of fraud transactions data file: ({total}, 20)")
+            if invalid:
+                top_reasons = sorted(reason_counts.items(), key=lambda item: -item[1])[:10]
+                logging.warning(f"{invalid} of {total} rows failed schema validation and were written to {invalid_data_file}: {top_reasons}")
             logging.info(f"Saved cleaned data to {self.data_validation_config.clean_data_dir}")
 
 
@@ -1,23 +1,32 @@
 import os
 import sys
-import pandas as pd
-import numpy as np
 from fraud_detection.logger.log import logging
 from fraud_detection.exception.exception_handler import CustomException
-from fraud_detection.config.configuration import ConfigurationManager
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
 from fraud_detection.utils.util import read_yaml_file
-from geopy.distance import geodesic
+from fraud_detection.utils.feature_profile import FeatureProfile
+from fraud_detection.utils.vocabulary import CategoricalVocabulary
+
+# Raw columns that are not model features once the engineered ones are derived
+DROP_COLUMNS = ['trans_date_trans_time', 'cc_num', 'merchant', 'amt',
+                'first', 'last', 'street', 'city', 'state', 'zip', 'dob']
+
+# The only columns distance_km reads
+COORDINATE_COLUMNS = ['lat', 'long', 'merch_lat', 'merch_long']
 
 class FeatureEngineering:
 
-    def __init__(self, app_config=ConfigurationManager()):
+    def __init__(self, app_config: ConfigurationManager = None):
         """
         Feature Engineering Initialization
         app_config: ConfigurationManager
         """
         try:
+            app_config = app_config or get_configuration_manager()
             self.feature_engineering_config = app_config.get_feature_engineering_config()
             self.data_validation_config = app_config.get_data_validation_config()
+            self.drift_config = app_config.get_drift_config()
+            self.target_column = app_config.get_model_training_config().target_column
             logging.info(f"{'='*20}Feature Engineering log started.{'='*20} ")
         except Exception as e:
             raise CustomException(e, sys) from e
@@ -40,12 +49,18 @@ class FeatureEngineering:
         
     def convert_data_types(self, df):
         """
-        Convert data types to appropriate types.
+        Convert categorical columns to compact integer codes using a persisted vocabulary.
+        The vocabulary is saved next to the engineered data so serving encodes values the same way.
         """
         try:
-            # Convert categorical variables to categorical type
-            categorical_cols = ['category', 'job', 'merchant', 'gender']
-            df[categorical_cols] = df[categorical_cols].astype('category')
+            categorical_cols = self.feature_engineering_config.categorical_columns
+            vocabulary = CategoricalVocabulary.fit(df, categorical_cols,
+                                                   min_count=self.feature_engineering_config.min_category_count)
+            vocabulary.save(self.feature_engineering_config.vocabulary_file)
+            logging.info(f"Saved categorical vocabulary to: {self.feature_engineering_config.vocabulary_file} "
+                         f"({ {col: len(values) for col, values in vocabulary.vocabularies.items()} })")
+
+            df = vocabulary.encode_frame(df)
             
             logging.info("Data types have been converted.")
             return df
@@ -58,7 +73,9 @@ class FeatureEngineering:
         Create new features.
         """
         try:
-            
+            import numpy as np
+            import pandas as pd
+
             # Step 1: Ensure datetime types
             df['trans_date_trans_time'] = pd.to_datetime(df['trans_date_trans_time'])
             df['dob'] = pd.to_datetime(df['dob'], errors='coerce')
@@ -87,17 +104,29 @@ class FeatureEngineering:
         except Exception as e:
             raise CustomException(e, sys) from e
         
-    def calculate_distance(self, df):
+    def distance_km(self, coordinates):
         """
-        Calculate distance between customer and merchant locations.
+        Customer to merchant distance of every row, from the COORDINATE_COLUMNS frame.
         """
         try:
+            from geopy.distance import geodesic
+
             def haversine_distance(row):
                 cust_loc = (row['lat'], row['long'])
                 merch_loc = (row['merch_lat'], row['merch_long'])
                 return geodesic(cust_loc, merch_loc).km
-            
-            df['distance_km'] = df.apply(haversine_distance, axis=1)
+
+            return coordinates.apply(haversine_distance, axis=1)
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def calculate_distance(self, df):
+        """
+        Calculate distance between customer and merchant locations.
+        """
+        try:
+            df['distance_km'] = self.distance_km(df[COORDINATE_COLUMNS])
             
             logging.info("Distance between customer and merchant locations has been calculated.")
             return df
@@ -105,15 +134,68 @@ class FeatureEngineering:
         except Exception as e:
             raise CustomException(e, sys) from e
         
+    def engineer_features(self, df, vocabulary: CategoricalVocabulary):
+        """
+        The same steps for new rows, encoded with an existing vocabulary instead of fitting one
+        (so the codes match the model being refreshed).
+        """
+        try:
+            df = self.handle_missing_values(df)
+            df = vocabulary.encode_frame(df)
+            df = self.create_new_features(df)
+            df = self.calculate_distance(df)
+            return df.drop(columns=DROP_COLUMNS)
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def load_clean_data(self):
+        """
+        Load the validated data.
+        """
+        try:
+            import pandas as pd
+
+            df = pd.read_csv(os.path.join(self.data_validation_config.clean_data_dir, 'clean_data.csv'))
+            logging.info(f"Shape of the data: {df.shape}")
+            return df
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def save_engineered_data(self, df):
+        """
+        Save the engineered data, the input of model training and evaluation.
+        """
+        try:
+            os.makedirs(self.feature_engineering_config.engineered_data_dir, exist_ok=True)
+            df.to_csv(self.feature_engineering_config.engineered_data_file, index=False)
+            logging.info(f"Saved engineered data to: {self.feature_engineering_config.engineered_data_file}")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def save_reference_profile(self, df):
+        """
+        Save the binned distribution of every model feature, the reference the streaming drift monitor compares against.
+        """
+        try:
+            features = df.drop(columns=[self.target_column], errors='ignore')
+            profile = FeatureProfile.fit(features, self.feature_engineering_config.categorical_columns,
+                                         bins=self.drift_config.bins, max_categories=self.drift_config.max_categories)
+            profile.save(self.drift_config.reference_profile_file)
+            logging.info(f"Saved reference profile of {len(profile.features)} features to: {self.drift_config.reference_profile_file}")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
     def initiate_feature_engineering(self):
         """
         Initiate feature engineering.
         """
         try:
             # Get the preprocessed data
-            df = pd.read_csv(os.path.join(self.data_validation_config.clean_data_dir, 'clean_data.csv'))
-            
-            logging.info(f"Shape of the data: {df.shape}")
+            df = self.load_clean_data()
             
             # Handle missing values
             df = self.handle_missing_values(df)
@@ -128,15 +210,15 @@ class FeatureEngineering:
             df = self.calculate_distance(df)
             
             # Drop unnecessary columns
-            df = df.drop(['trans_date_trans_time', 'cc_num', 'merchant', 'amt',
-                          'first', 'last', 'street', 'city', 'state', 'zip','dob'], axis=1)
+            df = df.drop(DROP_COLUMNS, axis=1)
             
             logging.info(f"Preprocessed data shape: {df.shape}")
             
             # Save the engineered data
-            os.makedirs(self.feature_engineering_config.engineered_data_dir, exist_ok=True)
-            df.to_csv(self.feature_engineering_config.engineered_data_file, index=False)
-            logging.info(f"Saved engineered data to: {self.feature_engineering_config.engineered_data_file}")
+            self.save_engineered_data(df)
+
+            # Reference distributions for drift monitoring
+            self.save_reference_profile(df)
             
             logging.info(f"{'='*20}Feature Engineering log completed.{'='*20} \n\n")
             
@@ -1,23 +1,25 @@
 import os
 import sys
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from catboost import CatBoostClassifier
 from fraud_detection.logger.log import logging
 from fraud_detection.exception.exception_handler import CustomException
-from fraud_detection.config.configuration import ConfigurationManager
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
 from fraud_detection.utils.util import read_yaml_file
+from fraud_detection.utils.feature_profile import SCORE_EDGES, SCORE_FEATURE, FeatureProfile
+from fraud_detection.utils.vocabulary import CategoricalVocabulary
 
 class ModelTraining:
 
-    def __init__(self, app_config=ConfigurationManager()):
+    def __init__(self, app_config: ConfigurationManager = None):
         """
         Model Training Initialization
         app_config: ConfigurationManager
         """
         try:
+            app_config = app_config or get_configuration_manager()
             self.model_training_config = app_config.get_model_training_config()
             self.feature_engineering_config = app_config.get_feature_engineering_config()
+            self.hyperparameter_tuning_config = app_config.get_hyperparameter_tuning_config()
+            self.drift_config = app_config.get_drift_config()
             logging.info(f"{'='*20}Model Training log started.{'='*20} ")
         except Exception as e:
             raise CustomException(e, sys) from e
@@ -27,11 +29,15 @@ class ModelTraining:
         Load the engineered data for training.
         """
         try:
-            # Read the engineered data
-            df = pd.read_csv(self.feature_engineering_config.engineered_data_file)
+            import pandas as pd
+            from sklearn.model_selection import train_test_split
+
+            # Read the engineered data, keeping categorical codes in their compact dtypes
+            self.vocabulary = CategoricalVocabulary.load(self.feature_engineering_config.vocabulary_file)
+            df = pd.read_csv(self.feature_engineering_config.engineered_data_file, dtype=self.vocabulary.dtypes)
             
             # Split data into features and target
-            X = df.drop(columns=[self.model_training_config.target_column], axis=1)
+            X = df.drop(columns=[self.model_training_config.target_column])
             y = df[self.model_training_config.target_column]
             
             # Split data into training and validation sets
@@ -48,26 +54,46 @@ class ModelTraining:
         Get categorical features.
         """
         try:
-            cat_features = X_train.select_dtypes(include=['object', 'category']).columns.tolist()
+            # Categoricals are stored as vocabulary codes, so they are identified by name rather than dtype
+            cat_features = [col for col in X_train.columns if col in self.vocabulary.columns]
+            cat_features += [col for col in X_train.select_dtypes(include=['object', 'category']).columns
+                             if col not in cat_features]
             logging.info(f"Categorical features: {cat_features}")
             return cat_features
             
         except Exception as e:
             raise CustomException(e, sys) from e
         
+    def get_model_params(self):
+        """
+        Get CatBoost parameters from config, overridden by the tuning stage's best params when available.
+        """
+        try:
+            params = dict(self.model_training_config.params)
+            best_params_file = self.hyperparameter_tuning_config.best_params_file
+
+            if self.model_training_config.use_tuned_params and os.path.exists(best_params_file):
+                params.update(read_yaml_file(best_params_file)['params'])
+                logging.info(f"Using tuned parameters from: {best_params_file}")
+
+            logging.info(f"Model parameters: {params}")
+            return params
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
     def train_model(self, X_train, y_train):
         """
         Train the CatBoost model.
         """
         try:
+            from catboost import CatBoostClassifier
+
             # Define the CatBoost classifier
             model = CatBoostClassifier(
                 cat_features=self.get_cat_features(X_train),
-                eval_metric='Recall',
-                random_state=42,
-                iterations=1000,
-                learning_rate=0.177575,
-                verbose=1
+                verbose=1,
+                **self.get_model_params()
             )
             
             # Train the model
@@ -96,6 +122,23 @@ class ModelTraining:
             raise CustomException(e, sys) from e
         
         
+    def save_score_reference(self, model, X_val):
+        """
+        Add the validation-set fraud score distribution to the reference profile, so score drift is monitored too.
+        """
+        try:
+            profile_file = self.drift_config.reference_profile_file
+            if not os.path.exists(profile_file):
+                logging.info(f"No reference profile at {profile_file}; skipping the score reference")
+                return
+            profile = FeatureProfile.load(profile_file)
+            profile.add(SCORE_FEATURE, model.predict_proba(X_val)[:, 1], edges=SCORE_EDGES)
+            profile.save(profile_file)
+            logging.info(f"Added the validation score distribution to: {profile_file}")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
     def initiate_model_training(self):
         """
         Initiate model training.
@@ -109,6 +152,9 @@ class ModelTraining:
             
             # Save the model
             self.save_model(model)
+
+            # Score distribution for drift monitoring
+            self.save_score_reference(model, X_val)
             
             logging.info(f"{'='*20}Model Training log completed.{'='*20} \n\n")
             
@@ -1,25 +1,22 @@
 import os
 import sys
-import pandas as pd
-import numpy as np
-import shap
 import pickle
-from sklearn.metrics import accuracy_score, confusion_matrix, roc_auc_score, log_loss
-from catboost import CatBoostClassifier
 from fraud_detection.logger.log import logging
 from fraud_detection.exception.exception_handler import CustomException
-from fraud_detection.config.configuration import ConfigurationManager
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
 from fraud_detection.utils.util import read_yaml_file
+from fraud_detection.utils.vocabulary import CategoricalVocabulary
 
 
 class ModelEvaluation:
 
-    def __init__(self, app_config=ConfigurationManager()):
+    def __init__(self, app_config: ConfigurationManager = None):
         """
         Model Evaluation Initialization
         app_config: ConfigurationManager
         """
         try:
+            app_config = app_config or get_configuration_manager()
             self.model_evaluation_config = app_config.get_model_evaluation_config()
             self.model_training_config = app_config.get_model_training_config()
             self.feature_engineering_config = app_config.get_feature_engineering_config()
@@ -33,6 +30,8 @@ class ModelEvaluation:
         Load the trained model.
         """
         try:
+            from catboost import CatBoostClassifier
+
             model_path = self.model_training_config.model_file
             model = CatBoostClassifier()
             model.load_model(model_path, format='cbm')
@@ -48,11 +47,14 @@ class ModelEvaluation:
         Load the data for evaluation.
         """
         try:
+            import pandas as pd
+
             # Load the engineered data
-            df = pd.read_csv(self.feature_engineering_config.engineered_data_file)
+            vocabulary = CategoricalVocabulary.load(self.feature_engineering_config.vocabulary_file)
+            df = pd.read_csv(self.feature_engineering_config.engineered_data_file, dtype=vocabulary.dtypes)
             
             # Split data into features and target
-            X = df.drop(columns=[self.model_training_config.target_column], axis=1)
+            X = df.drop(columns=[self.model_training_config.target_column])
             y = df[self.model_training_config.target_column]
             
             logging.info(f"Data loaded for evaluation. Shape: {X.shape}")
@@ -66,6 +68,8 @@ class ModelEvaluation:
         Calculate evaluation metrics.
         """
         try:
+            from sklearn.metrics import accuracy_score, roc_auc_score, log_loss
+
             # Make predictions
             y_pred = model.predict(X)
             y_proba = model.predict_proba(X)[:, 1]
@@ -93,6 +97,8 @@ class ModelEvaluation:
         Generate SHAP values for feature importance.
         """
         try:
+            import shap
+
             # Create an explainer
             explainer = shap.Explainer(model)
             
@@ -110,6 +116,8 @@ class ModelEvaluation:
         Save the evaluation report.
         """
         try:
+            import pandas as pd
+
             # Create the evaluation directory if it doesn't exist
             os.makedirs(self.model_evaluation_config.evaluation_dir, exist_ok=True)
             
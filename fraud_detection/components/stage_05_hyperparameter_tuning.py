@@ -0,0 +1,408 @@
+import os
+import sys
+import json
+import time
+import queue
+import hashlib
+import multiprocessing
+import yaml
+from fraud_detection.logger.log import logging
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
+from fraud_detection.utils.vocabulary import CategoricalVocabulary
+
+
+# Populated once per worker process by _init_worker, reused by every trial that worker runs
+_WORKER_STATE = {}
+
+# CatBoost eval_metric for each objective_metric: early stopping and best_iteration follow the metric trials are ranked by
+OBJECTIVE_EVAL_METRICS = {"roc_auc": "AUC", "pr_auc": "PRAUC", "recall": "Recall", "f1": "F1"}
+
+# Bumped whenever the layout of the .npy cache changes, so older caches are rebuilt
+DATASET_CACHE_LAYOUT = 2
+
+
+def _init_worker(cache_dir, thread_count):
+    """
+    Pool initializer: memory-map the cached dataset and build the train/validation Pools once per process.
+    Rows are stored train split first, so each split is a contiguous slice and the frames handed to CatBoost
+    are views of the mapped arrays: the raw data sits once in the page cache, shared by all workers.
+    Each worker still holds its own train/validation Pool, since CatBoost builds its data in process and
+    border_count (part of the search space) keeps it from being quantized once up front.
+    """
+    import numpy as np
+    import pandas as pd
+    from catboost import Pool
+
+    with open(os.path.join(cache_dir, 'meta.json')) as f:
+        meta = json.load(f)
+
+    numeric = np.load(os.path.join(cache_dir, 'numeric.npy'), mmap_mode='r')
+    categorical = np.load(os.path.join(cache_dir, 'categorical.npy'), mmap_mode='r')
+    target = np.load(os.path.join(cache_dir, 'target.npy'), mmap_mode='r')
+
+    def build_pool(rows):
+        # copy=False keeps both frames views of the memory map; the column order does not matter to a trial
+        frame = pd.concat([pd.DataFrame(numeric[rows], columns=meta['numeric_features'], copy=False),
+                           pd.DataFrame(categorical[rows], columns=meta['cat_features'], copy=False)], axis=1)
+        return Pool(data=frame, label=target[rows], cat_features=meta['cat_features'])
+
+    train_rows, val_rows = slice(0, meta['train_rows']), slice(meta['train_rows'], None)
+    _WORKER_STATE['train_pool'] = build_pool(train_rows)
+    _WORKER_STATE['val_pool'] = build_pool(val_rows)
+    _WORKER_STATE['y_val'] = np.asarray(target[val_rows])
+    _WORKER_STATE['thread_count'] = thread_count
+
+
+def _run_trial(trial_number, params, early_stopping_rounds, eval_metric):
+    """
+    Fit one CatBoost model with the given params and score it on the validation split.
+    eval_metric: overrides the base params' eval_metric for early stopping and best_iteration.
+    """
+    from catboost import CatBoostClassifier
+    from sklearn.metrics import roc_auc_score, average_precision_score, recall_score, f1_score
+
+    start = time.perf_counter()
+    model = CatBoostClassifier(
+        **dict(params, eval_metric=eval_metric),
+        thread_count=_WORKER_STATE['thread_count'],
+        verbose=0,
+        allow_writing_files=False
+    )
+    model.fit(_WORKER_STATE['train_pool'], eval_set=_WORKER_STATE['val_pool'],
+              early_stopping_rounds=early_stopping_rounds)
+
+    y_val = _WORKER_STATE['y_val']
+    y_proba = model.predict_proba(_WORKER_STATE['val_pool'])[:, 1]
+    y_pred = (y_proba >= 0.5).astype(int)
+
+    return {
+        "trial": trial_number,
+        "params": params,
+        "best_iteration": int(model.get_best_iteration() if model.get_best_iteration() is not None else model.tree_count_ - 1),
+        "metrics": {
+            "roc_auc": float(roc_auc_score(y_val, y_proba)),
+            "pr_auc": float(average_precision_score(y_val, y_proba)),
+            "recall": float(recall_score(y_val, y_pred, zero_division=0)),
+            "f1": float(f1_score(y_val, y_pred, zero_division=0))
+        },
+        "duration_s": round(time.perf_counter() - start, 3)
+    }
+
+
+def sample_params(search_space: dict, rng) -> dict:
+    """
+    Draw one parameter set from the configured search space.
+    search_space: dict of name -> {type: loguniform|uniform|int|choice, ...}
+    rng: numpy.random.Generator
+    """
+    import numpy as np
+
+    params = {}
+    for name, spec in search_space.items():
+        kind = spec['type']
+        if kind == 'loguniform':
+            params[name] = round(float(np.exp(rng.uniform(np.log(spec['low']), np.log(spec['high'])))), 6)
+        elif kind == 'uniform':
+            params[name] = round(float(rng.uniform(spec['low'], spec['high'])), 6)
+        elif kind == 'int':
+            params[name] = int(rng.integers(spec['low'], spec['high'] + 1))
+        elif kind == 'choice':
+            params[name] = spec['values'][int(rng.integers(len(spec['values'])))]
+        else:
+            raise ValueError(f"Unknown search space type '{kind}' for parameter '{name}'")
+    return params
+
+
+class HyperparameterTuning:
+
+    def __init__(self, app_config: ConfigurationManager = None):
+        """
+        Hyperparameter Tuning Initialization
+        app_config: ConfigurationManager
+        """
+        try:
+            app_config = app_config or get_configuration_manager()
+            self.tuning_config = app_config.get_hyperparameter_tuning_config()
+            self.model_training_config = app_config.get_model_training_config()
+            self.feature_engineering_config = app_config.get_feature_engineering_config()
+            logging.info(f"{'='*20}Hyperparameter Tuning log started.{'='*20} ")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def dataset_info(self):
+        """
+        Identity of the engineered dataset and of the split, shared by the dataset cache and the search fingerprint.
+        """
+        source_file = self.feature_engineering_config.engineered_data_file
+        source_stat = os.stat(source_file)
+        return {
+            "source_file": source_file,
+            "source_size": source_stat.st_size,
+            "source_mtime": source_stat.st_mtime,
+            "validation_size": self.tuning_config.validation_size,
+            "random_state": self.tuning_config.random_state,
+            "layout": DATASET_CACHE_LAYOUT
+        }
+
+    def eval_metric(self):
+        """
+        CatBoost eval_metric matching objective_metric.
+        """
+        metric = self.tuning_config.objective_metric
+        if metric not in OBJECTIVE_EVAL_METRICS:
+            raise ValueError(f"Unknown objective_metric '{metric}', expected one of {sorted(OBJECTIVE_EVAL_METRICS)}")
+        return OBJECTIVE_EVAL_METRICS[metric]
+
+    def search_fingerprint(self):
+        """
+        Identify the search so that only trials from the same space, base params, objective and
+        engineered dataset are resumed; re-running feature engineering starts a new search.
+        """
+        try:
+            payload = json.dumps({
+                "search_space": self.tuning_config.search_space,
+                "base_params": self.model_training_config.params,
+                "eval_metric": self.eval_metric(),
+                "early_stopping_rounds": self.tuning_config.early_stopping_rounds,
+                "dataset": self.dataset_info()
+            }, sort_keys=True)
+            return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def build_dataset_cache(self):
+        """
+        Convert the engineered CSV into memory-mappable .npy arrays, once, train rows first.
+        The cache is rebuilt only when the engineered data or the split settings change.
+        """
+        try:
+            import numpy as np
+            import pandas as pd
+            from sklearn.model_selection import train_test_split
+
+            cache_dir = self.tuning_config.dataset_cache_dir
+            source_file = self.feature_engineering_config.engineered_data_file
+            source_info = self.dataset_info()
+
+            meta_file = os.path.join(cache_dir, 'meta.json')
+            if os.path.exists(meta_file):
+                with open(meta_file) as f:
+                    meta = json.load(f)
+                if all(meta.get(k) == v for k, v in source_info.items()):
+                    logging.info(f"Reusing tuning dataset cache at: {cache_dir}")
+                    return cache_dir
+
+            vocabulary = CategoricalVocabulary.load(self.feature_engineering_config.vocabulary_file)
+            df = pd.read_csv(source_file, dtype=vocabulary.dtypes)
+            target_column = self.model_training_config.target_column
+            X = df.drop(columns=[target_column])
+            y = df[target_column].to_numpy(dtype=np.int8)
+            del df
+
+            # Categoricals are already vocabulary codes from feature engineering
+            cat_features = [c for c in X.columns if c in vocabulary.columns]
+            numeric_features = [c for c in X.columns if c not in cat_features]
+
+            train_idx, val_idx = train_test_split(
+                np.arange(len(X)), test_size=self.tuning_config.validation_size,
+                random_state=self.tuning_config.random_state, stratify=y
+            )
+            # Train rows, then validation rows: each split is a contiguous slice the workers map without copying
+            order = np.concatenate([np.sort(train_idx), np.sort(val_idx)])
+
+            numeric = X[numeric_features].to_numpy(dtype=np.float32)[order]
+            categorical = X[cat_features].to_numpy(dtype=np.int32)[order] if cat_features \
+                else np.empty((len(X), 0), dtype=np.int32)
+
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(os.path.join(cache_dir, 'numeric.npy'), numeric)
+            np.save(os.path.join(cache_dir, 'categorical.npy'), categorical)
+            np.save(os.path.join(cache_dir, 'target.npy'), y[order])
+
+            meta = dict(source_info,
+                        feature_names=X.columns.tolist(),
+                        numeric_features=numeric_features,
+                        cat_features=cat_features,
+                        train_rows=len(train_idx))
+            with open(meta_file, 'w') as f:
+                json.dump(meta, f, indent=2)
+
+            logging.info(f"Tuning dataset cache built at: {cache_dir} ({len(X)} rows)")
+            return cache_dir
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def load_completed_trials(self, fingerprint):
+        """
+        Read previously persisted trials for this search so an interrupted run can resume.
+        """
+        try:
+            completed = {}
+            trials_file = self.tuning_config.trials_file
+            if not os.path.exists(trials_file):
+                return completed
+
+            with open(trials_file) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A partially written last line from an interrupted run
+                        continue
+                    if record.get('fingerprint') == fingerprint:
+                        completed[record['trial']] = record
+
+            logging.info(f"Resuming search {fingerprint}: {len(completed)} trials already completed.")
+            return completed
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def append_trial(self, record):
+        """
+        Persist a finished trial immediately so it survives an interruption.
+        """
+        try:
+            with open(self.tuning_config.trials_file, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def trial_params(self, trial_number):
+        """
+        Parameters for a trial are derived from (random_state, trial_number) so resumed runs draw the same sequence.
+        """
+        import numpy as np
+
+        rng = np.random.default_rng([self.tuning_config.random_state, trial_number])
+        params = dict(self.model_training_config.params)
+        params.update(sample_params(self.tuning_config.search_space, rng))
+        return params
+
+    def run_search(self, cache_dir, fingerprint, completed):
+        """
+        Run trials on a process pool until the wall-clock budget or the trial limit is exhausted.
+        """
+        try:
+            n_jobs = max(1, self.tuning_config.n_jobs)
+            thread_count = max(1, (os.cpu_count() or 1) // n_jobs)
+            deadline = time.monotonic() + self.tuning_config.time_budget_seconds
+            pending = iter([t for t in range(self.tuning_config.max_trials) if t not in completed])
+            results = queue.Queue()
+            in_flight = 0
+            eval_metric = self.eval_metric()
+
+            pool = multiprocessing.Pool(processes=n_jobs, initializer=_init_worker,
+                                        initargs=(cache_dir, thread_count))
+
+            def submit_next():
+                trial_number = next(pending, None)
+                if trial_number is None:
+                    return False
+                pool.apply_async(
+                    _run_trial,
+                    (trial_number, self.trial_params(trial_number), self.tuning_config.early_stopping_rounds,
+                     eval_metric),
+                    callback=results.put,
+                    error_callback=lambda e, t=trial_number: results.put({"trial": t, "error": str(e)})
+                )
+                return True
+
+            try:
+                for _ in range(n_jobs):
+                    if not submit_next():
+                        break
+                    in_flight += 1
+
+                while in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logging.info(f"Tuning time budget exhausted with {in_flight} trials in flight; they will be retried on resume.")
+                        break
+                    try:
+                        record = results.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+                    in_flight -= 1
+
+                    if "error" in record:
+                        logging.error(f"Trial {record['trial']} failed: {record['error']}")
+                    else:
+                        record["fingerprint"] = fingerprint
+                        self.append_trial(record)
+                        completed[record["trial"]] = record
+                        logging.info(f"Trial {record['trial']} finished in {record['duration_s']}s: {record['metrics']}")
+
+                    if time.monotonic() < deadline and submit_next():
+                        in_flight += 1
+            finally:
+                # Terminating (rather than closing) is what keeps the search inside its wall-clock budget
+                pool.terminate()
+                pool.join()
+
+            return completed
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def save_best_params(self, completed):
+        """
+        Write the best trial's parameters where ModelTraining picks them up.
+        """
+        try:
+            metric = self.tuning_config.objective_metric
+            best = max(completed.values(), key=lambda r: r['metrics'][metric])
+
+            params = dict(best['params'])
+            if self.tuning_config.early_stopping_rounds:
+                params['iterations'] = best['best_iteration'] + 1
+
+            os.makedirs(self.tuning_config.tuning_dir, exist_ok=True)
+            with open(self.tuning_config.best_params_file, 'w') as f:
+                yaml.safe_dump({
+                    "objective_metric": metric,
+                    "score": best['metrics'][metric],
+                    "trial": best['trial'],
+                    "fingerprint": best['fingerprint'],
+                    "params": params
+                }, f, sort_keys=False)
+
+            logging.info(f"Best trial {best['trial']} ({metric}={best['metrics'][metric]:.6f}) saved to: {self.tuning_config.best_params_file}")
+            return params
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def initiate_hyperparameter_tuning(self):
+        """
+        Initiate hyperparameter tuning.
+        """
+        try:
+            os.makedirs(self.tuning_config.tuning_dir, exist_ok=True)
+
+            # Build (or reuse) the memory-mapped dataset cache
+            cache_dir = self.build_dataset_cache()
+
+            # Resume from previously persisted trials of the same search
+            fingerprint = self.search_fingerprint()
+            completed = self.load_completed_trials(fingerprint)
+
+            # Run the search within the wall-clock budget
+            completed = self.run_search(cache_dir, fingerprint, completed)
+
+            if completed:
+                self.save_best_params(completed)
+            else:
+                logging.info("No tuning trials completed; best params were not updated.")
+
+            logging.info(f"{'='*20}Hyperparameter Tuning log completed.{'='*20} \n\n")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
@@ -0,0 +1,308 @@
+import os
+import sys
+import time
+import pickle
+import yaml
+from fraud_detection.logger.log import logging
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
+from fraud_detection.utils.vocabulary import CategoricalVocabulary
+
+# eval_metrics() values where larger is better; everything else (Logloss, CrossEntropy, ...) is minimised
+MAXIMIZED_METRICS = ("AUC", "PRAUC", "Recall", "Precision", "F1", "Accuracy", "MCC", "BalancedAccuracy")
+
+
+def mean_abs_shap(shap_values, feature_names: list) -> dict:
+    """
+    Feature -> share of the total mean |SHAP value| (shares sum to 1).
+    shap_values: (rows, features) array, in feature_names order
+    """
+    import numpy as np
+
+    importance = np.abs(np.asarray(shap_values, dtype=float)).mean(axis=0)
+    total = importance.sum() or 1.0
+    return {name: float(value / total) for name, value in zip(feature_names, importance)}
+
+
+class ModelOptimization:
+
+    def __init__(self, app_config: ConfigurationManager = None):
+        """
+        Model Optimization Initialization
+        app_config: ConfigurationManager
+        """
+        try:
+            app_config = app_config or get_configuration_manager()
+            self.optimization_config = app_config.get_model_optimization_config()
+            self.model_training_config = app_config.get_model_training_config()
+            self.model_evaluation_config = app_config.get_model_evaluation_config()
+            self.feature_engineering_config = app_config.get_feature_engineering_config()
+            logging.info(f"{'='*20}Model Optimization log started.{'='*20} ")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def load_data(self):
+        """
+        The training split of ModelTraining, and its validation rows halved: one half picks iterations and
+        early-stops retraining, the other is only used to report the variants.
+        """
+        try:
+            import pandas as pd
+            from sklearn.model_selection import train_test_split
+
+            self.vocabulary = CategoricalVocabulary.load(self.feature_engineering_config.vocabulary_file)
+            df = pd.read_csv(self.feature_engineering_config.engineered_data_file, dtype=self.vocabulary.dtypes)
+            X = df.drop(columns=[self.model_training_config.target_column])
+            y = df[self.model_training_config.target_column]
+
+            # Same split as ModelTraining.load_data, so the trained model has never seen X_val
+            X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.25, random_state=42)
+            X_select, X_test, y_select, y_test = train_test_split(X_val, y_val, test_size=0.5, random_state=42,
+                                                                  stratify=y_val)
+
+            logging.info(f"Optimization data: {len(X_train)} train, {len(X_select)} selection, {len(X_test)} test rows")
+            return X_train, X_select, X_test, y_train, y_select, y_test
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def load_model(self):
+        """
+        Load the trained model.
+        """
+        try:
+            from catboost import CatBoostClassifier
+
+            model = CatBoostClassifier()
+            model.load_model(self.model_training_config.model_file, format='cbm')
+            logging.info(f"Model loaded from: {self.model_training_config.model_file}")
+            return model
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def feature_importance(self, model, X_select, y_select):
+        """
+        Mean |SHAP| share per feature: from the evaluation stage's SHAP values when they match the model,
+        otherwise computed by CatBoost on (a sample of) the selection rows.
+        """
+        try:
+            shap_file = self.model_evaluation_config.shap_file
+            if os.path.exists(shap_file):
+                try:
+                    with open(shap_file, 'rb') as f:
+                        shap_values = pickle.load(f)
+                    if list(shap_values.feature_names) == list(model.feature_names_):
+                        logging.info(f"Feature importance from the evaluation stage's SHAP values: {shap_file}")
+                        return mean_abs_shap(shap_values.values, model.feature_names_)
+                    logging.info("Saved SHAP values are for other features; recomputing")
+                except Exception as e:
+                    # Unpickling needs the shap package; CatBoost computes the same values itself
+                    logging.info(f"Could not read saved SHAP values ({e}); recomputing")
+
+            from catboost import Pool
+
+            sample = X_select.sample(n=min(len(X_select), 10000), random_state=42)
+            pool = Pool(sample[model.feature_names_], y_select.loc[sample.index],
+                        cat_features=self.cat_features(model.feature_names_))
+            # Last column of ShapValues is the expected value
+            shap_values = model.get_feature_importance(pool, type='ShapValues')[:, :-1]
+            return mean_abs_shap(shap_values, model.feature_names_)
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def cat_features(self, features: list) -> list:
+        return [name for name in features if name in self.vocabulary.columns]
+
+    def best_iteration(self, model, X_select, y_select) -> int:
+        """
+        Iteration with the best truncate_metric on the selection rows.
+        """
+        try:
+            import numpy as np
+            from catboost import Pool
+
+            metric = self.optimization_config.truncate_metric
+            pool = Pool(X_select[model.feature_names_], y_select, cat_features=self.cat_features(model.feature_names_))
+            values = np.asarray(model.eval_metrics(pool, [metric])[metric])
+            best = int(np.argmax(values) if metric.split(':')[0] in MAXIMIZED_METRICS else np.argmin(values))
+            logging.info(f"Best {metric} on the selection rows at iteration {best} of {model.tree_count_}")
+            return best
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def retrain(self, model, features: list, data, **overrides):
+        """
+        Fit the trained model's parameters (with overrides) on the given features,
+        early-stopped on the selection rows.
+        """
+        try:
+            from catboost import CatBoostClassifier
+
+            X_train, X_select, _, y_train, y_select, _ = data
+            params = {key: value for key, value in model.get_params().items() if key not in ('cat_features', 'verbose')}
+            params.update(overrides)
+            variant = CatBoostClassifier(cat_features=self.cat_features(features), verbose=0,
+                                         allow_writing_files=False, **params)
+            variant.fit(X_train[features], y_train, eval_set=(X_select[features], y_select),
+                        early_stopping_rounds=self.optimization_config.early_stopping_rounds, use_best_model=True)
+            return variant
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def build_variants(self, model, data) -> dict:
+        """
+        Variant name -> model, for every configured variant.
+        """
+        try:
+            _, X_select, _, _, y_select, _ = data
+            variants = {}
+            for name in self.optimization_config.variants:
+                start = time.perf_counter()
+                if name == 'full':
+                    variant = model
+                elif name == 'truncated':
+                    variant = model.copy()
+                    variant.shrink(ntree_end=self.best_iteration(model, X_select, y_select) + 1)
+                elif name == 'slim':
+                    importance = self.feature_importance(model, X_select, y_select)
+                    kept = [feature for feature in model.feature_names_
+                            if importance[feature] >= self.optimization_config.min_importance_share]
+                    dropped = sorted(set(model.feature_names_) - set(kept))
+                    logging.info(f"Slim variant drops {len(dropped)} features: {dropped}")
+                    variant = self.retrain(model, kept, data)
+                elif name == 'shallow':
+                    variant = self.retrain(model, list(model.feature_names_), data,
+                                           depth=self.optimization_config.shallow_depth)
+                else:
+                    raise ValueError(f"Unknown model variant '{name}', expected full, truncated, slim or shallow")
+                variants[name] = variant
+                logging.info(f"Variant {name}: {variant.tree_count_} trees, {len(variant.feature_names_)} features "
+                             f"({time.perf_counter() - start:.1f}s)")
+            return variants
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def save_variant(self, name, model) -> str:
+        """
+        Write a variant next to the trained model; 'full' is the trained model file itself.
+        """
+        try:
+            if name == 'full':
+                return self.model_training_config.model_file
+            os.makedirs(self.optimization_config.variants_dir, exist_ok=True)
+            model_file = os.path.join(self.optimization_config.variants_dir, f"{name}.cbm")
+            model.save_model(model_file)
+            logging.info(f"Variant {name} saved to: {model_file}")
+            return model_file
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def measure(self, name, model, model_file, X_test, y_test) -> dict:
+        """
+        Held-out quality and single-transaction latency, the way FraudScorer.score calls the model.
+        """
+        try:
+            import numpy as np
+            from sklearn.metrics import precision_score, recall_score, roc_auc_score
+
+            features = list(model.feature_names_)
+            probabilities = model.predict_proba(X_test[features])[:, 1]
+            predictions = (probabilities > model.get_probability_threshold()).astype(int)
+
+            sample = X_test.sample(n=min(len(X_test), self.optimization_config.latency_samples), random_state=42)
+            rows = [sample.iloc[[i]] for i in range(len(sample))]
+            timings = np.empty(len(rows))
+            for i, row in enumerate(rows):
+                start = time.perf_counter()
+                model.predict_proba(row[features])
+                timings[i] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            model.predict_proba(sample[features])
+            batch_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+            return {
+                "variant": name,
+                "recall": round(float(recall_score(y_test, predictions, zero_division=0)), 6),
+                "precision": round(float(precision_score(y_test, predictions, zero_division=0)), 6),
+                "roc_auc": round(float(roc_auc_score(y_test, probabilities)), 6),
+                "p50_ms": round(float(np.percentile(timings, 50)) * 1e3, 4),
+                "p99_ms": round(float(np.percentile(timings, 99)) * 1e3, 4),
+                "batch_us_per_row": round(batch_us, 3),
+                "trees": int(model.tree_count_),
+                "features": len(features),
+                "size_bytes": os.path.getsize(model_file),
+                "model_file": model_file
+            }
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def select_variant(self, rows: list) -> dict:
+        """
+        Fastest variant (p99) meeting the recall floor; the full model when none does.
+        """
+        try:
+            floor = self.optimization_config.recall_floor
+            eligible = [row for row in rows if row['recall'] >= floor]
+            if eligible:
+                return min(eligible, key=lambda row: row['p99_ms'])
+            logging.warning(f"No variant reaches recall {floor}; keeping the most accurate one")
+            return next((row for row in rows if row['variant'] == 'full'), max(rows, key=lambda row: row['recall']))
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def save_report(self, rows: list, selected: dict):
+        """
+        Write the variant table (CSV) and the selection that FraudScorer picks up with use_selected_model.
+        """
+        try:
+            import pandas as pd
+
+            os.makedirs(self.optimization_config.optimization_dir, exist_ok=True)
+            pd.DataFrame(rows).to_csv(self.optimization_config.report_file, index=False)
+            logging.info(f"Variant report saved to: {self.optimization_config.report_file}")
+
+            with open(self.optimization_config.selection_file, 'w') as f:
+                yaml.safe_dump({
+                    "variant": selected['variant'],
+                    "model_file": selected['model_file'],
+                    "recall_floor": self.optimization_config.recall_floor,
+                    "metrics": {key: selected[key] for key in ('recall', 'precision', 'roc_auc', 'p50_ms', 'p99_ms',
+                                                               'batch_us_per_row', 'trees', 'features', 'size_bytes')}
+                }, f, sort_keys=False)
+            logging.info(f"Selected variant '{selected['variant']}' saved to: {self.optimization_config.selection_file}")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def initiate_model_optimization(self):
+        """
+        Initiate model optimization.
+        """
+        try:
+            data = self.load_data()
+            model = self.load_model()
+
+            # Build the variants and report each on the held-out half
+            rows = []
+            for name, variant in self.build_variants(model, data).items():
+                model_file = self.save_variant(name, variant)
+                rows.append(self.measure(name, variant, model_file, data[2], data[5]))
+                logging.info(f"Variant {name}: {rows[-1]}")
+
+            selected = self.select_variant(rows)
+            self.save_report(rows, selected)
+
+            logging.info(f"{'='*20}Model Optimization log completed.{'='*20} \n\n")
+            return rows, selected
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
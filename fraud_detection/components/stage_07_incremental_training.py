@@ -0,0 +1,407 @@
+import os
+import sys
+import json
+import time
+import shutil
+from datetime import datetime, timedelta, timezone
+from fraud_detection.logger.log import logging
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.config.configuration import ConfigurationManager, get_configuration_manager
+from fraud_detection.components.stage_02_feature_engineering import FeatureEngineering
+from fraud_detection.components.stage_03_model_training import ModelTraining
+from fraud_detection.utils.schema_validator import SchemaValidator
+from fraud_detection.utils.vocabulary import CategoricalVocabulary
+
+# Set on a scored document by whoever confirms it: 1 = confirmed fraud, 0 = confirmed legitimate
+LABEL_FIELD = "confirmed_is_fraud"
+# When the label was set (BSON date); labels are pulled incrementally on this
+LABELED_AT_FIELD = "labeled_at"
+# trans_date_trans_time format, which sorts and compares correctly as a string
+EVENT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class IncrementalTraining:
+
+    def __init__(self, app_config: ConfigurationManager = None):
+        """
+        Incremental Training Initialization
+        app_config: ConfigurationManager
+        """
+        try:
+            self.app_config = app_config = app_config or get_configuration_manager()
+            self.incremental_config = app_config.get_incremental_training_config()
+            self.model_training_config = app_config.get_model_training_config()
+            self.feature_engineering_config = app_config.get_feature_engineering_config()
+            self.data_validation_config = app_config.get_data_validation_config()
+            self.streaming_config = app_config.get_streaming_config()
+            # Aged-out non-frauds and the raw fields of slim non-fraud documents come from the Parquet archive
+            from fraud_detection.streaming.archive import build_archive
+
+            self.archive = build_archive(app_config.get_archive_config(), self.data_validation_config.schema_file)
+            logging.info(f"{'='*20}Incremental Training log started.{'='*20} ")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def load_state(self) -> dict:
+        """
+        Watermarks of the labels already trained on: labeled_at of confirmed labels, event time of aged-out non-frauds.
+        """
+        try:
+            if not os.path.exists(self.incremental_config.state_file):
+                return {"labeled_at": None, "aged_until": None, "published": []}
+            with open(self.incremental_config.state_file) as f:
+                return json.load(f)
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def save_state(self, state: dict):
+        try:
+            os.makedirs(self.incremental_config.incremental_dir, exist_ok=True)
+            with open(self.incremental_config.state_file, 'w') as f:
+                json.dump(state, f, indent=2)
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def connect(self):
+        """
+        The streaming database the consumers write to.
+        """
+        try:
+            from dotenv import load_dotenv
+            from pymongo import MongoClient
+
+            load_dotenv()
+            return MongoClient(os.getenv("MONGO_URI"))[self.streaming_config.mongo_db]
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def fetch_labeled(self, db, state: dict, columns: list):
+        """
+        Newly labeled transactions as a frame with the target column, and the watermarks they advance to.
+        Confirmed labels come from both collections; unlabelled non-frauds older than label_delay_days count as 0.
+        warm_start pulls what is past the watermarks, sliding_window everything in the last window_days.
+        With the non-fraud archive enabled, aged-out non-frauds are read from it, and slim labelled documents
+        get their raw fields from it.
+        """
+        try:
+            import pandas as pd
+
+            config = self.incremental_config
+            now = datetime.now()
+            aged_cutoff = (now - timedelta(days=config.label_delay_days)).strftime(EVENT_TIME_FORMAT)
+            projection = dict.fromkeys(columns + [LABEL_FIELD, LABELED_AT_FIELD], 1)
+            projection["_id"] = 0
+
+            if config.mode == "sliding_window":
+                # Naive UTC, like the dates pymongo returns and the saved watermark
+                labeled_since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=config.window_days)
+                aged_since = (now - timedelta(days=config.window_days)).strftime(EVENT_TIME_FORMAT)
+            else:
+                labeled_since = datetime.fromisoformat(state["labeled_at"]) if state.get("labeled_at") else None
+                aged_since = state.get("aged_until")
+
+            confirmed_query = {LABEL_FIELD: {"$in": [0, 1]}}
+            if labeled_since is not None:
+                confirmed_query[LABELED_AT_FIELD] = {"$gt": labeled_since}
+            confirmed = []
+            for collection in (self.streaming_config.fraud_collection, self.streaming_config.non_fraud_collection):
+                confirmed.extend(db[collection].find(confirmed_query, projection))
+
+            completed = self.complete_from_archive(confirmed, columns) if self.archive is not None else 0
+
+            if self.archive is not None:
+                aged = self.fetch_archived_non_frauds(db, columns, aged_since, aged_cutoff)
+            else:
+                aged_query = {LABEL_FIELD: {"$exists": False}, "trans_date_trans_time": {"$lte": aged_cutoff}}
+                if aged_since is not None:
+                    aged_query["trans_date_trans_time"]["$gt"] = aged_since
+                aged = list(db[self.streaming_config.non_fraud_collection].find(aged_query, projection)
+                            .sort("trans_date_trans_time", 1).limit(config.max_aged_non_frauds))
+
+            target_column = self.model_training_config.target_column
+            for doc in confirmed:
+                doc[target_column] = int(doc[LABEL_FIELD])
+            for doc in aged:
+                doc[target_column] = 0
+
+            watermarks = {
+                "labeled_at": max((doc[LABELED_AT_FIELD] for doc in confirmed if doc.get(LABELED_AT_FIELD)),
+                                  default=labeled_since if config.mode == "warm_start" else None),
+                "aged_until": aged[-1]["trans_date_trans_time"] if aged else aged_since,
+            }
+            if isinstance(watermarks["labeled_at"], datetime):
+                watermarks["labeled_at"] = watermarks["labeled_at"].isoformat()
+
+            df = pd.DataFrame(confirmed + aged, columns=columns + [target_column])
+            logging.info(f"Fetched {len(confirmed)} confirmed labels and {len(aged)} aged-out non-frauds")
+            fetched = {"confirmed": len(confirmed), "aged_non_frauds": len(aged)}
+            if self.archive is not None:
+                fetched["completed_from_archive"] = completed
+            return df, fetched, watermarks
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def fetch_archived_non_frauds(self, db, columns: list, since: str, until: str) -> list:
+        """
+        Archived non-frauds with since < event time <= until, oldest first, up to max_aged_non_frauds,
+        less those labelled in MongoDB (their confirmed label is fetched with the others).
+        """
+        try:
+            time_range = {"$lte": until}
+            if since is not None:
+                time_range["$gt"] = since
+            labelled = set(db[self.streaming_config.non_fraud_collection].distinct(
+                "transaction_id", {LABEL_FIELD: {"$exists": True}, "trans_date_trans_time": time_range}))
+            limit = self.incremental_config.max_aged_non_frauds
+            df = self.archive.read_between(columns, since=since, until=until, limit=limit + len(labelled))
+            if labelled:
+                df = df[~df["transaction_id"].isin(labelled)]
+            return df.head(limit).to_dict("records")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def complete_from_archive(self, docs: list, columns: list) -> int:
+        """
+        Fill the missing raw fields of slim documents (archive_config.non_fraud_mongo: slim) from their archived
+        rows, by transaction_id. Returns how many documents were completed.
+        """
+        try:
+            incomplete = [doc for doc in docs if doc.get("transaction_id") and any(column not in doc for column in columns)]
+            if not incomplete:
+                return 0
+            # Scan only the dates the documents fall in, when they all carry their event time
+            times = [doc["trans_date_trans_time"] for doc in incomplete if doc.get("trans_date_trans_time")]
+            since, until = (min(times), max(times)) if len(times) == len(incomplete) else (None, None)
+            rows = self.archive.read_ids(columns, [doc["transaction_id"] for doc in incomplete], since=since, until=until)
+            archived = {row["transaction_id"]: row for row in rows.to_dict("records")}
+            completed = 0
+            for doc in incomplete:
+                row = archived.get(doc["transaction_id"])
+                if row is not None:
+                    for column in columns:
+                        doc.setdefault(column, row[column])
+                    completed += 1
+            return completed
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def prepare(self, df, feature_names: list):
+        """
+        Schema-valid rows only (slimmed documents lack the raw fields), engineered with the stage-02 code and
+        the current vocabulary, newest last. Returns (X, y, rows dropped as invalid).
+        """
+        try:
+            target_column = self.model_training_config.target_column
+            validator = SchemaValidator.from_yaml(self.data_validation_config.schema_file)
+            valid, _ = validator.validate_frame(df)
+            df = df[valid].sort_values("trans_date_trans_time", kind="stable").reset_index(drop=True)
+            if df.empty:
+                return df.reindex(columns=feature_names), df[target_column].astype(int), int((~valid).sum())
+
+            vocabulary = CategoricalVocabulary.load(self.feature_engineering_config.vocabulary_file)
+            df = FeatureEngineering(self.app_config).engineer_features(df, vocabulary)
+            return df[feature_names], df[target_column].astype(int), int((~valid).sum())
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def split_holdout(self, X, y):
+        """
+        The newest holdout_fraction of the new rows is held out for the gate.
+        """
+        cut = len(X) - max(1, int(len(X) * self.incremental_config.holdout_fraction))
+        return X.iloc[:cut], X.iloc[cut:], y.iloc[:cut], y.iloc[cut:]
+
+    def load_historical(self, model_training: ModelTraining, feature_names: list):
+        """
+        Samples of the original training split (sliding_window training) and of its validation split (the gate).
+        """
+        try:
+            X_train, X_val, y_train, y_val = model_training.load_data()
+            rows = self.incremental_config.historical_rows
+            train_sample = X_train.sample(n=min(rows, len(X_train)), random_state=42).index
+            val_sample = X_val.sample(n=min(rows, len(X_val)), random_state=42).index
+            return (X_train.loc[train_sample, feature_names], y_train.loc[train_sample],
+                    X_val.loc[val_sample, feature_names], y_val.loc[val_sample])
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def load_model(self):
+        try:
+            from catboost import CatBoostClassifier
+
+            model = CatBoostClassifier()
+            model.load_model(self.model_training_config.model_file, format='cbm')
+            logging.info(f"Current model loaded from: {self.model_training_config.model_file}")
+            return model
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def train_candidate(self, model_training: ModelTraining, current, X_train, y_train):
+        """
+        warm_start: warm_start_iterations more trees on top of the current model (CatBoost init_model);
+        sliding_window: the configured parameters from scratch.
+        """
+        try:
+            from catboost import CatBoostClassifier
+
+            params = model_training.get_model_params()
+            init_model = None
+            if self.incremental_config.mode == "warm_start":
+                params.update(iterations=self.incremental_config.warm_start_iterations,
+                              learning_rate=self.incremental_config.warm_start_learning_rate)
+                init_model = current
+
+            vocabulary = CategoricalVocabulary.load(self.feature_engineering_config.vocabulary_file)
+            candidate = CatBoostClassifier(cat_features=[col for col in X_train.columns if col in vocabulary.columns],
+                                           verbose=0, allow_writing_files=False, **params)
+            start = time.perf_counter()
+            candidate.fit(X_train, y_train, init_model=init_model)
+            logging.info(f"Candidate trained ({self.incremental_config.mode}) on {len(X_train)} rows in "
+                         f"{time.perf_counter() - start:.1f}s: {candidate.tree_count_} trees")
+            return candidate
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def evaluate(self, model, X, y) -> dict:
+        """
+        ROC AUC (None without both classes), recall and precision at the model's threshold, as FraudScorer scores.
+        """
+        try:
+            from sklearn.metrics import precision_score, recall_score, roc_auc_score
+
+            probabilities = model.predict_proba(X[model.feature_names_])[:, 1]
+            predictions = (probabilities > model.get_probability_threshold()).astype(int)
+            both_classes = y.nunique() == 2
+            return {
+                "rows": len(y),
+                "frauds": int(y.sum()),
+                "roc_auc": round(float(roc_auc_score(y, probabilities)), 6) if both_classes else None,
+                "recall": round(float(recall_score(y, predictions, zero_division=0)), 6) if both_classes else None,
+                "precision": round(float(precision_score(y, predictions, zero_division=0)), 6),
+            }
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def gate(self, evaluations: dict):
+        """
+        (passed, reasons): every holdout with both classes must keep ROC AUC and recall within the allowed drops.
+        evaluations: holdout name -> {"current": metrics, "candidate": metrics}
+        """
+        config = self.incremental_config
+        reasons = []
+        judged = 0
+        for holdout, metrics in evaluations.items():
+            current, candidate = metrics["current"], metrics["candidate"]
+            if current["roc_auc"] is None:
+                continue
+            judged += 1
+            if candidate["roc_auc"] < current["roc_auc"] - config.max_auc_drop:
+                reasons.append(f"{holdout}: ROC AUC {candidate['roc_auc']} < {current['roc_auc']} - {config.max_auc_drop}")
+            if candidate["recall"] < current["recall"] - config.max_recall_drop:
+                reasons.append(f"{holdout}: recall {candidate['recall']} < {current['recall']} - {config.max_recall_drop}")
+        if not judged:
+            reasons.append("no holdout has both classes")
+        return not reasons, reasons
+
+    def publish(self, candidate) -> str:
+        """
+        Archive the current model, then swap the candidate in with an atomic rename.
+        Returns the archived copy's path.
+        """
+        try:
+            model_file = self.model_training_config.model_file
+            os.makedirs(self.incremental_config.archive_dir, exist_ok=True)
+            archived = os.path.join(self.incremental_config.archive_dir,
+                                    f"trained_model_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.cbm")
+            shutil.copy2(model_file, archived)
+
+            staged = f"{model_file}.incoming"
+            candidate.save_model(staged)
+            os.replace(staged, model_file)
+            logging.info(f"Published the refreshed model to: {model_file} (previous kept at {archived})")
+            return archived
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def save_report(self, report: dict) -> str:
+        try:
+            os.makedirs(self.incremental_config.incremental_dir, exist_ok=True)
+            report_file = os.path.join(self.incremental_config.incremental_dir,
+                                       f"incremental_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.json")
+            with open(report_file, 'w') as f:
+                json.dump(report, f, indent=2)
+            logging.info(f"Incremental training report saved to: {report_file}")
+            return report_file
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def initiate_incremental_training(self, db=None) -> dict:
+        """
+        Initiate incremental training: fetch new labels, train a candidate, gate it against the current model
+        on held-out new and historical rows, and publish it only if it passes.
+        db: the streaming pymongo Database (connected from MONGO_URI when not given)
+        """
+        try:
+            config = self.incremental_config
+            start = time.perf_counter()
+            state = self.load_state()
+            report = {"mode": config.mode, "started_at": datetime.now().isoformat(timespec="seconds"), "published": False}
+
+            current = self.load_model()
+            feature_names = list(current.feature_names_)
+            # The stored is_fraud is the model's own prediction, never a label
+            columns = [column for column in SchemaValidator.from_yaml(self.data_validation_config.schema_file).columns
+                       if column != self.model_training_config.target_column]
+            df, fetched, watermarks = self.fetch_labeled(db if db is not None else self.connect(), state, columns)
+            report["fetched"] = fetched
+
+            X_new, y_new, invalid = self.prepare(df, feature_names)
+            report["new_rows"] = {"valid": len(X_new), "invalid": invalid, "frauds": int(y_new.sum())}
+            if len(X_new) < config.min_new_labels or y_new.sum() < config.min_new_frauds:
+                report["reasons"] = [f"not enough new labels ({len(X_new)} rows, {int(y_new.sum())} frauds; need "
+                                     f"{config.min_new_labels} and {config.min_new_frauds})"]
+                logging.info(report["reasons"][0])
+                self.save_report(report)
+                return report
+
+            model_training = ModelTraining(self.app_config)
+            X_hist_train, y_hist_train, X_hist_val, y_hist_val = self.load_historical(model_training, feature_names)
+            X_train, X_holdout, y_train, y_holdout = self.split_holdout(X_new, y_new)
+            if config.mode == "sliding_window":
+                import pandas as pd
+                X_train = pd.concat([X_hist_train, X_train], ignore_index=True)
+                y_train = pd.concat([y_hist_train, y_train], ignore_index=True)
+
+            candidate = self.train_candidate(model_training, current, X_train, y_train)
+
+            evaluations = {name: {"current": self.evaluate(current, X, y), "candidate": self.evaluate(candidate, X, y)}
+                           for name, X, y in (("new", X_holdout, y_holdout), ("historical", X_hist_val, y_hist_val))}
+            passed, reasons = self.gate(evaluations)
+            report.update(evaluations=evaluations, reasons=reasons, candidate_trees=int(candidate.tree_count_))
+
+            if passed:
+                report["archived_model"] = self.publish(candidate)
+                report["published"] = True
+                # Score distribution of the new model for the drift monitor
+                model_training.save_score_reference(candidate, X_hist_val)
+                state.update(watermarks)
+                state["published"] = (state.get("published", []) + [report["started_at"]])[-20:]
+                self.save_state(state)
+            else:
+                logging.warning(f"Candidate not published: {reasons}")
+
+            report["duration_s"] = round(time.perf_counter() - start, 1)
+            self.save_report(report)
+            logging.info(f"{'='*20}Incremental Training log completed.{'='*20} \n\n")
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
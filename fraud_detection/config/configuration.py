@@ -1,10 +1,15 @@
 import os
 import sys
+from functools import lru_cache
 from fraud_detection.logger.log import logging
 from fraud_detection.utils.util import read_yaml_file
 from fraud_detection.exception.exception_handler import CustomException
-from fraud_detection.entity.config_entity import (DataIngestionConfig, DataValidationConfig,
-                                                   FeatureEngineeringConfig, ModelTrainingConfig, ModelEvaluationConfig)
+from fraud_detection.entity.config_entity import (DataIngestionConfig, DataValidationConfig, SyntheticDataConfig,
+                                                   FeatureEngineeringConfig, ModelTrainingConfig, ModelEvaluationConfig,
+                                                   ModelOptimizationConfig, PipelineConfig, ProfilingConfig,
+                                                   IncrementalTrainingConfig, HyperparameterTuningConfig, StreamingConfig,
+                                                   ServingConfig, PreforkConfig, OverloadConfig, MembershipConfig, DriftConfig, RollupConfig,
+                                                   ArchiveConfig)
 from fraud_detection.constant import *
 
 
@@ -51,6 +56,9 @@ class ConfigurationManager:
             response = DataValidationConfig(
                 clean_data_dir = clean_data_path,
                 credit_card_fraud_transaction_csv_file = credit_card_fraud_transaction_csv_file_dir,
+                schema_file = SCHEMA_FILE_PATH,
+                invalid_data_file = os.path.join(clean_data_path, data_validation_config['invalid_data_file']),
+                chunk_size = int(data_validation_config['chunk_size']),
             )
 
             logging.info(f"Data Validation Config: {response}")
@@ -60,6 +68,37 @@ class ConfigurationManager:
             raise CustomException(e, sys) from e
         
 
+    def get_synthetic_data_config(self) -> SyntheticDataConfig:
+        """
+        Get Synthetic Data Configuration
+        """
+        try:
+            synthetic_config = self.configs_info['synthetic_data_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            data_format = synthetic_config.get('format', 'csv')
+            if data_format not in ('csv', 'parquet'):
+                raise ValueError(f"Unknown synthetic data format '{data_format}', expected csv or parquet")
+
+            response = SyntheticDataConfig(
+                output_dir=os.path.join(artifacts_dir, synthetic_config['output_dir']),
+                rows=int(synthetic_config['rows']),
+                fraud_rate=float(synthetic_config['fraud_rate']),
+                transactions_per_card=int(synthetic_config['transactions_per_card']),
+                merchants=int(synthetic_config['merchants']),
+                vocabulary_size=int(synthetic_config['vocabulary_size']),
+                start_date=str(synthetic_config['start_date']),
+                end_date=str(synthetic_config['end_date']),
+                chunk_rows=int(synthetic_config['chunk_rows']),
+                workers=int(synthetic_config.get('workers', 1)),
+                format=data_format,
+                seed=int(synthetic_config.get('seed', 42))
+            )
+            logging.info(f"Synthetic Data Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
     def get_feature_engineering_config(self) -> FeatureEngineeringConfig:
         try:
             feature_engineering_config = self.configs_info['feature_engineering_config']
@@ -69,7 +108,10 @@ class ConfigurationManager:
             
             response = FeatureEngineeringConfig(
                 engineered_data_dir=engineered_data_dir,
-                engineered_data_file=os.path.join(engineered_data_dir, feature_engineering_config['engineered_data_file'])
+                engineered_data_file=os.path.join(engineered_data_dir, feature_engineering_config['engineered_data_file']),
+                vocabulary_file=os.path.join(engineered_data_dir, feature_engineering_config['vocabulary_file']),
+                categorical_columns=feature_engineering_config['categorical_columns'],
+                min_category_count=feature_engineering_config.get('min_category_count', 1)
             )
             
             logging.info(f"Feature Engineering Config: {response}")
@@ -92,7 +134,9 @@ class ConfigurationManager:
             response = ModelTrainingConfig(
                 model_dir=model_dir,
                 model_file=model_file,
-                target_column=model_training_config['target_column']
+                target_column=model_training_config['target_column'],
+                params=model_training_config.get('params', {}),
+                use_tuned_params=model_training_config.get('use_tuned_params', False)
             )
 
             logging.info(f"Model Training Config: {response}")
@@ -124,4 +168,324 @@ class ConfigurationManager:
         except Exception as e:
             raise CustomException(e, sys) from e
 
-        
\ No newline at end of file
+    def get_model_optimization_config(self) -> ModelOptimizationConfig:
+        """
+        Get Model Optimization Configuration
+        """
+        try:
+            optimization_config = self.configs_info['model_optimization_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+            optimization_dir = os.path.join(artifacts_dir, optimization_config['optimization_dir'])
+            model_dir = self.configs_info['model_training_config']['model_dir']
+
+            response = ModelOptimizationConfig(
+                optimization_dir=optimization_dir,
+                report_file=os.path.join(optimization_dir, optimization_config['report_file']),
+                selection_file=os.path.join(optimization_dir, optimization_config['selection_file']),
+                variants_dir=os.path.join(model_dir, optimization_config['variants_dir']),
+                variants=list(optimization_config['variants']),
+                truncate_metric=optimization_config.get('truncate_metric', 'Logloss'),
+                min_importance_share=float(optimization_config['min_importance_share']),
+                shallow_depth=int(optimization_config['shallow_depth']),
+                early_stopping_rounds=optimization_config.get('early_stopping_rounds'),
+                recall_floor=float(optimization_config['recall_floor']),
+                latency_samples=int(optimization_config.get('latency_samples', 2000)),
+                use_selected_model=optimization_config.get('use_selected_model', False)
+            )
+            logging.info(f"Model Optimization Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_hyperparameter_tuning_config(self) -> HyperparameterTuningConfig:
+        """
+        Get Hyperparameter Tuning Configuration
+        """
+        try:
+            tuning_config = self.configs_info['hyperparameter_tuning_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+            tuning_dir = os.path.join(artifacts_dir, tuning_config['tuning_dir'])
+
+            response = HyperparameterTuningConfig(
+                tuning_dir=tuning_dir,
+                dataset_cache_dir=os.path.join(artifacts_dir, tuning_config['dataset_cache_dir']),
+                trials_file=os.path.join(tuning_dir, tuning_config['trials_file']),
+                best_params_file=os.path.join(tuning_dir, tuning_config['best_params_file']),
+                time_budget_seconds=float(tuning_config['time_budget_seconds']),
+                max_trials=int(tuning_config['max_trials']),
+                n_jobs=int(tuning_config['n_jobs']),
+                validation_size=float(tuning_config['validation_size']),
+                objective_metric=tuning_config['objective_metric'],
+                early_stopping_rounds=tuning_config.get('early_stopping_rounds'),
+                random_state=int(tuning_config['random_state']),
+                search_space=tuning_config['search_space']
+            )
+            logging.info(f"Hyperparameter Tuning Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_pipeline_config(self) -> PipelineConfig:
+        """
+        Get Training Pipeline Configuration
+        """
+        try:
+            pipeline_config = self.configs_info['pipeline_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            response = PipelineConfig(
+                pipeline_dir=os.path.join(artifacts_dir, pipeline_config['pipeline_dir']),
+                max_workers=max(1, int(pipeline_config.get('max_workers', 1))),
+                max_processes=max(0, int(pipeline_config.get('max_processes', 0)))
+            )
+            logging.info(f"Pipeline Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_profiling_config(self) -> ProfilingConfig:
+        """
+        Get Profiling Configuration
+        """
+        try:
+            profiling_config = self.configs_info['profiling_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            response = ProfilingConfig(
+                profile_dir=os.path.join(artifacts_dir, profiling_config['profile_dir']),
+                sample_interval_seconds=float(profiling_config.get('sample_interval_ms', 5)) / 1000,
+                snapshot_interval_seconds=float(profiling_config.get('snapshot_interval_seconds', 60)),
+                top_entries=int(profiling_config.get('top_entries', 25))
+            )
+            logging.info(f"Profiling Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_incremental_training_config(self) -> IncrementalTrainingConfig:
+        """
+        Get Incremental Training Configuration
+        """
+        try:
+            incremental_config = self.configs_info['incremental_training_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+            incremental_dir = os.path.join(artifacts_dir, incremental_config['incremental_dir'])
+            model_dir = self.configs_info['model_training_config']['model_dir']
+
+            mode = incremental_config.get('mode', 'warm_start')
+            if mode not in ('warm_start', 'sliding_window'):
+                raise ValueError(f"Unknown incremental training mode '{mode}', expected warm_start or sliding_window")
+
+            response = IncrementalTrainingConfig(
+                incremental_dir=incremental_dir,
+                state_file=os.path.join(incremental_dir, incremental_config['state_file']),
+                archive_dir=os.path.join(model_dir, incremental_config['archive_dir']),
+                mode=mode,
+                label_delay_days=float(incremental_config['label_delay_days']),
+                window_days=float(incremental_config['window_days']),
+                max_aged_non_frauds=int(incremental_config['max_aged_non_frauds']),
+                min_new_labels=int(incremental_config['min_new_labels']),
+                min_new_frauds=int(incremental_config['min_new_frauds']),
+                warm_start_iterations=int(incremental_config['warm_start_iterations']),
+                warm_start_learning_rate=float(incremental_config['warm_start_learning_rate']),
+                historical_rows=int(incremental_config['historical_rows']),
+                holdout_fraction=float(incremental_config['holdout_fraction']),
+                max_auc_drop=float(incremental_config['max_auc_drop']),
+                max_recall_drop=float(incremental_config['max_recall_drop'])
+            )
+            logging.info(f"Incremental Training Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_streaming_config(self) -> StreamingConfig:
+        """
+        Get Streaming Configuration
+        """
+        try:
+            streaming_config = self.configs_info['streaming_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            response = StreamingConfig(
+                topic=streaming_config['topic'],
+                group_id=streaming_config['group_id'],
+                poll_timeout_seconds=float(streaming_config['poll_timeout_seconds']),
+                mongo_db=streaming_config['mongo_db'],
+                fraud_collection=streaming_config['fraud_collection'],
+                non_fraud_collection=streaming_config['non_fraud_collection'],
+                replay_report_dir=os.path.join(artifacts_dir, streaming_config['replay_report_dir']),
+                metrics_port=int(streaming_config['metrics_port']),
+                metrics_log_interval_seconds=float(streaming_config['metrics_log_interval_seconds']),
+                lag_refresh_seconds=float(streaming_config['lag_refresh_seconds']),
+                async_max_in_flight=int(streaming_config['async_max_in_flight']),
+                async_score_workers=int(streaming_config['async_score_workers']),
+                async_poll_batch_size=int(streaming_config['async_poll_batch_size']),
+                batch_size=int(streaming_config['batch_size']),
+                # Rule files live next to config.yaml, not under artifacts
+                rules_file=streaming_config.get('rules_file'),
+                validate_messages=bool(streaming_config.get('validate_messages', False)),
+                dead_letter_collection=streaming_config['dead_letter_collection'],
+                dead_letter_topic=streaming_config.get('dead_letter_topic') or None,
+                wire_format=streaming_config.get('wire_format', 'json')
+            )
+            logging.info(f"Streaming Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_serving_config(self) -> ServingConfig:
+        """
+        Get Scoring API Configuration
+        """
+        try:
+            serving_config = self.configs_info['serving_config']
+
+            response = ServingConfig(
+                host=serving_config.get('host', '127.0.0.1'),
+                port=int(serving_config['port']),
+                max_batch_size=int(serving_config['max_batch_size']),
+                max_wait_seconds=float(serving_config['max_wait_ms']) / 1000,
+                max_queue=int(serving_config['max_queue']),
+                max_in_flight=int(serving_config['max_in_flight']),
+                request_timeout_seconds=float(serving_config['request_timeout_ms']) / 1000,
+                apply_rules=bool(serving_config.get('apply_rules', True)),
+                drain_seconds=float(serving_config.get('drain_seconds', 5))
+            )
+            logging.info(f"Serving Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_prefork_config(self) -> PreforkConfig:
+        """
+        Get Pre-fork Consumer Configuration
+        """
+        try:
+            prefork_config = self.configs_info['prefork_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            response = PreforkConfig(
+                workers=int(prefork_config['workers']),
+                memory_report_dir=os.path.join(artifacts_dir, prefork_config['memory_report_dir']),
+                memory_report_interval_seconds=float(prefork_config.get('memory_report_interval_seconds', 60)),
+                restart_delay_seconds=float(prefork_config.get('restart_delay_seconds', 5))
+            )
+            logging.info(f"Prefork Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_overload_config(self) -> OverloadConfig:
+        """
+        Get Overload Controller Configuration
+        """
+        try:
+            overload_config = self.configs_info['overload_config']
+            response = OverloadConfig(
+                enabled=overload_config.get('enabled', True),
+                latency_smoothing=float(overload_config.get('latency_smoothing', 0.2)),
+                recover_ratio=float(overload_config.get('recover_ratio', 0.5)),
+                recover_seconds=float(overload_config.get('recover_seconds', 30)),
+                fallback_model_file=overload_config.get('fallback_model_file') or None,
+                non_fraud_fields=list(overload_config.get('non_fraud_fields', [])),
+                modes=list(overload_config.get('modes', []))
+            )
+            logging.info(f"Overload Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_membership_config(self) -> MembershipConfig:
+        """
+        Get Membership (dedup / watchlist filter) Configuration
+        """
+        try:
+            membership_config = self.configs_info['membership_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            response = MembershipConfig(
+                filter_dir=os.path.join(artifacts_dir, membership_config['filter_dir']),
+                rebuild_on_start=bool(membership_config['rebuild_on_start']),
+                dedup=membership_config['dedup'],
+                watchlists=membership_config.get('watchlists') or {}
+            )
+            logging.info(f"Membership Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_drift_config(self) -> DriftConfig:
+        """
+        Get Drift Monitoring Configuration
+        """
+        try:
+            drift_config = self.configs_info['drift_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            response = DriftConfig(
+                reference_profile_file=os.path.join(artifacts_dir, drift_config['reference_profile_file']),
+                bins=int(drift_config['bins']),
+                max_categories=int(drift_config['max_categories']),
+                window_size=int(drift_config['window_size']),
+                psi_threshold=float(drift_config['psi_threshold']),
+                ks_threshold=float(drift_config['ks_threshold']),
+                alert_cooldown_seconds=float(drift_config['alert_cooldown_seconds'])
+            )
+            logging.info(f"Drift Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_rollup_config(self) -> RollupConfig:
+        """
+        Get Rollup (dashboard aggregates) Configuration
+        """
+        try:
+            rollup_config = self.configs_info['rollup_config']
+
+            response = RollupConfig(
+                collection=rollup_config['collection'],
+                flush_interval_seconds=float(rollup_config['flush_interval_seconds']),
+                granularities=tuple(rollup_config['granularities']),
+                dimensions=tuple(rollup_config['dimensions'])
+            )
+            logging.info(f"Rollup Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def get_archive_config(self) -> ArchiveConfig:
+        """
+        Get Non-fraud Archive Configuration
+        """
+        try:
+            archive_config = self.configs_info['archive_config']
+            artifacts_dir = self.configs_info['artifacts_config']['artifacts_dir']
+
+            non_fraud_mongo = archive_config.get('non_fraud_mongo', 'slim')
+            if non_fraud_mongo not in ('full', 'slim', 'none'):
+                raise ValueError(f"Unknown non_fraud_mongo '{non_fraud_mongo}', expected full, slim or none")
+
+            response = ArchiveConfig(
+                enabled=bool(archive_config.get('enabled', False)),
+                archive_dir=os.path.join(artifacts_dir, archive_config['archive_dir']),
+                compression=archive_config.get('compression', 'zstd'),
+                granularity=archive_config.get('granularity', 'day'),
+                max_rows=int(archive_config['max_rows']),
+                max_bytes=int(archive_config['max_bytes']),
+                max_seconds=float(archive_config['max_seconds']),
+                non_fraud_mongo=non_fraud_mongo,
+                mongo_fields=list(archive_config.get('mongo_fields', []))
+            )
+            logging.info(f"Archive Config: {response}")
+            return response
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+
+@lru_cache(maxsize=None)
+def get_configuration_manager(config_file_path: str = CONFIG_FILE_PATH) -> ConfigurationManager:
+    """
+    Shared ConfigurationManager, so config.yaml is parsed once per process rather than once per stage.
+    """
+    return ConfigurationManager(config_file_path)
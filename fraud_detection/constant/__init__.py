@@ -4,4 +4,7 @@ ROOT_DIR = os.getcwd()
 # Main config file path
 CONFIG_FOLDER_NAME = "config"
 CONFIG_FILE_NAME = "config.yaml"
-CONFIG_FILE_PATH = os.path.join(ROOT_DIR,CONFIG_FOLDER_NAME,CONFIG_FILE_NAME)
\ No newline at end of file
+CONFIG_FILE_PATH = os.path.join(ROOT_DIR,CONFIG_FOLDER_NAME,CONFIG_FILE_NAME)
+# Column schema (feature dtypes and raw transaction rules)
+SCHEMA_FILE_NAME = "schema.yaml"
+SCHEMA_FILE_PATH = os.path.join(ROOT_DIR,SCHEMA_FILE_NAME)
\ No newline at end of file
@@ -0,0 +1,406 @@
+import os
+import sys
+import glob
+import json
+import math
+import time
+import shutil
+import argparse
+import multiprocessing
+from datetime import datetime
+from fraud_detection.logger.log import logging
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.config.configuration import get_configuration_manager
+
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+except ImportError:  # optional: needed for Parquet, and writes CSV about 10x faster than pandas
+    pyarrow = pyarrow_csv = None
+
+# Same columns, in the same order, as the ingested credit_card_fraud_transactions.csv
+COLUMNS = ['trans_date_trans_time', 'cc_num', 'merchant', 'category', 'amt', 'first', 'last', 'gender', 'street',
+           'city', 'state', 'zip', 'lat', 'long', 'city_pop', 'job', 'dob', 'merch_lat', 'merch_long', 'is_fraud']
+
+# Legitimate spend: category -> (share of transactions, log-amount offset from the card's usual amount)
+LEGIT_CATEGORIES = {
+    'gas_transport': (0.100, 0.3), 'grocery_pos': (0.095, 0.7), 'home': (0.095, 0.2), 'shopping_pos': (0.090, 0.3),
+    'kids_pets': (0.087, 0.0), 'shopping_net': (0.075, 0.3), 'entertainment': (0.072, 0.0),
+    'food_dining': (0.070, -0.2), 'personal_care': (0.070, -0.4), 'health_fitness': (0.066, -0.4),
+    'misc_pos': (0.062, -0.6), 'misc_net': (0.049, -0.6), 'grocery_net': (0.035, -0.4), 'travel': (0.034, 0.8),
+}
+# Fraud: category -> (share of fraudulent transactions, median amount, log-amount spread)
+FRAUD_CATEGORIES = {
+    'shopping_net': (0.25, 950.0, 0.25), 'grocery_pos': (0.25, 310.0, 0.10), 'misc_net': (0.15, 800.0, 0.30),
+    'shopping_pos': (0.15, 880.0, 0.30), 'gas_transport': (0.10, 12.0, 0.40), 'misc_pos': (0.10, 200.0, 0.80),
+}
+# Share of transactions per hour of day: legitimate spend is mostly daytime, fraud bursts mostly late at night
+LEGIT_HOURS = [1, 1, 1, 1, 1, 1, 3, 3, 3, 3, 3, 3, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5]
+FRAUD_HOURS = [10, 10, 10, 10, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 15, 15]
+# A compromised card is used this many times, within this many hours
+FRAUD_BURST_SIZE = (2, 10)
+FRAUD_BURST_HOURS = 48
+
+# Tables shared by every chunk, set once per worker process by _init_worker
+_WORKER_STATE = {}
+
+
+def _init_worker(tables):
+    _WORKER_STATE['tables'] = tables
+
+
+def _generate_chunk_in_worker(spec):
+    return generate_chunk(_WORKER_STATE['tables'], spec)
+
+
+def _hour_of_day(seconds, hours, rng):
+    """
+    Move each timestamp (seconds from the period start) to a random time within the given hour of its day.
+    """
+    return (seconds // 86400) * 86400 + hours * 3600 + rng.integers(0, 3600, len(seconds))
+
+
+def write_part(df, file_path: str, data_format: str):
+    if data_format == 'parquet':
+        df.to_parquet(file_path, index=False)
+    elif pyarrow_csv is not None:
+        # Strings come out quoted, which every CSV reader (and DataValidation's read_csv) accepts
+        pyarrow_csv.write_csv(pyarrow.Table.from_pandas(df, preserve_index=False), file_path)
+    else:
+        df.to_csv(file_path, index=False)
+
+
+def _pick_merchants(tables, categories, rng):
+    import numpy as np
+
+    merchants = np.empty(len(categories), dtype=np.int64)
+    for category, candidates in enumerate(tables['merchants_by_category']):
+        rows = np.flatnonzero(categories == category)
+        if len(rows):
+            merchants[rows] = candidates[rng.integers(0, len(candidates), len(rows))]
+    return merchants
+
+
+def generate_chunk(tables: dict, spec: dict) -> dict:
+    """
+    Generate and write one part file: spec['rows'] transactions timed within [start_seconds, end_seconds) of the
+    period, of which round(rows x fraud_rate) are injected fraud bursts. Returns the part's file, rows and frauds.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng([tables['seed'], spec['index']])
+    cards, categories = tables['cards'], tables['categories']
+    start, end = spec['start_seconds'], max(spec['end_seconds'], spec['start_seconds'] + 1)
+    frauds = int(round(spec['rows'] * tables['fraud_rate']))
+    legit = spec['rows'] - frauds
+
+    # Legitimate spend: busier cards transact more; each card has its own category mix and usual amount
+    legit_card = np.minimum(np.searchsorted(cards['activity_cdf'], rng.random(legit)), len(cards['cc_num']) - 1)
+    legit_category = (rng.random(legit)[:, None] > cards['category_cdf'][legit_card]).sum(axis=1)
+    legit_category = np.minimum(legit_category, len(categories) - 1)
+    legit_seconds = _hour_of_day(rng.integers(start, end, legit),
+                                 rng.choice(24, legit, p=tables['legit_hours']), rng)
+    legit_amount = np.exp(cards['log_amount'][legit_card] + tables['legit_offsets'][legit_category]
+                          + rng.normal(0.0, 0.8, legit))
+
+    # Fraud: bursts of purchases on compromised cards within FRAUD_BURST_HOURS, in a few categories, large amounts
+    sizes = rng.integers(FRAUD_BURST_SIZE[0], FRAUD_BURST_SIZE[1] + 1, max(frauds, 1))
+    bursts = int(np.searchsorted(np.cumsum(sizes), frauds)) + 1 if frauds else 0
+    sizes = sizes[:bursts]
+    if bursts:
+        sizes[-1] -= sizes.sum() - frauds
+    burst = np.repeat(np.arange(bursts), sizes)
+    burst_start = rng.integers(start, max(start + 1, end - FRAUD_BURST_HOURS * 3600), bursts)
+    fraud_card = rng.integers(0, len(cards['cc_num']), bursts)[burst]
+    fraud_seconds = _hour_of_day(burst_start[burst] + rng.integers(0, FRAUD_BURST_HOURS * 3600, frauds),
+                                 rng.choice(24, frauds, p=tables['fraud_hours']), rng)
+    fraud_category = rng.choice(tables['fraud_categories'], frauds, p=tables['fraud_shares'])
+    fraud_amount = np.exp(tables['fraud_log_medians'][fraud_category]
+                          + rng.normal(0.0, 1.0, frauds) * tables['fraud_log_spreads'][fraud_category])
+
+    card = np.concatenate([legit_card, fraud_card])
+    category = np.concatenate([legit_category, fraud_category])
+    seconds = np.clip(np.concatenate([legit_seconds, fraud_seconds]), start, end - 1)
+    order = np.argsort(seconds, kind='stable')
+    card, category, seconds = card[order], category[order], seconds[order]
+    amount = np.concatenate([legit_amount, fraud_amount])[order]
+    is_fraud = np.concatenate([np.zeros(legit, dtype=np.int64), np.ones(frauds, dtype=np.int64)])[order]
+
+    timestamps = np.datetime64(tables['start_date'], 's') + seconds.astype('timedelta64[s]')
+    merchant = _pick_merchants(tables, category, rng)
+    df = pd.DataFrame({
+        'trans_date_trans_time': np.char.replace(np.datetime_as_string(timestamps, unit='s'), 'T', ' '),
+        'cc_num': cards['cc_num'][card],
+        'merchant': tables['merchant_names'][merchant],
+        'category': categories[category],
+        'amt': np.round(np.clip(amount, 1.0, 30000.0), 2),
+        'first': cards['first'][card],
+        'last': cards['last'][card],
+        'gender': cards['gender'][card],
+        'street': cards['street'][card],
+        'city': cards['city'][card],
+        'state': cards['state'][card],
+        'zip': cards['zip'][card],
+        'lat': cards['lat'][card],
+        'long': cards['long'][card],
+        'city_pop': cards['city_pop'][card],
+        'job': cards['job'][card],
+        'dob': cards['dob'][card],
+        # Merchants within about a degree of the cardholder, as in the original dataset
+        'merch_lat': np.round(cards['lat'][card] + rng.uniform(-1.0, 1.0, len(card)), 6),
+        'merch_long': np.round(cards['long'][card] + rng.uniform(-1.0, 1.0, len(card)), 6),
+        'is_fraud': is_fraud,
+    })[COLUMNS]
+
+    write_part(df, spec['file'], tables['format'])
+    return {"file": spec['file'], "rows": len(df), "frauds": frauds}
+
+
+class BulkTransactionGenerator:
+    """
+    Offline generator of large synthetic datasets in the schema of the ingested CSV, for scale-testing the training
+    stages and replay: Faker values are sampled once into small vocabularies, cardholders and merchants become
+    NumPy tables, and every part file is sampled vectorized, in parallel worker processes.
+    """
+
+    def __init__(self, synthetic_config):
+        """
+        synthetic_config: SyntheticDataConfig
+        """
+        try:
+            self.synthetic_config = synthetic_config
+            if synthetic_config.format == 'parquet' and pyarrow is None:
+                raise ValueError("Parquet output needs pyarrow (pip install pyarrow), or use --format csv")
+            logging.info(f"{'='*20}Bulk Data Generation log started.{'='*20} ")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def build_vocabularies(self) -> dict:
+        """
+        vocabulary_size Faker values per field, drawn once (Faker is the slow part of the streaming producer).
+        """
+        try:
+            import numpy as np
+            from faker import Faker
+
+            fake = Faker('en_US')
+            fake.seed_instance(self.synthetic_config.seed)
+            size = self.synthetic_config.vocabulary_size
+            fields = {
+                'first': fake.first_name, 'last': fake.last_name, 'street': fake.street_address,
+                'city': fake.city, 'state': fake.state_abbr, 'zip': fake.zipcode, 'job': fake.job,
+                'merchant': lambda: "fraud_" + fake.company(),
+            }
+            vocabularies = {name: np.array([make() for _ in range(size)], dtype=object) for name, make in fields.items()}
+            logging.info(f"Sampled {size} Faker values for {list(fields)}")
+            return vocabularies
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def build_tables(self, vocabularies: dict) -> dict:
+        """
+        Cardholders (profile, activity, category mix, usual amount), merchants by category, and the sampling
+        parameters every chunk shares.
+        """
+        try:
+            import numpy as np
+
+            config = self.synthetic_config
+            rng = np.random.default_rng(config.seed)
+            size = config.vocabulary_size
+            cards_count = max(1, config.rows // max(1, config.transactions_per_card))
+            categories = np.array(list(LEGIT_CATEGORIES), dtype=object)
+            shares = np.array([share for share, _ in LEGIT_CATEGORIES.values()])
+            shares = shares / shares.sum()
+
+            place = rng.integers(0, size, cards_count)
+            activity = rng.gamma(2.0, 1.0, cards_count)
+            age_days = rng.uniform(18, 90, cards_count) * 365.25
+            birth = np.datetime64(config.end_date, 'D') - age_days.astype('timedelta64[D]')
+            cards = {
+                'cc_num': rng.integers(4 * 10 ** 15, 5 * 10 ** 15, cards_count, dtype=np.int64),
+                'first': vocabularies['first'][rng.integers(0, size, cards_count)],
+                'last': vocabularies['last'][rng.integers(0, size, cards_count)],
+                'gender': np.array(['M', 'F'], dtype=object)[rng.integers(0, 2, cards_count)],
+                'street': vocabularies['street'][rng.integers(0, size, cards_count)],
+                'city': vocabularies['city'][place],
+                'state': vocabularies['state'][place],
+                'zip': vocabularies['zip'][place],
+                'lat': np.round(rng.uniform(24.396308, 49.384358, cards_count), 6),
+                'long': np.round(rng.uniform(-124.848974, -66.93457, cards_count), 6),
+                'city_pop': np.clip(rng.lognormal(8.5, 2.0, cards_count), 20, 3000000).astype(np.int64),
+                'job': vocabularies['job'][rng.integers(0, size, cards_count)],
+                'dob': np.datetime_as_string(birth, unit='D').astype(object),
+                'activity_cdf': np.cumsum(activity) / activity.sum(),
+                # Each card's own mix around the overall category shares
+                'category_cdf': np.cumsum(rng.dirichlet(shares * 20, cards_count), axis=1),
+                'log_amount': rng.normal(3.6, 0.3, cards_count),
+            }
+
+            # Every category gets merchants; names may repeat across merchants, as in the original data
+            merchant_categories = np.concatenate([np.arange(len(categories)),
+                                                  rng.choice(len(categories), max(0, config.merchants - len(categories)),
+                                                             p=shares)])
+            fraud_categories = np.array([int(np.flatnonzero(categories == name)[0]) for name in FRAUD_CATEGORIES])
+            fraud_profile = np.array(list(FRAUD_CATEGORIES.values()))
+            log_medians = np.zeros(len(categories))
+            log_spreads = np.zeros(len(categories))
+            log_medians[fraud_categories] = np.log(fraud_profile[:, 1])
+            log_spreads[fraud_categories] = fraud_profile[:, 2]
+
+            logging.info(f"Built {cards_count} cards and {len(merchant_categories)} merchants")
+            return {
+                'seed': config.seed,
+                'format': config.format,
+                'fraud_rate': config.fraud_rate,
+                'start_date': config.start_date,
+                'cards': cards,
+                'categories': categories,
+                'merchant_names': vocabularies['merchant'][rng.integers(0, size, len(merchant_categories))],
+                'merchants_by_category': [np.flatnonzero(merchant_categories == c) for c in range(len(categories))],
+                'legit_offsets': np.array([offset for _, offset in LEGIT_CATEGORIES.values()]),
+                'legit_hours': np.array(LEGIT_HOURS) / sum(LEGIT_HOURS),
+                'fraud_hours': np.array(FRAUD_HOURS) / sum(FRAUD_HOURS),
+                'fraud_categories': fraud_categories,
+                'fraud_shares': fraud_profile[:, 0] / fraud_profile[:, 0].sum(),
+                'fraud_log_medians': log_medians,
+                'fraud_log_spreads': log_spreads,
+            }
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def chunk_specs(self) -> list:
+        """
+        One spec per part file. Each part covers its own slice of the period, so the parts in order are chronological.
+        """
+        try:
+            config = self.synthetic_config
+            period = int((datetime.fromisoformat(config.end_date) - datetime.fromisoformat(config.start_date)).total_seconds())
+            if period <= 0:
+                raise ValueError(f"end_date {config.end_date} is not after start_date {config.start_date}")
+            chunks = max(1, math.ceil(config.rows / config.chunk_rows))
+            specs = []
+            for index in range(chunks):
+                first = index * config.chunk_rows
+                rows = min(config.chunk_rows, config.rows - first)
+                specs.append({
+                    "index": index,
+                    "rows": rows,
+                    "start_seconds": period * first // config.rows,
+                    "end_seconds": period * (first + rows) // config.rows,
+                    "file": os.path.join(config.output_dir, f"part-{index:05d}.{config.format}")
+                })
+            return specs
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def generate(self, tables: dict, specs: list) -> list:
+        """
+        Write every part, on `workers` processes (in this process when workers <= 1).
+        """
+        try:
+            os.makedirs(self.synthetic_config.output_dir, exist_ok=True)
+            # Parts of an earlier, larger run would otherwise be read along with this one
+            for stale in glob.glob(os.path.join(self.synthetic_config.output_dir, "part-*")):
+                os.remove(stale)
+
+            workers = min(self.synthetic_config.workers, len(specs))
+            if workers <= 1:
+                parts = [generate_chunk(tables, spec) for spec in specs]
+            else:
+                with multiprocessing.Pool(processes=workers, initializer=_init_worker, initargs=(tables,)) as pool:
+                    parts = []
+                    for part in pool.imap_unordered(_generate_chunk_in_worker, specs):
+                        parts.append(part)
+                        logging.info(f"Wrote {part['file']} ({len(parts)}/{len(specs)} parts)")
+            return sorted(parts, key=lambda part: part['file'])
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def merge_csv(self, parts: list, target_file: str):
+        """
+        Concatenate the CSV parts into one file (header once), e.g. in place of the ingested dataset.
+        """
+        try:
+            if self.synthetic_config.format != 'csv':
+                raise ValueError("Only csv parts can be merged into one file")
+            os.makedirs(os.path.dirname(target_file) or ".", exist_ok=True)
+            with open(target_file, 'wb') as out:
+                for position, part in enumerate(parts):
+                    with open(part['file'], 'rb') as f:
+                        header = f.readline()
+                        if position == 0:
+                            out.write(header)
+                        shutil.copyfileobj(f, out, 1024 * 1024)
+            logging.info(f"Merged {len(parts)} parts into: {target_file}")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def initiate_bulk_generation(self, merge_to: str = None) -> dict:
+        """
+        Generate the dataset and write _manifest.json next to the parts
+        (the underscore keeps it out of pd.read_parquet(output_dir)).
+        merge_to: optional path of a single CSV with every row
+        """
+        try:
+            start = time.perf_counter()
+            config = self.synthetic_config
+            tables = self.build_tables(self.build_vocabularies())
+            parts = self.generate(tables, self.chunk_specs())
+            if merge_to:
+                self.merge_csv(parts, merge_to)
+
+            seconds = time.perf_counter() - start
+            rows = sum(part['rows'] for part in parts)
+            manifest = {
+                "rows": rows,
+                "frauds": sum(part['frauds'] for part in parts),
+                "cards": len(tables['cards']['cc_num']),
+                "merchants": len(tables['merchant_names']),
+                "period": [config.start_date, config.end_date],
+                "format": config.format,
+                "seed": config.seed,
+                "files": [os.path.basename(part['file']) for part in parts],
+                "merged_file": merge_to,
+                "seconds": round(seconds, 1),
+                "rows_per_second": round(rows / seconds) if seconds else None
+            }
+            with open(os.path.join(config.output_dir, "_manifest.json"), 'w') as f:
+                json.dump(manifest, f, indent=2)
+            logging.info(f"Generated {rows} transactions ({manifest['frauds']} fraudulent) in {seconds:.1f}s "
+                         f"to: {config.output_dir}")
+            logging.info(f"{'='*20}Bulk Data Generation log completed.{'='*20} \n\n")
+            return manifest
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large synthetic transactions dataset for scale tests")
+    parser.add_argument("--rows", type=int, help="Transactions to generate (default: synthetic_data_config.rows)")
+    parser.add_argument("--fraud-rate", type=float, help="Share of fraudulent transactions")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Part file format")
+    parser.add_argument("--workers", type=int, help="Worker processes")
+    parser.add_argument("--chunk-rows", type=int, help="Rows per part file")
+    parser.add_argument("--output-dir", help="Directory of the part files")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--merge-to", help="Also write every row to this single CSV (csv format only)")
+    args = parser.parse_args()
+
+    config = get_configuration_manager().get_synthetic_data_config()
+    overrides = {"rows": args.rows, "fraud_rate": args.fraud_rate, "format": args.format, "workers": args.workers,
+                 "chunk_rows": args.chunk_rows, "output_dir": args.output_dir, "seed": args.seed}
+    config = config._replace(**{key: value for key, value in overrides.items() if value is not None})
+    manifest = BulkTransactionGenerator(config).initiate_bulk_generation(merge_to=args.merge_to)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,32 @@
-from confluent_kafka import Producer
 from faker import Faker
 from dotenv import load_dotenv
 from datetime import datetime
 import os
-import json
 import random
+import uuid
 import time
+from fraud_detection.logger.log import logging, get_sampled_logger
 
 # Load secrets from .env
 load_dotenv()
 
 fake = Faker('en_US')
 
-conf = {
-    "bootstrap.servers": os.getenv("KAFKA_BOOTSTRAP_SERVERS"),
-    "security.protocol": "SASL_SSL",
-    "sasl.mechanism": "PLAIN",
-    "sasl.username": os.getenv("KAFKA_USERNAME"),
-    "sasl.password": os.getenv("KAFKA_PASSWORD")
-}
+logger = logging.getLogger(__name__)
+delivery_logger = get_sampled_logger(f"{__name__}.delivery")
 
-producer = Producer(conf)
+def create_producer():
+    """Connect a Kafka producer using the credentials from the environment."""
+    from confluent_kafka import Producer
+
+    conf = {
+        "bootstrap.servers": os.getenv("KAFKA_BOOTSTRAP_SERVERS"),
+        "security.protocol": "SASL_SSL",
+        "sasl.mechanism": "PLAIN",
+        "sasl.username": os.getenv("KAFKA_USERNAME"),
+        "sasl.password": os.getenv("KAFKA_PASSWORD")
+    }
+    return Producer(conf)
 
 categories = ['misc_net', 'grocery_pos', 'entertainment', 'gas_transport',
               'misc_pos', 'grocery_net', 'shopping_net', 'shopping_pos',
@@ -37,67 +43,136 @@ def generate_us_longitude():
     """Generate a random longitude within the contiguous United States."""
     return round(random.uniform(-124.848974, -66.93457), 6)
 
-def generate_transaction():
+class CardPool:
+    """
+    Bounded pool of synthetic cardholders with their favourite merchants, so generated traffic has the
+    repeat-customer shape of a real feed and the expensive Faker profile values are created once per card.
+    When full, a new card replaces a random existing one (new_card_rate of the time).
+    """
+
+    def __init__(self, size: int = 10000, merchants: int = 2000, favourites: int = 5,
+                 new_card_rate: float = 0.02, favourite_rate: float = 0.8):
+        self.size = size
+        self.favourites = favourites
+        self.new_card_rate = new_card_rate
+        self.favourite_rate = favourite_rate
+        self.cards = []
+        self.merchant_count = merchants
+        self.merchants = []
+
+    def _new_merchant(self):
+        merchant = {"merchant": "fraud_" + fake.company(),
+                    "merch_lat": generate_us_latitude(),
+                    "merch_long": generate_us_longitude()}
+        self.merchants.append(merchant)
+        return merchant
+
+    def merchant(self) -> dict:
+        if len(self.merchants) < self.merchant_count:
+            return self._new_merchant()
+        return random.choice(self.merchants)
+
+    def _new_card(self) -> dict:
+        card = {
+            "cc_num": fake.credit_card_number(),
+            "first": fake.first_name(),
+            "last": fake.last_name(),
+            "gender": random.choice(genders),
+            "street": fake.street_address(),
+            "city": fake.city(),
+            "state": fake.state_abbr(),
+            "zip": fake.zipcode(),
+            "lat": float(generate_us_latitude()),
+            "long": float(generate_us_longitude()),
+            "city_pop": random.randint(20, 3000000),
+            "job": fake.job(),
+            "dob": fake.date_of_birth(minimum_age=18, maximum_age=90).strftime('%Y-%m-%d'),
+        }
+        card["favourite_merchants"] = [self.merchant() for _ in range(self.favourites)]
+        return card
+
+    def card(self) -> dict:
+        if len(self.cards) < self.size:
+            card = self._new_card()
+            self.cards.append(card)
+        elif random.random() < self.new_card_rate:
+            card = self._new_card()
+            self.cards[random.randrange(self.size)] = card
+        else:
+            card = random.choice(self.cards)
+        return card
+
+
+CARD_POOL = CardPool()
+
+def generate_transaction(card_pool: CardPool = None):
     """
-    Generate a transaction with fake data relevant to the USA.
+    Generate a transaction with fake data relevant to the USA, for a card drawn from card_pool
+    (the process-wide CARD_POOL by default).
     
     Returns:
         dict: A dictionary containing the transaction data.
     """
-    # Generate user coordinates within the USA
-    user_lat = generate_us_latitude()
-    user_long = generate_us_longitude()
-    
-    # Generate merchant coordinates within the USA
-    merch_lat = generate_us_latitude()
-    merch_long = generate_us_longitude()
-    
+    card_pool = card_pool or CARD_POOL
+    card = card_pool.card()
+
+    # Mostly the card's usual merchants, sometimes anywhere
+    if random.random() < card_pool.favourite_rate:
+        merchant = random.choice(card["favourite_merchants"])
+    else:
+        merchant = card_pool.merchant()
+
     # Ensure merchant coordinates are different from user coordinates
-    while (user_lat, user_long) == (merch_lat, merch_long):
-        merch_lat = generate_us_latitude()
-        merch_long = generate_us_longitude()
-    
+    while (card["lat"], card["long"]) == (merchant["merch_lat"], merchant["merch_long"]):
+        merchant = card_pool.merchant()
+
     trans_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    dob = fake.date_of_birth(minimum_age=18, maximum_age=90)
-    
+
     transaction_data = {
-        "transaction_id": fake.uuid4(),
+        "transaction_id": str(uuid.uuid4()),
         "trans_date_trans_time": trans_time,
-        "cc_num": fake.credit_card_number(),
-        "merchant": "fraud_" + fake.company(),
+        "cc_num": card["cc_num"],
+        "merchant": merchant["merchant"],
         "category": random.choice(categories),
         "amt": float(round(random.uniform(1, 30000), 1)),
-        "first": fake.first_name(),
-        "last": fake.last_name(),
-        "gender": random.choice(genders),
-        "street": fake.street_address(),
-        "city": fake.city(),
-        "state": fake.state_abbr(),
-        "zip": fake.zipcode(),
-        "lat": float(user_lat),
-        "long": float(user_long),
-        "city_pop": random.randint(20, 3000000),
-        "job": fake.job(),
-        "dob": dob.strftime('%Y-%m-%d'),
-        "merch_lat": float(merch_lat),
-        "merch_long": float(merch_long)
+        "first": card["first"],
+        "last": card["last"],
+        "gender": card["gender"],
+        "street": card["street"],
+        "city": card["city"],
+        "state": card["state"],
+        "zip": card["zip"],
+        "lat": card["lat"],
+        "long": card["long"],
+        "city_pop": card["city_pop"],
+        "job": card["job"],
+        "dob": card["dob"],
+        "merch_lat": float(merchant["merch_lat"]),
+        "merch_long": float(merchant["merch_long"])
     }
     return transaction_data
 
 def delivery_report(err, msg):
     if err is not None:
-        print(f"❌ Delivery failed: {err}")
+        logger.error(f"Delivery failed: {err}")
     else:
-        print(f"✅ Delivered to {msg.topic()} [{msg.partition()}]")
+        delivery_logger.info("Delivered to %s [%s]", msg.topic(), msg.partition())
 
 if __name__ == "__main__":
-    print("🚀 Kafka Producer for Real-Time Fraud Simulation Started!")
+    from fraud_detection.config.configuration import get_configuration_manager
+    from fraud_detection.streaming.serialization import get_serializer
+
+    serializer = get_serializer(get_configuration_manager().get_streaming_config().wire_format)
+    producer = create_producer()
+    logger.info(f"Kafka Producer for Real-Time Fraud Simulation Started! ({serializer.name} payloads)")
     while True:
         txn = generate_transaction()
+        payload = serializer.encode(txn)
         producer.produce(
             topic="txn_data",
-            value=json.dumps(txn),
+            value=payload,
             key=str(txn["cc_num"]),
+            headers=serializer.headers(payload),
             callback=delivery_report
         )
         producer.flush()
@@ -2,10 +2,62 @@ from collections import namedtuple
 
 DataIngestionConfig = namedtuple("DataIngestionConfig", ["dataset_download_url", "raw_data_dir", "ingested_dir"])
 
-DataValidationConfig = namedtuple("DataValidationConfig", ["clean_data_dir", "credit_card_fraud_transaction_csv_file"]) 
+DataValidationConfig = namedtuple("DataValidationConfig", ["clean_data_dir", "credit_card_fraud_transaction_csv_file", "schema_file",
+                                                           "invalid_data_file", "chunk_size"])
 
-FeatureEngineeringConfig = namedtuple("FeatureEngineeringConfig", ["engineered_data_dir", "engineered_data_file"])
+SyntheticDataConfig = namedtuple("SyntheticDataConfig", ["output_dir", "rows", "fraud_rate", "transactions_per_card",
+                                                         "merchants", "vocabulary_size", "start_date", "end_date",
+                                                         "chunk_rows", "workers", "format", "seed"])
 
-ModelTrainingConfig = namedtuple("ModelTrainingConfig", ["model_dir", "model_file", "target_column"])
+FeatureEngineeringConfig = namedtuple("FeatureEngineeringConfig", ["engineered_data_dir", "engineered_data_file", "vocabulary_file",
+                                                                   "categorical_columns", "min_category_count"])
+
+ModelTrainingConfig = namedtuple("ModelTrainingConfig", ["model_dir", "model_file", "target_column", "params", "use_tuned_params"])
 
 ModelEvaluationConfig = namedtuple("ModelEvaluationConfig", ["evaluation_dir", "evaluation_file", "shap_dir", "shap_file"])
+
+ModelOptimizationConfig = namedtuple("ModelOptimizationConfig", ["optimization_dir", "report_file", "selection_file", "variants_dir",
+                                                                 "variants", "truncate_metric", "min_importance_share",
+                                                                 "shallow_depth", "early_stopping_rounds", "recall_floor",
+                                                                 "latency_samples", "use_selected_model"])
+
+HyperparameterTuningConfig = namedtuple("HyperparameterTuningConfig", ["tuning_dir", "dataset_cache_dir", "trials_file", "best_params_file",
+                                                                       "time_budget_seconds", "max_trials", "n_jobs", "validation_size",
+                                                                       "objective_metric", "early_stopping_rounds", "random_state", "search_space"])
+
+PipelineConfig = namedtuple("PipelineConfig", ["pipeline_dir", "max_workers", "max_processes"])
+
+ProfilingConfig = namedtuple("ProfilingConfig", ["profile_dir", "sample_interval_seconds", "snapshot_interval_seconds",
+                                                 "top_entries"])
+
+IncrementalTrainingConfig = namedtuple("IncrementalTrainingConfig", ["incremental_dir", "state_file", "archive_dir", "mode",
+                                                                     "label_delay_days", "window_days", "max_aged_non_frauds",
+                                                                     "min_new_labels", "min_new_frauds", "warm_start_iterations",
+                                                                     "warm_start_learning_rate", "historical_rows",
+                                                                     "holdout_fraction", "max_auc_drop", "max_recall_drop"])
+
+StreamingConfig = namedtuple("StreamingConfig", ["topic", "group_id", "poll_timeout_seconds", "mongo_db", "fraud_collection",
+                                                 "non_fraud_collection", "replay_report_dir", "metrics_port",
+                                                 "metrics_log_interval_seconds", "lag_refresh_seconds",
+                                                 "async_max_in_flight", "async_score_workers", "async_poll_batch_size",
+                                                 "batch_size", "rules_file", "validate_messages", "dead_letter_collection",
+                                                 "dead_letter_topic", "wire_format"])
+
+ServingConfig = namedtuple("ServingConfig", ["host", "port", "max_batch_size", "max_wait_seconds", "max_queue", "max_in_flight",
+                                             "request_timeout_seconds", "apply_rules", "drain_seconds"])
+
+PreforkConfig = namedtuple("PreforkConfig", ["workers", "memory_report_dir", "memory_report_interval_seconds",
+                                             "restart_delay_seconds"])
+
+OverloadConfig = namedtuple("OverloadConfig", ["enabled", "latency_smoothing", "recover_ratio", "recover_seconds",
+                                               "fallback_model_file", "non_fraud_fields", "modes"])
+
+MembershipConfig = namedtuple("MembershipConfig", ["filter_dir", "rebuild_on_start", "dedup", "watchlists"])
+
+DriftConfig = namedtuple("DriftConfig", ["reference_profile_file", "bins", "max_categories", "window_size",
+                                         "psi_threshold", "ks_threshold", "alert_cooldown_seconds"])
+
+RollupConfig = namedtuple("RollupConfig", ["collection", "flush_interval_seconds", "granularities", "dimensions"])
+
+ArchiveConfig = namedtuple("ArchiveConfig", ["enabled", "archive_dir", "compression", "granularity", "max_rows", "max_bytes",
+                                             "max_seconds", "non_fraud_mongo", "mongo_fields"])
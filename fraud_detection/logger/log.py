@@ -1,25 +1,190 @@
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import sys
+import json
+import queue
+import atexit
+import yaml
+from fraud_detection.constant import CONFIG_FILE_PATH
 
-# Creating logs directory to store log in files
-LOG_DIR = "logs"
-LOG_DIR = os.path.join(os.getcwd(), LOG_DIR)
+try:
+    import fcntl
+except ImportError:  # not on Windows: concurrent processes of one entry point then share its file
+    fcntl = None
 
-# Creating LOG_DIR if it does not exists.
-os.makedirs(LOG_DIR, exist_ok=True)
+# Defaults used when config/config.yaml has no logging_config section (or cannot be read)
+DEFAULT_LOGGING_CONFIG = {
+    "log_dir": "logs",
+    "log_file": "{process}.log",
+    "format": "json",
+    "rotation": "size",
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "when": "midnight",
+    "console": True,
+    "console_level": "INFO",
+    "levels": {"root": "INFO"},
+    "transaction_sample_rate": 1000,
+}
 
-# Creating file name for log file based on current timestamp
-CURRENT_TIME_STAMP = f"{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}"
-file_name = f"log_{CURRENT_TIME_STAMP}.log"
+TEXT_FORMAT = '[%(asctime)s] %(name)s - %(levelname)s - %(message)s'
 
-# Creating file path for projects.
-log_file_path = os.path.join(LOG_DIR, file_name)
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a JSON field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
 
-# Configuring logger
-logging.basicConfig(
-    filename=log_file_path,
-    filemode='w',
-    format='[%(asctime)s] %(name)s - %(levelname)s - %(message)s',
-    level=logging.NOTSET
-)
\ No newline at end of file
+
+def _load_logging_config() -> dict:
+    config = dict(DEFAULT_LOGGING_CONFIG)
+    try:
+        with open(CONFIG_FILE_PATH, 'rb') as yaml_file:
+            config.update((yaml.safe_load(yaml_file) or {}).get("logging_config") or {})
+    except (OSError, yaml.YAMLError):
+        pass
+    return config
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, message, plus any `extra=` fields.
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": f"{self.formatTime(record, '%Y-%m-%dT%H:%M:%S')}.{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SampledLogger:
+    """
+    Emits one in every `every` debug / info calls, for per-transaction events that would otherwise flood the log.
+    Each level has its own counter. Warnings (rejected, duplicate or skipped transactions) are never sampled.
+    A skipped call costs a counter increment; the message is only formatted when it is emitted.
+    """
+
+    def __init__(self, logger: logging.Logger, every: int):
+        self.logger = logger
+        self.every = max(1, int(every))
+        self._calls = {logging.DEBUG: 0, logging.INFO: 0}
+
+    def _log(self, level, msg, args, kwargs):
+        calls = self._calls[level] = self._calls[level] + 1
+        if calls % self.every == 0 and self.logger.isEnabledFor(level):
+            extra = kwargs.pop("extra", None) or {}
+            extra["sampled_every"] = self.every
+            self.logger.log(level, msg, *args, extra=extra, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self._log(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self._log(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.logger.warning(msg, *args, **kwargs)
+
+
+def get_sampled_logger(name: str, every: int = None) -> SampledLogger:
+    """
+    Sampled logger for per-transaction events; defaults to logging_config.transaction_sample_rate.
+    """
+    return SampledLogger(logging.getLogger(name), every or LOGGING_CONFIG["transaction_sample_rate"])
+
+
+def _build_file_handler(config: dict, log_file_path: str) -> logging.Handler:
+    if config["rotation"] == "time":
+        return logging.handlers.TimedRotatingFileHandler(log_file_path, when=config["when"],
+                                                         backupCount=config["backup_count"], encoding="utf-8")
+    return logging.handlers.RotatingFileHandler(log_file_path, maxBytes=config["max_bytes"],
+                                                backupCount=config["backup_count"], encoding="utf-8")
+
+
+# Lock files of the log files this process writes, held open (and locked) until it exits
+_LOG_FILE_LOCKS = []
+
+
+def _claim_log_file(log_dir: str, log_file: str, process_name: str) -> str:
+    """
+    <log_file> for process_name, or the one for <process_name>_<pid> while another live process holds it,
+    so two runs of one entry point never write and rotate the same file.
+    """
+    log_file_path = os.path.join(log_dir, log_file.format(process=process_name))
+    if fcntl is None:
+        return log_file_path
+    lock = open(f"{log_file_path}.lock", "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return os.path.join(log_dir, log_file.format(process=f"{process_name}_{os.getpid()}"))
+    _LOG_FILE_LOCKS.append(lock)
+    return log_file_path
+
+
+def configure_logging(config: dict, suffix: str = "") -> logging.handlers.QueueListener:
+    """
+    Route every record through a QueueHandler so callers never block on disk or console I/O;
+    a single listener thread formats and writes them to the rotating file (and console).
+    suffix: appended to the file's process name, for processes sharing an entry point (forked workers).
+    """
+    # One file per entry point (main, consumer, producer, ...); a second live copy of one gets a file of its own
+    process_name = os.path.splitext(os.path.basename(sys.argv[0]))[0] if sys.argv and sys.argv[0] else ""
+    if not process_name or process_name.startswith("-"):
+        # `python -c ...` / interactive sessions
+        process_name = "python"
+    process_name += suffix
+    log_dir = os.path.join(os.getcwd(), config["log_dir"])
+    os.makedirs(log_dir, exist_ok=True)
+    log_file_path = _claim_log_file(log_dir, config["log_file"], process_name)
+
+    formatter = JsonFormatter() if config["format"] == "json" else logging.Formatter(TEXT_FORMAT)
+    file_handler = _build_file_handler(config, log_file_path)
+    file_handler.setFormatter(formatter)
+    handlers = [file_handler]
+
+    if config["console"]:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        console_handler.setLevel(config["console_level"])
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    levels = dict(config["levels"])
+    root.setLevel(os.getenv("LOG_LEVEL", levels.pop("root", "INFO")))
+    for logger_name, level in levels.items():
+        logging.getLogger(logger_name).setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+LOGGING_CONFIG = _load_logging_config()
+LOG_DIR = os.path.join(os.getcwd(), LOGGING_CONFIG["log_dir"])
+_listener = configure_logging(LOGGING_CONFIG)
+
+
+def restart_logging(suffix: str) -> logging.handlers.QueueListener:
+    """
+    For a process created with os.fork(): the listener thread is not inherited, so records would queue up unwritten.
+    Starts a new listener writing to <process><suffix>.log; stop it before os._exit to flush what is queued.
+    """
+    global _listener
+    _listener = configure_logging(LOGGING_CONFIG, suffix)
+    return _listener
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from fraud_detection.logger.log import logging
+from fraud_detection.exception.exception_handler import CustomException
+
+try:
+    import resource
+except ImportError:  # Windows: no peak memory figures
+    resource = None
+
+# One unit of work. inputs: artifact names passed to func positionally; outputs: names for what func returns
+# (a tuple when there are several); after: tasks that must finish first without passing anything along;
+# kind: "thread", or "process" for CPU-bound pure-Python work (func and its inputs must then be picklable)
+Task = namedtuple("Task", ["name", "func", "inputs", "outputs", "after", "kind"])
+
+
+def task(name: str, func, inputs=(), outputs=(), after=(), kind: str = "thread") -> Task:
+    if kind not in ("thread", "process"):
+        raise ValueError(f"Unknown task kind '{kind}', expected thread or process")
+    return Task(name, func, tuple(inputs), tuple(outputs), tuple(after), kind)
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_measured(func, args):
+    """
+    Run func(*args) and measure it in the process it runs in: wall time, CPU time of the whole process
+    (every thread, so CatBoost's own thread pool counts) and the process's peak RSS.
+    """
+    peak_before = _peak_rss_mb()
+    times_before = os.times()
+    start = time.perf_counter()
+    result = func(*args)
+    wall = time.perf_counter() - start
+    times_after = os.times()
+    peak_after = _peak_rss_mb()
+    stats = {
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round((times_after.user - times_before.user) + (times_after.system - times_before.system), 3),
+        "peak_rss_mb": round(peak_after, 1) if peak_after is not None else None,
+        "rss_growth_mb": round(peak_after - peak_before, 1) if peak_after is not None else None,
+        "pid": os.getpid()
+    }
+    return result, stats
+
+
+class DAGExecutor:
+    """
+    Runs each task as soon as the tasks producing its inputs (and those in its `after`) are done,
+    at most max_workers at once. Thread tasks run in this process; process tasks go to a pool of
+    max_processes workers (or run on threads when max_processes is 0).
+    Artifacts are dropped once every task reading them has finished; run() returns the ones nothing reads.
+
+    CPU time and peak memory are process-wide: for a task that overlapped others in the same process
+    (see concurrent_with in the report), they include the other tasks' share.
+    profiler: optional utils.profiling.Profiler; each task then runs as one of its sections.
+    """
+
+    def __init__(self, tasks: list, max_workers: int = 1, max_processes: int = 0, profiler=None):
+        self.tasks = list(tasks)
+        self.max_workers = max(1, int(max_workers))
+        self.max_processes = max(0, int(max_processes))
+        self.profiler = profiler
+        self.dependencies = self.resolve_dependencies()
+        self.report = None
+
+    def resolve_dependencies(self) -> dict:
+        """
+        Task name -> names of the tasks it waits for. Rejects duplicate names and outputs,
+        inputs nothing produces, unknown `after` tasks and cycles.
+        """
+        try:
+            names = [t.name for t in self.tasks]
+            duplicates = sorted(name for name, count in Counter(names).items() if count > 1)
+            if duplicates:
+                raise ValueError(f"Duplicate task names: {duplicates}")
+
+            producers = {}
+            for t in self.tasks:
+                for output in t.outputs:
+                    if output in producers:
+                        raise ValueError(f"Artifact '{output}' is produced by both {producers[output]} and {t.name}")
+                    producers[output] = t.name
+
+            dependencies = {}
+            for t in self.tasks:
+                missing = [name for name in t.inputs if name not in producers]
+                if missing:
+                    raise ValueError(f"Task {t.name} reads {missing}, which no task produces")
+                unknown = [name for name in t.after if name not in names]
+                if unknown:
+                    raise ValueError(f"Task {t.name} runs after unknown tasks {unknown}")
+                dependencies[t.name] = {producers[name] for name in t.inputs} | set(t.after)
+
+            # Kahn's algorithm: whatever never becomes ready is on a cycle
+            done, remaining = set(), set(names)
+            while remaining:
+                ready = {name for name in remaining if dependencies[name] <= done}
+                if not ready:
+                    raise ValueError(f"Dependency cycle between tasks {sorted(remaining)}")
+                done |= ready
+                remaining -= ready
+            return dependencies
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def run(self) -> dict:
+        """
+        Run every task. On a failure no new task is started; the running ones finish, then the error is raised.
+        Returns the final artifacts; the run report is left in self.report.
+        """
+        try:
+            readers = Counter(name for t in self.tasks for name in t.inputs)
+            artifacts, records, done, running = {}, {}, set(), {}
+            pending = list(self.tasks)
+            error = None
+
+            process_pool = None
+            if self.max_processes and any(t.kind == "process" for t in self.tasks):
+                process_pool = ProcessPoolExecutor(max_workers=self.max_processes)
+                # Start the workers now, before any pipeline thread is running, so they never fork mid-task
+                process_pool.submit(os.getpid).result()
+            thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline")
+
+            started_at = datetime.now()
+            run_start = time.perf_counter()
+            logging.info(f"Running {len(self.tasks)} pipeline tasks on up to {self.max_workers} workers "
+                         f"({self.max_processes} processes)")
+            try:
+                while running or (pending and error is None):
+                    if error is None:
+                        # Declaration order among the ready tasks, so max_workers=1 runs the DAG as written
+                        for t in [t for t in pending if self.dependencies[t.name] <= done]:
+                            if len(running) >= self.max_workers:
+                                break
+                            pending.remove(t)
+                            pool = process_pool if t.kind == "process" and process_pool else thread_pool
+                            records[t.name] = {"task": t.name, "kind": t.kind if pool is process_pool else "thread",
+                                               "start_seconds": round(time.perf_counter() - run_start, 3)}
+                            logging.info(f"Task {t.name} started")
+                            func = t.func if self.profiler is None else self.profiler.wrap(t.name, t.func)
+                            running[pool.submit(_run_measured, func, tuple(artifacts[name] for name in t.inputs))] = t
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        t = running.pop(future)
+                        record = records[t.name]
+                        record["end_seconds"] = round(time.perf_counter() - run_start, 3)
+                        try:
+                            result, stats = future.result()
+                        except Exception as e:
+                            record.update(status="failed", error=str(e))
+                            logging.error(f"Task {t.name} failed: {e}")
+                            error = error or e
+                            continue
+
+                        record.update(status="succeeded", **stats)
+                        done.add(t.name)
+                        logging.info(f"Task {t.name} finished in {stats['wall_seconds']}s "
+                                     f"(cpu {stats['cpu_seconds']}s, peak rss {stats['peak_rss_mb']} MB)")
+                        self.store_outputs(t, result, artifacts)
+                        for name in t.inputs:
+                            readers[name] -= 1
+                            if not readers[name]:
+                                artifacts.pop(name, None)
+            finally:
+                thread_pool.shutdown(wait=True)
+                if process_pool is not None:
+                    process_pool.shutdown(wait=True)
+
+                for t in pending:
+                    records[t.name] = {"task": t.name, "kind": t.kind, "status": "skipped"}
+                self.report = self.build_report(records, started_at, time.perf_counter() - run_start, error)
+
+            if error is not None:
+                raise error
+            logging.info(f"Pipeline finished in {self.report['wall_seconds']}s "
+                         f"({self.report['task_seconds']}s of task time)")
+            return artifacts
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def store_outputs(self, t: Task, result, artifacts: dict):
+        if not t.outputs:
+            return
+        if len(t.outputs) == 1:
+            artifacts[t.outputs[0]] = result
+            return
+        if not isinstance(result, tuple) or len(result) != len(t.outputs):
+            raise ValueError(f"Task {t.name} should return {len(t.outputs)} values {list(t.outputs)}")
+        artifacts.update(zip(t.outputs, result))
+
+    def build_report(self, records: dict, started_at: datetime, wall_seconds: float, error) -> dict:
+        tasks = [records[t.name] for t in self.tasks if t.name in records]
+        timed = [r for r in tasks if "end_seconds" in r]
+        for record in timed:
+            record["concurrent_with"] = [other["task"] for other in timed if other is not record
+                                         and other["start_seconds"] < record["end_seconds"]
+                                         and record["start_seconds"] < other["end_seconds"]]
+        return {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "status": "failed" if error is not None else "succeeded",
+            "wall_seconds": round(wall_seconds, 3),
+            # Sum of the task wall times: what a serial run would roughly take
+            "task_seconds": round(sum(r.get("wall_seconds", 0) for r in timed), 3),
+            "max_workers": self.max_workers,
+            "max_processes": self.max_processes,
+            "tasks": tasks
+        }
+
+    def save_report(self, report_dir: str) -> str:
+        """
+        Write the last run's report to report_dir/run_<timestamp>.json.
+        """
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            report_file = os.path.join(report_dir, f"run_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.json")
+            with open(report_file, 'w') as f:
+                json.dump(self.report, f, indent=2)
+            logging.info(f"Pipeline run report saved to: {report_file}")
+            return report_file
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
@@ -1,18 +1,100 @@
+from fraud_detection.config.configuration import get_configuration_manager
 from fraud_detection.components.stage_00_data_ingestion import DataIngestion
 from fraud_detection.components.stage_01_data_validation import DataValidation
-from fraud_detection.components.stage_02_feature_engineering import FeatureEngineering
+from fraud_detection.components.stage_02_feature_engineering import (FeatureEngineering, COORDINATE_COLUMNS,
+                                                                      DROP_COLUMNS)
 from fraud_detection.components.stage_03_model_training import ModelTraining
 from fraud_detection.components.stage_04_model_evaluation import ModelEvaluation
+from fraud_detection.components.stage_05_hyperparameter_tuning import HyperparameterTuning
+from fraud_detection.components.stage_06_model_optimization import ModelOptimization
+from fraud_detection.pipeline.dag import DAGExecutor, task
+from fraud_detection.utils.profiling import Profiler
 
 
 class TrainingPipeline:
-    def __init__(self):
+    def __init__(self, run_tuning: bool = False, run_optimization: bool = False, profilers: tuple = ()):
+        """
+        profilers: utils.profiling.PROFILERS to run on every task (none by default)
+        """
+        self.run_tuning = run_tuning
+        self.run_optimization = run_optimization
+        app_config = get_configuration_manager()
+        self.pipeline_config = app_config.get_pipeline_config()
+        self.profiler = Profiler.from_config(app_config.get_profiling_config(), profilers, "training") if profilers else None
         self.data_ingestion = DataIngestion()
         self.data_validation = DataValidation()
         self.feature_engineering = FeatureEngineering()
+        self.hyperparameter_tuning = HyperparameterTuning() if run_tuning else None
         self.model_training = ModelTraining()
         self.model_evaluation = ModelEvaluation()
+        self.model_optimization = ModelOptimization() if run_optimization else None
+
 
+    def load_clean_data(self):
+        """
+        The validated data, and a copy of its coordinates for the distance task (small enough to send to a worker).
+        """
+        df = self.feature_engineering.load_clean_data()
+        return df, df[COORDINATE_COLUMNS].copy()
+
+    def assemble_features(self, df, distance_km):
+        df['distance_km'] = distance_km
+        return df.drop(columns=DROP_COLUMNS)
+
+    def build_tasks(self) -> list:
+        """
+        The pipeline's tasks. Beyond the stage order, these run concurrently:
+        customer-merchant distances (in a worker process) with the categorical encoding and the date features,
+        the drift reference profile and the evaluation data loading with model training,
+        and evaluation metrics with SHAP values.
+        """
+        feature_engineering, evaluation = self.feature_engineering, self.model_evaluation
+        training_after = ["save_engineered_data"]
+
+        tasks = [
+            task("data_ingestion", self.data_ingestion.initiate_data_ingestion),
+            task("data_validation", self.data_validation.initiate_data_validation, after=["data_ingestion"]),
+
+            task("load_clean_data", self.load_clean_data, outputs=["clean_df", "coordinates"],
+                 after=["data_validation"]),
+            task("calculate_distance", feature_engineering.distance_km, inputs=["coordinates"],
+                 outputs=["distance_km"], kind="process"),
+            task("handle_missing_values", feature_engineering.handle_missing_values, inputs=["clean_df"],
+                 outputs=["filled_df"]),
+            task("convert_data_types", feature_engineering.convert_data_types, inputs=["filled_df"],
+                 outputs=["encoded_df"]),
+            task("create_new_features", feature_engineering.create_new_features, inputs=["encoded_df"],
+                 outputs=["featured_df"]),
+            task("assemble_features", self.assemble_features, inputs=["featured_df", "distance_km"],
+                 outputs=["engineered_df"]),
+            task("save_engineered_data", feature_engineering.save_engineered_data, inputs=["engineered_df"]),
+            task("save_reference_profile", feature_engineering.save_reference_profile, inputs=["engineered_df"]),
+        ]
+
+        if self.run_tuning:
+            tasks.append(task("hyperparameter_tuning", self.hyperparameter_tuning.initiate_hyperparameter_tuning,
+                              after=["save_engineered_data"]))
+            training_after = ["hyperparameter_tuning"]
+
+        tasks += [
+            task("model_training", self.model_training.initiate_model_training, after=training_after),
+
+            task("load_evaluation_data", evaluation.load_data, outputs=["X_eval", "y_eval"],
+                 after=["save_engineered_data"]),
+            task("load_trained_model", evaluation.load_model, outputs=["model"], after=["model_training"]),
+            task("calculate_metrics", evaluation.calculate_metrics, inputs=["model", "X_eval", "y_eval"],
+                 outputs=["metrics"]),
+            task("generate_shap_values", evaluation.generate_shap_values, inputs=["model", "X_eval"],
+                 outputs=["shap_values"]),
+            task("save_evaluation_report", evaluation.save_evaluation_report, inputs=["metrics"]),
+            task("save_shap_values", evaluation.save_shap_values, inputs=["shap_values"]),
+        ]
+
+        if self.run_optimization:
+            # Reads the SHAP values back for the slim variant
+            tasks.append(task("model_optimization", self.model_optimization.initiate_model_optimization,
+                              after=["save_shap_values", "save_evaluation_report"]))
+        return tasks
 
     def start_training_pipeline(self):
         """
@@ -20,13 +102,13 @@ class TrainingPipeline:
         :return: none
         """
         try:
-            self.data_ingestion.initiate_data_ingestion()
-            self.data_validation.initiate_data_validation()
-            self.feature_engineering.initiate_feature_engineering()
-            self.model_training.initiate_model_training()
-            self.model_evaluation.initiate_model_evaluation()
-            
+            executor = DAGExecutor(self.build_tasks(), max_workers=self.pipeline_config.max_workers,
+                                   max_processes=self.pipeline_config.max_processes, profiler=self.profiler)
+            try:
+                executor.run()
+            finally:
+                if executor.report is not None:
+                    executor.save_report(self.pipeline_config.pipeline_dir)
+
         except Exception as e:
             raise e
-
-        
\ No newline at end of file
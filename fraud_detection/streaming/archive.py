@@ -0,0 +1,422 @@
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timezone
+from fraud_detection.logger.log import logging
+from fraud_detection.streaming.metrics import STREAMING_METRICS, StreamingMetrics
+from fraud_detection.utils.util import read_yaml_file
+
+logger = logging.getLogger(__name__)
+
+# Parquet type per schema.yaml type; dates stay "YYYY-MM-DD[ HH:MM:SS]" strings, as in MongoDB, and union types
+# (cc_num, zip) are stored as strings
+ARROW_TYPES = {"string": "string", "integer": "int64", "number": "float64", "datetime": "string", "date": "string"}
+# Set by the streaming path on top of the raw fields; rule_decision is kept as JSON
+SCORED_FIELDS = {"is_fraud": "int64", "fraud_score": "float64", "decision_source": "string", "rule_decision": "json"}
+# Hive partition directories by event time: date=YYYY-MM-DD/hour=HH
+PARTITION_FIELDS = ("date", "hour")
+GRANULARITIES = ("hour", "day")
+NON_FRAUD_MONGO = ("full", "slim", "none")
+
+
+def archive_columns(schema_file: str, section: str = "TRANSACTION_COLUMNS") -> dict:
+    """
+    Column name -> archive type ("string", "int64", "float64" or "json"): the raw transaction columns of
+    schema.yaml, then the scoring fields.
+    """
+    columns = {}
+    for name, spec in read_yaml_file(schema_file)[section].items():
+        types = spec["type"] if isinstance(spec["type"], list) else [spec["type"]]
+        columns[name] = ARROW_TYPES[types[0]] if len(types) == 1 else "string"
+    for name, column_type in SCORED_FIELDS.items():
+        columns.setdefault(name, column_type)
+    return columns
+
+
+def _coerce(value, column_type: str):
+    if value is None or value == "":
+        return None
+    if column_type == "json":
+        return json.dumps(value, default=str)
+    if column_type == "string":
+        return value if isinstance(value, str) else str(value)
+    if column_type == "int64":
+        return int(value)
+    return float(value)
+
+
+def _to_array(values: list, column_type: str):
+    import pyarrow
+
+    arrow_type = pyarrow.string() if column_type == "json" else getattr(pyarrow, column_type)()
+    if column_type != "json":
+        try:
+            return pyarrow.array(values, type=arrow_type)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, TypeError, ValueError):
+            # A value of another type (an integer cc_num, a float is_fraud): convert one by one
+            pass
+    return pyarrow.array([_coerce(value, column_type) for value in values], type=arrow_type)
+
+
+def _with_keys(columns: list) -> list:
+    return list(columns) + [key for key in ("transaction_id", "trans_date_trans_time") if key not in columns]
+
+
+class ParquetArchive:
+    """
+    Columnar archive of scored transactions: rows are buffered per event-time partition and written as
+    compressed Parquet part files to archive_dir/date=YYYY-MM-DD/ (and hour=HH/ below it with granularity "hour")
+    once max_rows rows, about max_bytes bytes or max_seconds seconds have built up (checked as rows are added).
+    Like RollupAggregator, the buffer is drained to be written and restored when the write fails.
+    Part files appear atomically (written under a dot name, then renamed), so readers never see half a file.
+    """
+
+    def __init__(self, archive_dir: str, columns: dict, compression: str = "zstd", granularity: str = "day",
+                 max_rows: int = 100000, max_bytes: int = 64 * 1024 ** 2, max_seconds: float = 300.0):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("The Parquet archive needs pyarrow (listed in requirements.txt): pip install pyarrow") from e
+        if compression.lower() != "none" and not pyarrow.Codec.is_available(compression):
+            raise ValueError(f"This pyarrow build has no '{compression}' codec; install the PyPI wheel "
+                             f"(pip install pyarrow) or set archive_config.compression")
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown archive granularity '{granularity}', expected one of {GRANULARITIES}")
+        self.archive_dir = archive_dir
+        self.columns = dict(columns)
+        self.compression = compression
+        self.granularity = granularity
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.schema = pyarrow.schema([(name, pyarrow.string() if column_type == "json" else getattr(pyarrow, column_type)())
+                                      for name, column_type in self.columns.items()])
+        # partition -> column -> values
+        self.buffers = {}
+        self.rows = 0
+        # Buffered size is estimated from the Arrow size per row of the last part written
+        self.row_bytes = 512.0
+        self.first_row_at = None
+        self._sequence = 0
+
+    @classmethod
+    def from_config(cls, archive_config, schema_file: str):
+        return cls(archive_config.archive_dir, archive_columns(schema_file), compression=archive_config.compression,
+                   granularity=archive_config.granularity, max_rows=archive_config.max_rows,
+                   max_bytes=archive_config.max_bytes, max_seconds=archive_config.max_seconds)
+
+    def partition(self, txn: dict) -> tuple:
+        event_time = txn.get("trans_date_trans_time")
+        if not isinstance(event_time, str) or len(event_time) < 13:
+            # Malformed event time: file it under processing time rather than dropping it
+            event_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H")
+        return (event_time[:10], event_time[11:13]) if self.granularity == "hour" else (event_time[:10],)
+
+    def add_many(self, txns: list):
+        if not txns:
+            return
+        names = list(self.columns)
+        for txn in txns:
+            key = self.partition(txn)
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                buffer = self.buffers[key] = {name: [] for name in names}
+            get = txn.get
+            for name in names:
+                buffer[name].append(get(name))
+        if self.first_row_at is None:
+            self.first_row_at = time.monotonic()
+        self.rows += len(txns)
+
+    def due(self) -> bool:
+        if not self.rows:
+            return False
+        return (self.rows >= self.max_rows or self.rows * self.row_bytes >= self.max_bytes
+                or time.monotonic() - self.first_row_at >= self.max_seconds)
+
+    def drain(self) -> dict:
+        buffers, self.buffers = self.buffers, {}
+        self.rows = 0
+        self.first_row_at = None
+        return buffers
+
+    def restore(self, buffers: dict):
+        """
+        Merge back buffers whose write failed, so they are written with the next part.
+        """
+        for key, buffer in buffers.items():
+            current = self.buffers.get(key)
+            if current is None:
+                self.buffers[key] = buffer
+            else:
+                for name, values in buffer.items():
+                    current[name].extend(values)
+            self.rows += len(next(iter(buffer.values()), []))
+        if self.rows and self.first_row_at is None:
+            self.first_row_at = time.monotonic()
+
+    def partition_dir(self, key: tuple) -> str:
+        return os.path.join(self.archive_dir, *(f"{field}={value}" for field, value in zip(PARTITION_FIELDS, key)))
+
+    def write(self, buffers: dict) -> list:
+        """
+        One part file per partition in buffers, each removed from buffers once written (so on a failure,
+        buffers holds what is left to write). Returns the files written.
+        """
+        import pyarrow
+        import pyarrow.parquet as pyarrow_parquet
+
+        written, rows, nbytes = [], 0, 0
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        for key, buffer in list(buffers.items()):
+            table = pyarrow.table([_to_array(buffer[name], column_type) for name, column_type in self.columns.items()],
+                                  schema=self.schema)
+            directory = self.partition_dir(key)
+            os.makedirs(directory, exist_ok=True)
+            self._sequence += 1
+            name = f"part-{stamp}-{os.getpid()}-{self._sequence:06d}.parquet"
+            temporary = os.path.join(directory, f".{name}")
+            pyarrow_parquet.write_table(table, temporary, compression=self.compression)
+            os.replace(temporary, os.path.join(directory, name))
+            written.append(os.path.join(directory, name))
+            del buffers[key]
+            rows += table.num_rows
+            nbytes += table.nbytes
+        if rows:
+            self.row_bytes = nbytes / rows
+        return written
+
+    def dataset(self):
+        import pyarrow
+        import pyarrow.dataset as pyarrow_dataset
+
+        fields = PARTITION_FIELDS if self.granularity == "hour" else PARTITION_FIELDS[:1]
+        partitioning = pyarrow_dataset.partitioning(pyarrow.schema([(field, pyarrow.string()) for field in fields]),
+                                                    flavor="hive")
+        return pyarrow_dataset.dataset(self.archive_dir, format="parquet", partitioning=partitioning,
+                                       schema=pyarrow.unify_schemas([self.schema, partitioning.schema]))
+
+    def dates(self) -> list:
+        """
+        The archived dates, oldest first.
+        """
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(entry[len("date="):] for entry in os.listdir(self.archive_dir) if entry.startswith("date="))
+
+    def read_between(self, columns: list, since: str = None, until: str = None, limit: int = None):
+        """
+        Archived rows with since < trans_date_trans_time <= until (either bound optional), oldest first,
+        at most limit of them; read a date partition at a time, so only what is needed is scanned.
+        Returns a pandas DataFrame with `columns`.
+        """
+        dates = [day for day in self.dates() if (since is None or day >= since[:10]) and (until is None or day <= until[:10])]
+        if not dates:
+            return self.schema.empty_table().select(columns).to_pandas()
+        import pyarrow
+        import pyarrow.compute as pyarrow_compute
+
+        read_columns = _with_keys(columns)
+        dataset, event_time = self.dataset(), pyarrow_compute.field("trans_date_trans_time")
+        tables, rows = [], 0
+        for day in dates:
+            condition = pyarrow_compute.field("date") == day
+            if since is not None:
+                condition &= event_time > since
+            if until is not None:
+                condition &= event_time <= until
+            table = dataset.to_table(columns=read_columns, filter=condition)
+            tables.append(table)
+            rows += table.num_rows
+            if limit is not None and rows >= limit:
+                break
+        df = pyarrow.concat_tables(tables).to_pandas()
+        df = df.sort_values("trans_date_trans_time", kind="stable").drop_duplicates("transaction_id")
+        return (df.head(limit) if limit is not None else df)[columns].reset_index(drop=True)
+
+    def read_ids(self, columns: list, transaction_ids: list, since: str = None, until: str = None):
+        """
+        Archived rows of the given transaction_ids (the first copy of each), optionally within an event-time
+        range so only those date partitions are scanned. Returns a pandas DataFrame with `columns`.
+        """
+        if not transaction_ids or not self.dates():
+            return self.schema.empty_table().select(columns).to_pandas()
+        import pyarrow.compute as pyarrow_compute
+
+        condition = pyarrow_compute.field("transaction_id").isin(list(transaction_ids))
+        if since is not None:
+            condition &= pyarrow_compute.field("date") >= since[:10]
+        if until is not None:
+            condition &= pyarrow_compute.field("date") <= until[:10]
+        df = self.dataset().to_table(columns=_with_keys(columns), filter=condition).to_pandas()
+        return df.drop_duplicates("transaction_id")[columns].reset_index(drop=True)
+
+
+class ArchivingSink:
+    """
+    Wraps a sink: non-fraud transactions go to the ParquetArchive instead of the sink's non-fraud collection,
+    which gets full documents, a slim projection (mongo_fields) or nothing, per non_fraud_mongo.
+    Frauds are passed through untouched. The archive is written whenever it is due, and on flush() / close().
+    Non-fraud documents are held back until their rows are on disk, so a crash never leaves a transaction in
+    MongoDB (where the dedup lookups would drop its redelivery) but not in the archive.
+    checkpoint / on_durable: set by a consumer that commits Kafka offsets itself (see track_offsets).
+    """
+
+    def __init__(self, sink, archive: ParquetArchive, non_fraud_mongo: str = "slim", mongo_fields=(),
+                 metrics: StreamingMetrics = STREAMING_METRICS):
+        if non_fraud_mongo not in NON_FRAUD_MONGO:
+            raise ValueError(f"Unknown non_fraud_mongo '{non_fraud_mongo}', expected one of {NON_FRAUD_MONGO}")
+        self.sink = sink
+        self.archive = archive
+        self.non_fraud_mongo = non_fraud_mongo
+        self.mongo_fields = list(mongo_fields)
+        self.metrics = metrics
+        # Non-fraud documents for the wrapped sink, written once the archive holding their rows is
+        self.deferred = []
+        self.checkpoint = None
+        self.on_durable = None
+
+    def track_offsets(self, checkpoint, on_durable):
+        """
+        checkpoint() is called as the buffer is drained for writing and returns the consumer offsets below which
+        every message is either persisted already or in that buffer; on_durable(offsets) is called with them
+        once the archive and the held-back documents are written.
+        """
+        self.checkpoint = checkpoint
+        self.on_durable = on_durable
+
+    def split(self, txns: list) -> tuple:
+        """
+        (non-frauds for the archive, frauds, non-fraud documents for the wrapped sink)
+        """
+        non_frauds = [txn for txn in txns if txn["is_fraud"] != 1]
+        frauds = [txn for txn in txns if txn["is_fraud"] == 1] if non_frauds else txns
+        if self.non_fraud_mongo == "full":
+            return non_frauds, frauds, non_frauds
+        if self.non_fraud_mongo == "none":
+            return non_frauds, frauds, []
+        fields = self.mongo_fields
+        return non_frauds, frauds, [{field: txn[field] for field in fields if field in txn} for txn in non_frauds]
+
+    def add(self, txns: list) -> list:
+        """
+        Buffer the non-frauds of txns; returns the frauds, for the wrapped sink now.
+        """
+        non_frauds, frauds, documents = self.split(txns)
+        # Buffered before the wrapped sink adds its own fields (location, _id) to shared documents
+        self.archive.add_many(non_frauds)
+        self.deferred.extend(documents)
+        self.metrics.archived.inc(len(non_frauds))
+        return frauds
+
+    def drain(self) -> tuple:
+        """
+        (offsets from checkpoint, archive buffers, held-back documents), taken together.
+        """
+        offsets = self.checkpoint() if self.checkpoint is not None else None
+        deferred, self.deferred = self.deferred, []
+        return offsets, self.archive.drain(), deferred
+
+    def write_failed(self, buffers: dict, deferred: list, e: Exception):
+        self.archive.restore(buffers)
+        self.deferred[:0] = deferred
+        self.metrics.archive_flush_failures.inc()
+        logger.error(f"Archive write of {len(buffers)} partitions failed, will retry: {e}")
+
+    def documents_failed(self, deferred: list, e: Exception):
+        # Like a failed batch write in the consumer: counted and logged, not retried (a bulk insert may have
+        # stored some of them). Their rows are archived; the offsets are committed with a later flush
+        self.metrics.failed.inc(len(deferred))
+        logger.error(f"Writing {len(deferred)} non-fraud documents after their archive flush failed: {e}")
+
+    def write_many(self, txns: list):
+        frauds = self.add(txns)
+        if frauds:
+            self.sink.write_many(frauds)
+        if self.archive.due():
+            self.flush_archive()
+
+    def write(self, txn: dict):
+        self.write_many([txn])
+
+    def flush_archive(self):
+        offsets, buffers, deferred = self.drain()
+        if buffers:
+            t0 = time.perf_counter()
+            try:
+                files = self.archive.write(buffers)
+            except Exception as e:
+                self.write_failed(buffers, deferred, e)
+                return
+            self.metrics.archive_flush.observe(time.perf_counter() - t0)
+            logger.info(f"Archived {len(files)} part files to: {self.archive.archive_dir}")
+        try:
+            if deferred:
+                self.sink.write_many(deferred)
+        except Exception as e:
+            self.documents_failed(deferred, e)
+            return
+        if self.on_durable is not None and offsets is not None:
+            self.on_durable(offsets)
+
+    def flush(self):
+        self.sink.flush()
+        self.flush_archive()
+
+    def close(self):
+        self.flush_archive()
+        self.sink.close()
+
+
+class AsyncArchivingSink(ArchivingSink):
+    """
+    ArchivingSink for async sinks. Rows are buffered on the event loop; part files are written on the
+    loop's default thread pool from a drained buffer, so writes keep being accepted meanwhile.
+    """
+
+    async def write(self, txn: dict):
+        await self.write_many([txn])
+
+    async def write_many(self, txns: list):
+        for txn in self.add(txns):
+            await self.sink.write(txn)
+        if self.archive.due():
+            await self.flush_archive()
+
+    async def flush_archive(self):
+        offsets, buffers, deferred = self.drain()
+        if buffers:
+            t0 = time.perf_counter()
+            try:
+                files = await asyncio.get_running_loop().run_in_executor(None, self.archive.write, buffers)
+            except Exception as e:
+                self.write_failed(buffers, deferred, e)
+                return
+            self.metrics.archive_flush.observe(time.perf_counter() - t0)
+            logger.info(f"Archived {len(files)} part files to: {self.archive.archive_dir}")
+        try:
+            if deferred:
+                await self.sink.write_many(deferred)
+        except Exception as e:
+            self.documents_failed(deferred, e)
+            return
+        if self.on_durable is not None and offsets is not None:
+            self.on_durable(offsets)
+
+    async def flush(self):
+        await self.sink.flush()
+        await self.flush_archive()
+
+    async def close(self):
+        await self.flush_archive()
+        await self.sink.close()
+
+
+def build_archive(archive_config, schema_file: str):
+    """
+    The ParquetArchive from archive_config, or None when archiving is disabled.
+    """
+    if not archive_config.enabled:
+        return None
+    return ParquetArchive.from_config(archive_config, schema_file)
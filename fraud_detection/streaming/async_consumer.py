@@ -0,0 +1,394 @@
+import gc
+import os
+import time
+import signal
+import argparse
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dotenv import load_dotenv
+from fraud_detection.config.configuration import get_configuration_manager
+from fraud_detection.logger.log import logging, get_sampled_logger
+from fraud_detection.streaming.archive import AsyncArchivingSink
+from fraud_detection.streaming.consumer import (commit_offsets, create_kafka_consumer, decode_message, load_rule_engine,
+                                                load_validator, refresh_consumer_lag, with_archive, SharedArtifacts)
+from fraud_detection.streaming.drift import DriftMonitor, load_drift_monitor
+from fraud_detection.streaming.geo import LOCATION_FIELD
+from fraud_detection.streaming.membership import TransactionDeduplicator, build_membership, save_membership
+from fraud_detection.streaming.metrics import STREAMING_METRICS, StreamingMetrics, start_metrics_server, start_metrics_logger
+from fraud_detection.streaming.rollups import ROLLUP_INDEX, AsyncRollupSink, build_rollup_aggregator
+from fraud_detection.streaming.rule_engine import RuleEngine, apply_decision
+from fraud_detection.streaming.scorer import FraudScorer
+from fraud_detection.streaming.serialization import decode
+from fraud_detection.streaming.sinks import AsyncMongoSink, AsyncMongoDeadLetterSink, dead_letter
+from fraud_detection.utils.alerting import drift_alert_handler, load_email_settings, send_email_alert_async
+from fraud_detection.utils.profiling import start_stack_snapshots
+from fraud_detection.utils.schema_validator import SchemaValidator
+
+logger = logging.getLogger(__name__)
+transaction_logger = get_sampled_logger(f"{__name__}.transactions")
+
+# Scorer of a process-pool worker: inherited from the consumer when workers are forked, loaded otherwise
+_WORKER_STATE = {}
+
+
+def score_transaction(scorer: FraudScorer, payload, with_features: bool = False):
+    """
+    Decode -> transform -> predict for one message payload (raw bytes, or a dict already decoded for the rule engine);
+    runs on the scoring executor.
+    Returns (txn, prediction or None if the transaction could not be transformed, fraud probability,
+    feature dict if with_features else None, transform_s, score_s).
+    """
+    t0 = time.perf_counter()
+    txn = payload if isinstance(payload, dict) else decode(payload)
+    features_df = scorer.transform(txn)
+    t1 = time.perf_counter()
+    if features_df is None:
+        return txn, None, None, None, t1 - t0, 0.0
+    predictions, probabilities = scorer.score(features_df)
+    features = features_df.iloc[0].to_dict() if with_features else None
+    return txn, int(predictions[0]), float(probabilities[0]), features, t1 - t0, time.perf_counter() - t1
+
+
+def _init_score_worker(model_path: str, vocabulary_path: str):
+    if "scorer" not in _WORKER_STATE:
+        _WORKER_STATE["scorer"] = FraudScorer.from_artifacts(model_path, vocabulary_path)
+
+
+def _score_in_worker(payload, with_features: bool = False):
+    return score_transaction(_WORKER_STATE["scorer"], payload, with_features)
+
+
+class AsyncConsumer:
+    """
+    asyncio variant of run_consumer. Kafka polling runs on a dedicated thread (the confluent client is
+    not thread-safe), scoring on a thread or process pool, and persistence / alerts on the event loop,
+    so up to max_in_flight messages can be waiting on the sink while others are being scored.
+    sink: async sink (AsyncMongoSink, AsyncSinkAdapter).
+    score_executor: "thread" or "process".
+    rule_engine: optional RuleEngine, evaluated per consumed batch before anything is sent for scoring.
+    drift_monitor: optional DriftMonitor, fed the features and score of every model-scored message.
+    validator: optional SchemaValidator; messages that fail it (or do not decode) go to the async dead_letters sink.
+    deduplicator: optional TransactionDeduplicator; ids are checked per consumed batch and recorded once written.
+    Its exact lookups (and the rule engine's watchlist lookups) are blocking Mongo queries on the loop thread,
+    made only when a filter answers "maybe".
+    """
+
+    def __init__(self, scorer: FraudScorer, sink, metrics: StreamingMetrics = STREAMING_METRICS,
+                 max_in_flight: int = 256, score_workers: int = 4, score_executor: str = "thread",
+                 alert_settings: dict = None, rule_engine: RuleEngine = None, drift_monitor: DriftMonitor = None,
+                 validator: SchemaValidator = None, dead_letters=None, deduplicator: TransactionDeduplicator = None):
+        self.scorer = scorer
+        self.sink = sink
+        self.metrics = metrics
+        self.max_in_flight = max_in_flight
+        self.score_workers = score_workers
+        self.score_executor = score_executor
+        self.alert_settings = alert_settings
+        self.rule_engine = rule_engine
+        self.drift_monitor = drift_monitor
+        self.validator = validator
+        self.dead_letters = dead_letters
+        self.deduplicator = deduplicator
+        # Ids accepted but not yet written, so a redelivery arriving meanwhile is still a duplicate
+        self._handling = set()
+        self._stopping = False
+        self._background = set()
+
+    def stop(self):
+        """
+        Stop polling; messages already in flight are still scored and persisted.
+        """
+        self._stopping = True
+
+    def _create_executor(self):
+        if self.score_executor == "process":
+            # Forked workers share the consumer's loaded model pages instead of each loading a copy;
+            # gc.freeze keeps the collector, which writes to every object it traverses, off the inherited pages
+            _WORKER_STATE["scorer"] = self.scorer
+            gc.freeze()
+            executor = ProcessPoolExecutor(self.score_workers, initializer=_init_score_worker,
+                                           initargs=(self.scorer.model_path, self.scorer.vocabulary_path))
+            return executor, partial(_score_in_worker, with_features=self.drift_monitor is not None)
+        executor = ThreadPoolExecutor(self.score_workers, thread_name_prefix="score")
+        return executor, partial(score_transaction, self.scorer, with_features=self.drift_monitor is not None)
+
+    def _spawn(self, coro):
+        # Keep a reference so fire-and-forget tasks are not garbage collected mid-flight
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def prefilter(self, msgs: list) -> list:
+        """
+        (msg, payload, rule decision) per message. Without a rule engine or validator the raw bytes go straight
+        to the scoring executor; otherwise the batch is decoded, validated and evaluated here, on the loop thread
+        that owns the engine's per-card state. Rejected messages are handed to dead_letters in the background.
+        """
+        if self.rule_engine is None and self.validator is None and self.deduplicator is None:
+            return [(msg, msg.value(), None) for msg in msgs]
+
+        t0 = time.perf_counter()
+        decoded = []
+        rejected = []
+        for msg in msgs:
+            try:
+                txn = decode_message(msg)
+            except Exception as e:
+                self.metrics.invalid.inc()
+                transaction_logger.warning(f"Undecodable message at offset {msg.offset()}: {e}")
+                rejected.append(dead_letter([f"undecodable: {e}"], msg.value().decode("utf-8", errors="replace"), msg))
+                continue
+            reasons = self.validator.validate(txn) if self.validator is not None else None
+            if reasons:
+                self.metrics.invalid.inc()
+                transaction_logger.warning("Rejected transaction %s: %s", txn.get("transaction_id") if isinstance(txn, dict) else None, reasons)
+                rejected.append(dead_letter(reasons, txn, msg))
+                continue
+            if self.deduplicator is not None:
+                transaction_id = txn.get("transaction_id")
+                if transaction_id is not None and (transaction_id in self._handling or self.deduplicator.contains(transaction_id)):
+                    self.metrics.duplicates.inc()
+                    transaction_logger.warning("Dropped duplicate transaction %s", transaction_id)
+                    continue
+                self._handling.add(transaction_id)
+            decoded.append((msg, txn))
+        if self.validator is not None:
+            self.metrics.validate.observe(time.perf_counter() - t0)
+        if rejected and self.dead_letters is not None:
+            self._spawn(self._write_dead_letters(rejected))
+        if self.rule_engine is None:
+            return [(msg, txn, None) for msg, txn in decoded]
+
+        t_rules = time.perf_counter()
+        decisions = self.rule_engine.evaluate([txn for _, txn in decoded])
+        for decision in decisions:
+            if decision is not None:
+                self.metrics.rule_actions[decision.action].inc()
+        self.metrics.rules.observe(time.perf_counter() - t_rules)
+        return [(msg, txn, decision) for (msg, txn), decision in zip(decoded, decisions)]
+
+    async def _write_dead_letters(self, entries: list):
+        try:
+            await self.dead_letters.write_many(entries)
+        except Exception as e:
+            logger.error(f"Failed to write {len(entries)} dead letters: {e}")
+
+    async def handle(self, msg, payload, decision, executor, score_fn):
+        """
+        Same steps and metrics as consumer.process_batch for one message, awaiting the executor and the sink.
+        """
+        metrics = self.metrics
+        received_at = time.time()
+        t0 = time.perf_counter()
+        metrics.consumed.inc()
+
+        timestamp_type, timestamp_ms = msg.timestamp()
+        broker_lag = received_at - timestamp_ms / 1000 if timestamp_type else None
+        if broker_lag is not None:
+            metrics.produce_to_consume.observe(broker_lag)
+
+        try:
+            if decision is not None and apply_decision(payload, decision):
+                txn, prediction = payload, payload["is_fraud"]
+            else:
+                txn, prediction, probability, features, transform_s, score_s = await asyncio.get_running_loop().run_in_executor(
+                    executor, score_fn, payload)
+                metrics.transform.observe(transform_s)
+
+                if prediction is None:
+                    metrics.skipped.inc()
+                    transaction_logger.warning("Skipped transaction %s: feature transformation failed", txn.get("transaction_id"))
+                    return None
+                metrics.score.observe(score_s)
+
+                txn["is_fraud"] = prediction
+                txn["fraud_score"] = round(probability, 6)
+                txn["decision_source"] = "model"
+                if self.drift_monitor is not None:
+                    # Counted here, on the loop thread, so the monitor's counters are never shared between threads
+                    self.drift_monitor.update(features, probability)
+
+            if prediction == 1:
+                metrics.frauds.inc()
+                logger.info("Fraud detected: transaction %s", txn.get("transaction_id"), extra={"transaction_id": txn.get("transaction_id"), "amt": txn.get("amt")})
+                if self.alert_settings is not None:
+                    self._spawn(send_email_alert_async(dict(txn), self.alert_settings))
+            else:
+                transaction_logger.info("Legit transaction %s", txn.get("transaction_id"))
+
+            t_write = time.perf_counter()
+            await self.sink.write(txn)
+            t_end = time.perf_counter()
+            if self.deduplicator is not None:
+                self.deduplicator.record([txn.get("transaction_id")])
+            metrics.sink_write.observe(t_end - t_write)
+            metrics.processing.observe(t_end - t0)
+            metrics.scored.inc()
+            if broker_lag is not None:
+                metrics.end_to_end.observe(broker_lag + (t_end - t0))
+            return txn
+
+        except Exception as e:
+            metrics.failed.inc()
+            logger.error(f"Error processing transaction at offset {msg.offset()}: {e}")
+            return None
+
+        finally:
+            if self.deduplicator is not None:
+                self._handling.discard(payload.get("transaction_id"))
+
+    async def run(self, source, poll_timeout: float = 1.0, batch_size: int = 100, lag_refresh_seconds: float = 5.0,
+                  archiving_sink=None):
+        """
+        source is a confluent_kafka.Consumer or a replay source; sources that run dry expose `exhausted`.
+        archiving_sink: the AsyncArchivingSink within the sink, for a source created without auto_commit; offsets
+        are committed after each archive flush, below the oldest message of each partition still being handled.
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        positions = {}
+        # (topic, partition, offset) of accepted messages not yet persisted or archived
+        unfinished = set()
+        next_lag_refresh = time.monotonic() + lag_refresh_seconds
+
+        def release(task, key=None):
+            pending.discard(task)
+            unfinished.discard(key)
+            in_flight.release()
+
+        def checkpoint() -> dict:
+            offsets = {tp: offset + 1 for tp, offset in positions.items()}
+            for topic, partition, offset in unfinished:
+                offsets[(topic, partition)] = min(offsets[(topic, partition)], offset)
+            return offsets
+
+        poll_executor = ThreadPoolExecutor(1, thread_name_prefix="kafka-poll")
+        executor, score_fn = self._create_executor()
+        if archiving_sink is not None:
+            # Commits run on the polling thread, which owns the (not thread-safe) Kafka client
+            archiving_sink.track_offsets(checkpoint, lambda offsets: loop.run_in_executor(
+                poll_executor, commit_offsets, source, offsets))
+        try:
+            while not self._stopping:
+                messages = await loop.run_in_executor(poll_executor, source.consume, batch_size, poll_timeout)
+
+                if time.monotonic() >= next_lag_refresh:
+                    await loop.run_in_executor(poll_executor, refresh_consumer_lag, source, dict(positions), self.metrics)
+                    next_lag_refresh = time.monotonic() + lag_refresh_seconds
+
+                if not messages:
+                    if getattr(source, "exhausted", False):
+                        break
+                    continue
+
+                batch = []
+                for msg in messages:
+                    if msg.error():
+                        logger.error(f"Kafka error: {msg.error()}")
+                        continue
+                    positions[(msg.topic(), msg.partition())] = msg.offset()
+                    batch.append(msg)
+
+                accepted = self.prefilter(batch)
+                # Registered before the first await, so no archive flush sees these offsets as done
+                unfinished.update((msg.topic(), msg.partition(), msg.offset()) for msg, _, _ in accepted)
+                for msg, payload, decision in accepted:
+                    # Backpressure: stop polling while max_in_flight messages are still being scored or written
+                    await in_flight.acquire()
+                    task = asyncio.create_task(self.handle(msg, payload, decision, executor, score_fn))
+                    pending.add(task)
+                    task.add_done_callback(partial(release, key=(msg.topic(), msg.partition(), msg.offset())))
+
+        except asyncio.CancelledError:
+            logger.info("Stopping async Kafka consumer...")
+
+        finally:
+            await asyncio.gather(*pending, return_exceptions=True)
+            await asyncio.gather(*self._background, return_exceptions=True)
+            # Flushed before the source is closed, so the archive flush can still commit its offsets
+            await self.sink.flush()
+            await loop.run_in_executor(poll_executor, source.close)
+            await self.sink.close()
+            if self.dead_letters is not None:
+                await self.dead_letters.close()
+            poll_executor.shutdown()
+            executor.shutdown()
+
+
+async def serve(app_config, shared=None, metrics_port: int = None):
+    """
+    shared: SharedArtifacts already loaded (by a pre-fork parent), otherwise loaded here;
+    metrics_port: defaults to streaming_config.metrics_port.
+    """
+    from pymongo import MongoClient
+
+    streaming_config = app_config.get_streaming_config()
+    membership_config = app_config.get_membership_config()
+    rollup_config = app_config.get_rollup_config()
+    drift_config = app_config.get_drift_config()
+
+    mongo_sink = AsyncMongoSink.from_uri(os.getenv("MONGO_URI"), streaming_config)
+    db = mongo_sink.client[streaming_config.mongo_db]
+    # The filters are built and confirmed with the blocking client, as in consumer.serve
+    membership_client = MongoClient(os.getenv("MONGO_URI"))
+    deduplicator, watchlists = build_membership(membership_client[streaming_config.mongo_db], streaming_config,
+                                                membership_config)
+    await db[streaming_config.fraud_collection].create_index([(LOCATION_FIELD, "2dsphere")])
+    rollups = db[rollup_config.collection]
+    await rollups.create_index(ROLLUP_INDEX)
+    sink = with_archive(mongo_sink, app_config, AsyncArchivingSink)
+    # With the archive, offsets are committed once the archive holds what they cover
+    archiving_sink = sink if isinstance(sink, AsyncArchivingSink) else None
+    sink = AsyncRollupSink(sink, build_rollup_aggregator(rollup_config), rollups)
+
+    # No overload controller on this path
+    shared = shared or SharedArtifacts(FraudScorer.from_config(app_config), load_validator(app_config, streaming_config), None)
+    consumer = AsyncConsumer(shared.scorer, sink,
+                             max_in_flight=streaming_config.async_max_in_flight,
+                             score_workers=streaming_config.async_score_workers,
+                             alert_settings=load_email_settings() if os.getenv("SMTP_SERVER") else None,
+                             rule_engine=load_rule_engine(streaming_config, watchlists),
+                             drift_monitor=load_drift_monitor(drift_config, on_drift=drift_alert_handler(drift_config.alert_cooldown_seconds)),
+                             validator=shared.validator,
+                             dead_letters=AsyncMongoDeadLetterSink.from_config(db, streaming_config),
+                             deduplicator=deduplicator)
+    source = create_kafka_consumer(streaming_config, auto_commit=archiving_sink is None)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, consumer.stop)
+
+    start_metrics_server(STREAMING_METRICS, metrics_port if metrics_port is not None else streaming_config.metrics_port)
+    start_metrics_logger(STREAMING_METRICS, streaming_config.metrics_log_interval_seconds)
+
+    try:
+        await consumer.run(source, poll_timeout=streaming_config.poll_timeout_seconds,
+                           batch_size=streaming_config.async_poll_batch_size,
+                           lag_refresh_seconds=streaming_config.lag_refresh_seconds, archiving_sink=archiving_sink)
+    finally:
+        save_membership(deduplicator, membership_config)
+        membership_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score Kafka transactions concurrently on asyncio")
+    parser.add_argument("--profile", nargs="?", const="all", default=None,
+                        help="Write periodic sampled stack snapshots to artifacts/reports/profiles "
+                             "(also enabled by the FRAUD_PROFILE env var)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    app_config = get_configuration_manager()
+    snapshots = start_stack_snapshots(app_config.get_profiling_config(), "async_consumer", args.profile)
+    try:
+        asyncio.run(serve(app_config))
+    finally:
+        if snapshots is not None:
+            snapshots.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,441 @@
 import os
-import json
-import pandas as pd
-from pymongo import MongoClient
-from confluent_kafka import Consumer
+import time
+import argparse
+from functools import partial
+from collections import namedtuple
 from dotenv import load_dotenv
-from catboost import CatBoostClassifier, Pool
-from fraud_detection.streaming.feature_transformer import transform_transaction
-
-# Load env
-load_dotenv()
-
-# === MongoDB ===
-mongo_uri = os.getenv("MONGO_URI")
-client = MongoClient(mongo_uri)
-db = client["txn_db"]
-fraud_collection = db["fraud_alerts"]
-non_fraud_collection = db["non_fraud"]
-
-# === Kafka Consumer Config ===
-kafka_conf = {
-    "bootstrap.servers": os.getenv("KAFKA_BOOTSTRAP_SERVERS"),
-    "security.protocol": "SASL_SSL",
-    "sasl.mechanism": "PLAIN",
-    "sasl.username": os.getenv("KAFKA_USERNAME"),
-    "sasl.password": os.getenv("KAFKA_PASSWORD"),
-    "group.id": "fraud-detection-group",
-    "auto.offset.reset": "earliest"
-}
-
-consumer = Consumer(kafka_conf)
-consumer.subscribe(["txn_data"])
-print("👂 Subscribed to Kafka topic: txn_data")
-
-# === Load CatBoost Model ===
-model_path = os.path.join("saved_models", "trained_model.cbm")
-model = CatBoostClassifier()
-model.load_model(model_path)
-print("✅ Model loaded from", model_path)
-
-# === Main Loop ===
-try:
-    while True:
-        msg = consumer.poll(1.0)
-        print("⏳ Waiting for messages...")
-
-        if msg is None:
-            continue
-        if msg.error():
-            print(f"❌ Kafka error: {msg.error()}")
+from fraud_detection.config.configuration import get_configuration_manager
+from fraud_detection.logger.log import logging, get_sampled_logger
+from fraud_detection.streaming.archive import ArchivingSink, build_archive
+from fraud_detection.streaming.drift import DriftMonitor, load_drift_monitor
+from fraud_detection.streaming.geo import create_geo_indexes
+from fraud_detection.streaming.membership import TransactionDeduplicator, build_membership, save_membership
+from fraud_detection.streaming.metrics import STREAMING_METRICS, StreamingMetrics, start_metrics_server, start_metrics_logger
+from fraud_detection.streaming.overload import NORMAL, OverloadController, total_consumer_lag
+from fraud_detection.streaming.rollups import RollupSink, build_rollup_aggregator, create_rollup_indexes
+from fraud_detection.streaming.rule_engine import RuleEngine, apply_decision
+from fraud_detection.streaming.scorer import FraudScorer
+from fraud_detection.streaming.serialization import decode
+from fraud_detection.streaming.sinks import MongoSink, MongoDeadLetterSink, dead_letter
+from fraud_detection.utils.alerting import drift_alert_handler
+from fraud_detection.utils.profiling import start_stack_snapshots
+from fraud_detection.utils.schema_validator import SchemaValidator
+
+logger = logging.getLogger(__name__)
+# Per-transaction events are sampled so a busy stream is not I/O-bound on its own diagnostics
+transaction_logger = get_sampled_logger(f"{__name__}.transactions")
+
+
+def create_kafka_consumer(streaming_config, auto_commit: bool = True):
+    """
+    Connect to the Kafka cluster from the environment and subscribe to the transactions topic.
+    auto_commit: off when the consumer commits offsets itself, once what it buffers is persisted (commit_offsets).
+    """
+    from confluent_kafka import Consumer
+
+    kafka_conf = {
+        "bootstrap.servers": os.getenv("KAFKA_BOOTSTRAP_SERVERS"),
+        "security.protocol": "SASL_SSL",
+        "sasl.mechanism": "PLAIN",
+        "sasl.username": os.getenv("KAFKA_USERNAME"),
+        "sasl.password": os.getenv("KAFKA_PASSWORD"),
+        "group.id": streaming_config.group_id,
+        "auto.offset.reset": "earliest",
+        "enable.auto.commit": auto_commit
+    }
+
+    consumer = Consumer(kafka_conf)
+    consumer.subscribe([streaming_config.topic])
+    logger.info(f"Subscribed to Kafka topic: {streaming_config.topic}")
+    return consumer
+
+
+def commit_offsets(source, offsets: dict):
+    """
+    Commit {(topic, partition): next offset to read} for the consumer group; sources without commits
+    (replay) are skipped. A failed commit only means those messages may be redelivered after a restart.
+    """
+    if not offsets or not hasattr(source, "commit"):
+        return
+    from confluent_kafka import TopicPartition
+
+    try:
+        source.commit(offsets=[TopicPartition(topic, partition, offset) for (topic, partition), offset in offsets.items()],
+                      asynchronous=False)
+    except Exception as e:
+        logger.warning(f"Offset commit failed, messages since the last commit may be redelivered: {e}")
+
+
+def decode_message(msg) -> dict:
+    """
+    Transaction from a txn_data message, binary or JSON (see streaming.serialization).
+    """
+    return decode(msg.value())
+
+
+def process_batch(msgs: list, scorer: FraudScorer, sink, metrics: StreamingMetrics = STREAMING_METRICS,
+                  rule_engine: RuleEngine = None, deduplicator: TransactionDeduplicator = None,
+                  drift_monitor: DriftMonitor = None, validator: SchemaValidator = None, dead_letters=None,
+                  overload: OverloadController = None) -> list:
+    """
+    Consume -> validate -> dedup -> rules -> transform -> score -> persist for a micro-batch of messages.
+    Messages that do not decode, or fail validator's schema rules, go to dead_letters with the reasons.
+    Transactions a rule settles (block / allow) skip the model; the rest are transformed and scored in one call,
+    and their features and scores are counted by drift_monitor.
+    overload: optional OverloadController; its current mode may skip drift counting, settle low-amount transactions
+    without the model and slim the persisted non-frauds.
+    Returns one entry per message: the transaction, or None if it was rejected, skipped or a duplicate.
+    """
+    mode = overload.mode if overload is not None else NORMAL
+    received_at = time.time()
+    t0 = time.perf_counter()
+    metrics.consumed.inc(len(msgs))
+
+    broker_lags = []
+    for msg in msgs:
+        # Kafka timestamp type 0 means the broker/producer did not set one
+        timestamp_type, timestamp_ms = msg.timestamp()
+        broker_lag = received_at - timestamp_ms / 1000 if timestamp_type else None
+        if broker_lag is not None:
+            metrics.produce_to_consume.observe(broker_lag)
+        broker_lags.append(broker_lag)
+
+    results = [None] * len(msgs)
+    txns = {}
+    rejected = []
+    batch_ids = set()
+    for i, msg in enumerate(msgs):
+        try:
+            txn = decode_message(msg)
+        except Exception as e:
+            metrics.invalid.inc()
+            transaction_logger.warning(f"Undecodable message at offset {msg.offset()}: {e}")
+            rejected.append(dead_letter([f"undecodable: {e}"], msg.value().decode("utf-8", errors="replace"), msg))
             continue
+        if validator is not None:
+            reasons = validator.validate(txn)
+            if reasons:
+                metrics.invalid.inc()
+                transaction_logger.warning("Rejected transaction %s: %s", txn.get("transaction_id") if isinstance(txn, dict) else None, reasons)
+                rejected.append(dead_letter(reasons, txn, msg))
+                continue
+        if deduplicator is not None:
+            transaction_id = txn.get("transaction_id")
+            if transaction_id is not None and (transaction_id in batch_ids or deduplicator.contains(transaction_id)):
+                metrics.duplicates.inc()
+                transaction_logger.warning("Dropped duplicate transaction %s", transaction_id)
+                continue
+            batch_ids.add(transaction_id)
+        txns[i] = txn
+    if validator is not None:
+        metrics.validate.observe(time.perf_counter() - t0)
+    if rejected and dead_letters is not None:
+        dead_letters.write_many(rejected)
+
+    to_score = list(txns)
+    flagged = set()
+    if rule_engine is not None:
+        t_rules = time.perf_counter()
+        decisions = rule_engine.evaluate(list(txns.values()))
+        to_score = []
+        for i, decision in zip(txns, decisions):
+            if decision is not None:
+                metrics.rule_actions[decision.action].inc()
+            if apply_decision(txns[i], decision):
+                results[i] = txns[i]
+            else:
+                to_score.append(i)
+                if decision is not None:
+                    flagged.add(i)
+        metrics.rules.observe(time.perf_counter() - t_rules)
+
+    if mode.shed_below_amount is not None:
+        # Flagged transactions still get the primary model
+        shed = [i for i in to_score if i not in flagged and overload.sheddable(txns[i])]
+        if shed:
+            shed_set = set(shed)
+            to_score = [i for i in to_score if i not in shed_set]
+            settled = overload.settle_shed([txns[i] for i in shed])
+            metrics.skipped.inc(len(shed) - len(settled))
+            for position in settled:
+                results[shed[position]] = txns[shed[position]]
+
+    t1 = time.perf_counter()
+    features_df, kept = scorer.transform_many([txns[i] for i in to_score]) if to_score else (None, [])
+    t2 = time.perf_counter()
+    metrics.transform.observe(t2 - t1)
+
+    if len(kept) < len(to_score):
+        kept_set = set(kept)
+        for position, i in enumerate(to_score):
+            if position not in kept_set:
+                metrics.skipped.inc()
+                transaction_logger.warning("Skipped transaction %s: feature transformation failed", txns[i].get("transaction_id"))
+
+    if features_df is not None:
+        predictions, probabilities = scorer.score(features_df)
+        for position, prediction, probability in zip(kept, predictions, probabilities):
+            txn = txns[to_score[position]]
+            txn["is_fraud"] = int(prediction)
+            txn["fraud_score"] = round(float(probability), 6)
+            txn["decision_source"] = "model"
+            results[to_score[position]] = txn
+    t3 = time.perf_counter()
+    metrics.score.observe(t3 - t2)
+    if drift_monitor is not None and features_df is not None and not mode.skip_drift:
+        drift_monitor.update_frame(features_df, probabilities)
+
+    written = [txn for txn in results if txn is not None]
+    for txn in written:
+        if txn["is_fraud"] == 1:
+            metrics.frauds.inc()
+            logger.info("Fraud detected: transaction %s", txn.get("transaction_id"), extra={"transaction_id": txn.get("transaction_id"), "amt": txn.get("amt"), "decision_source": txn.get("decision_source")})
+        else:
+            transaction_logger.info("Legit transaction %s", txn.get("transaction_id"))
+    if written:
+        sink.write_many(overload.for_sink(written) if overload is not None else written)
+        if deduplicator is not None:
+            # Recorded only now, so a batch whose write failed is scored again when Kafka redelivers it
+            deduplicator.record(txn.get("transaction_id") for txn in written)
+    t4 = time.perf_counter()
+    metrics.sink_write.observe(t4 - t3)
+
+    metrics.scored.inc(len(written))
+    for txn, broker_lag in zip(results, broker_lags):
+        if txn is not None:
+            metrics.processing.observe(t4 - t0)
+            if broker_lag is not None:
+                metrics.end_to_end.observe(broker_lag + (t4 - t0))
+    return results
+
+
+def process_message(msg, scorer: FraudScorer, sink, metrics: StreamingMetrics = STREAMING_METRICS,
+                    rule_engine: RuleEngine = None, deduplicator: TransactionDeduplicator = None,
+                    drift_monitor: DriftMonitor = None, validator: SchemaValidator = None, dead_letters=None,
+                    overload: OverloadController = None):
+    """
+    Consume -> validate -> dedup -> rules -> transform -> score -> persist for a single message.
+    Returns the scored transaction, or None if it was rejected or skipped.
+    """
+    return process_batch([msg], scorer, sink, metrics, rule_engine, deduplicator, drift_monitor, validator, dead_letters,
+                         overload)[0]
 
+
+def oldest_message_age(msgs: list):
+    """
+    Seconds since the earliest Kafka timestamp in the batch, or None when no message has one.
+    """
+    timestamps = [timestamp_ms for timestamp_type, timestamp_ms in (msg.timestamp() for msg in msgs) if timestamp_type]
+    return time.time() - min(timestamps) / 1000 if timestamps else None
+
+
+def refresh_consumer_lag(source, positions: dict, metrics: StreamingMetrics):
+    """
+    Update per-partition lag from the client's cached high watermarks (no broker round trip).
+    positions: dict of (topic, partition) -> last consumed offset
+    """
+    if not hasattr(source, "get_watermark_offsets"):
+        return
+    from confluent_kafka import TopicPartition
+
+    for (topic, partition), offset in positions.items():
         try:
-            txn = json.loads(msg.value().decode('utf-8'))
+            _, high = source.get_watermark_offsets(TopicPartition(topic, partition), cached=True)
+        except Exception:
+            continue
+        if high >= 0:
+            metrics.consumer_lag.labels(partition).set(max(high - offset - 1, 0))
+
+
+def run_consumer(source, scorer: FraudScorer, sink, poll_timeout: float = 1.0,
+                 metrics: StreamingMetrics = STREAMING_METRICS, lag_refresh_seconds: float = 5.0,
+                 batch_size: int = 1, rule_engine: RuleEngine = None, deduplicator: TransactionDeduplicator = None,
+                 drift_monitor: DriftMonitor = None, validator: SchemaValidator = None, dead_letters=None,
+                 overload: OverloadController = None, archiving_sink: ArchivingSink = None):
+    """
+    Main loop. source is a confluent_kafka.Consumer or any object with the same consume/close interface;
+    sources that can run dry (replay sources) expose `exhausted` to end the loop.
+    Up to batch_size messages are taken per consume() call and processed as one micro-batch.
+    dead_letters is flushed and closed with the sink.
+    overload: optional OverloadController, fed the consumer lag and each batch's end-to-end latency;
+    its mode scales batch_size and is applied by process_batch.
+    archiving_sink: the ArchivingSink within sink, for a source created without auto_commit; offsets are committed
+    after each archive flush, up to the messages it made durable.
+    """
+    positions = {}
+    if archiving_sink is not None:
+        # Batches are persisted (or buffered in the archive) before the next consume, so everything consumed is covered
+        archiving_sink.track_offsets(lambda: {tp: offset + 1 for tp, offset in positions.items()},
+                                     partial(commit_offsets, source))
+    next_lag_refresh = time.monotonic() + lag_refresh_seconds
+    try:
+        while True:
+            msgs = source.consume(overload.batch_size(batch_size) if overload is not None else batch_size, poll_timeout)
 
-            features_df = transform_transaction(txn)
-            if features_df is None:
-                print("⚠️ Skipped: Feature transformation failed.")
+            if time.monotonic() >= next_lag_refresh:
+                refresh_consumer_lag(source, positions, metrics)
+                next_lag_refresh = time.monotonic() + lag_refresh_seconds
+                if overload is not None:
+                    overload.update(lag=total_consumer_lag(metrics))
+
+            if not msgs:
+                if getattr(source, "exhausted", False):
+                    break
                 continue
 
-            print(features_df.dtypes)
-            print(model.get_params())
+            batch = []
+            for msg in msgs:
+                if msg.error():
+                    logger.error(f"Kafka error: {msg.error()}")
+                    continue
+                positions[(msg.topic(), msg.partition())] = msg.offset()
+                batch.append(msg)
+            if not batch:
+                continue
 
-            # Clean categorical dtypes
-            categorical_cols = ['category', 'gender', 'job']
-            for col in categorical_cols:
-                if col in features_df.columns:
-                    features_df[col] = features_df[col].astype(str)
+            try:
+                process_batch(batch, scorer, sink, metrics, rule_engine, deduplicator, drift_monitor,
+                              validator, dead_letters, overload)
+            except Exception as e:
+                metrics.failed.inc(len(batch))
+                logger.error(f"Error processing batch at offsets {batch[0].offset()}-{batch[-1].offset()}: {e}")
+            if overload is not None:
+                overload.update(latency=oldest_message_age(batch))
 
-            # Wrap the features in a CatBoost Pool
-            features_pool = Pool(data=features_df, cat_features=categorical_cols)
+    except KeyboardInterrupt:
+        logger.info("Stopping Kafka consumer...")
 
-            # Predict
-            prediction = int(model.predict(features_pool)[0])
+    finally:
+        # Flushed before the source is closed, so the archive flush can still commit its offsets
+        sink.flush()
+        source.close()
+        sink.close()
+        if dead_letters is not None:
+            dead_letters.close()
 
-            txn["is_fraud"] = prediction
 
-            if prediction == 1:
-                print("🚨 Fraud Detected!")
-                fraud_collection.insert_one(txn)
-            else:
-                print("✅ Legit Transaction")
-                non_fraud_collection.insert_one(txn)
+def load_rule_engine(streaming_config, watchlists: dict = None):
+    """
+    The rule engine from streaming_config.rules_file, or None when no rules file is configured.
+    """
+    if not streaming_config.rules_file:
+        return None
+    return RuleEngine.from_yaml(streaming_config.rules_file, watchlists=watchlists)
 
-        except Exception as e:
-            print(f"❌ Error processing transaction: {e}")
 
-except KeyboardInterrupt:
-    print("🛑 Stopping Kafka consumer...")
+def load_validator(app_config, streaming_config):
+    """
+    SchemaValidator for incoming messages, or None when validation is switched off.
+    """
+    if not streaming_config.validate_messages:
+        return None
+    return SchemaValidator.from_yaml(app_config.get_data_validation_config().schema_file)
+
+
+def load_overload_controller(app_config, metrics: StreamingMetrics = STREAMING_METRICS):
+    """
+    OverloadController from overload_config, or None when it is disabled. The fallback model, when configured,
+    shares the primary model's vocabulary; slimmed non-fraud documents keep the rollup dimensions.
+    With the non-fraud archive enabled, non-frauds are never slimmed before the sink: the archive keeps them whole
+    and archive_config.non_fraud_mongo already decides what MongoDB gets.
+    """
+    overload_config = app_config.get_overload_config()
+    if not overload_config.enabled:
+        return None
+    fallback_scorer = None
+    if overload_config.fallback_model_file:
+        if os.path.exists(overload_config.fallback_model_file):
+            fallback_scorer = FraudScorer.from_artifacts(overload_config.fallback_model_file,
+                                                         app_config.get_feature_engineering_config().vocabulary_file)
+        else:
+            logger.warning(f"No fallback model at {overload_config.fallback_model_file}; shed transactions are rules-only")
+    return OverloadController.from_config(overload_config, metrics, fallback_scorer=fallback_scorer,
+                                          extra_fields=app_config.get_rollup_config().dimensions,
+                                          slim_non_fraud=not app_config.get_archive_config().enabled)
+
+
+def with_archive(sink, app_config, archiving_sink=ArchivingSink, metrics: StreamingMetrics = STREAMING_METRICS):
+    """
+    sink wrapped in archiving_sink (ArchivingSink, or AsyncArchivingSink for async sinks) when archive_config
+    is enabled, otherwise sink itself.
+    """
+    archive_config = app_config.get_archive_config()
+    archive = build_archive(archive_config, app_config.get_data_validation_config().schema_file)
+    if archive is None:
+        return sink
+    logger.info(f"Archiving non-frauds to {archive_config.archive_dir}, {archive_config.non_fraud_mongo} documents to MongoDB")
+    return archiving_sink(sink, archive, archive_config.non_fraud_mongo, archive_config.mongo_fields, metrics)
+
+
+# What a consumer loads from disk at startup. Pre-fork workers (streaming.prefork) inherit one copy from their parent.
+SharedArtifacts = namedtuple("SharedArtifacts", ["scorer", "validator", "overload"])
+
+
+def load_shared_artifacts(app_config) -> SharedArtifacts:
+    """
+    The model with its vocabulary, the schema validator, and the overload controller with its fallback model.
+    """
+    return SharedArtifacts(scorer=FraudScorer.from_config(app_config),
+                           validator=load_validator(app_config, app_config.get_streaming_config()),
+                           overload=load_overload_controller(app_config))
+
+
+def serve(app_config, shared: SharedArtifacts = None, metrics_port: int = None, run_name: str = "consumer",
+          profile: str = None):
+    """
+    Connect to MongoDB and Kafka and run the consumer until interrupted.
+    shared: artifacts already loaded (by a pre-fork parent), otherwise loaded here;
+    metrics_port: defaults to streaming_config.metrics_port.
+    """
+    streaming_config = app_config.get_streaming_config()
+    membership_config = app_config.get_membership_config()
+    rollup_config = app_config.get_rollup_config()
+    drift_config = app_config.get_drift_config()
+    shared = shared or load_shared_artifacts(app_config)
+
+    mongo_sink = MongoSink.from_uri(os.getenv("MONGO_URI"), streaming_config)
+    db = mongo_sink.client[streaming_config.mongo_db]
+    deduplicator, watchlists = build_membership(db, streaming_config, membership_config)
+    create_geo_indexes(db[streaming_config.fraud_collection])
+    rollups = db[rollup_config.collection]
+    create_rollup_indexes(rollups)
+    sink = with_archive(mongo_sink, app_config)
+    # With the archive, offsets are committed once the archive holds what they cover
+    archiving_sink = sink if isinstance(sink, ArchivingSink) else None
+    sink = RollupSink(sink, build_rollup_aggregator(rollup_config), rollups)
+    consumer = create_kafka_consumer(streaming_config, auto_commit=archiving_sink is None)
+
+    start_metrics_server(STREAMING_METRICS, metrics_port if metrics_port is not None else streaming_config.metrics_port)
+    start_metrics_logger(STREAMING_METRICS, streaming_config.metrics_log_interval_seconds)
+    snapshots = start_stack_snapshots(app_config.get_profiling_config(), run_name, profile)
+
+    try:
+        run_consumer(consumer, shared.scorer, sink, poll_timeout=streaming_config.poll_timeout_seconds,
+                     lag_refresh_seconds=streaming_config.lag_refresh_seconds,
+                     batch_size=streaming_config.batch_size,
+                     rule_engine=load_rule_engine(streaming_config, watchlists),
+                     deduplicator=deduplicator,
+                     drift_monitor=load_drift_monitor(drift_config, on_drift=drift_alert_handler(drift_config.alert_cooldown_seconds)),
+                     validator=shared.validator,
+                     dead_letters=MongoDeadLetterSink.from_config(db, streaming_config),
+                     overload=shared.overload, archiving_sink=archiving_sink)
+    finally:
+        save_membership(deduplicator, membership_config)
+        if snapshots is not None:
+            snapshots.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score Kafka transactions and store them in MongoDB")
+    parser.add_argument("--profile", nargs="?", const="all", default=None,
+                        help="Write periodic sampled stack snapshots to artifacts/reports/profiles "
+                             "(also enabled by the FRAUD_PROFILE env var)")
+    args = parser.parse_args()
+
+    # Load env
+    load_dotenv()
+    serve(get_configuration_manager(), profile=args.profile)
+
 
-finally:
-    consumer.close()
+if __name__ == "__main__":
+    main()
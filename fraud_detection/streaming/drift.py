@@ -0,0 +1,122 @@
+import os
+import time
+from fraud_detection.logger.log import logging
+from fraud_detection.streaming.metrics import STREAMING_METRICS, StreamingMetrics
+from fraud_detection.utils.feature_profile import SCORE_FEATURE, FeatureProfile, population_stability_index, ks_statistic
+
+logger = logging.getLogger(__name__)
+
+
+class DriftMonitor:
+    """
+    Compares live feature and score distributions with the training-time FeatureProfile.
+    Each event adds one to a fixed bin counter per feature (O(1) per event, memory fixed by the profile's bins).
+    Every window_size events PSI and KS are computed from the counters, exported as fraud_drift_* gauges,
+    features over a threshold are reported to on_drift, and the window starts again.
+    on_drift: optional callable(report dict) for alerting; the report maps drifted features to their psi / ks.
+    """
+
+    def __init__(self, profile: FeatureProfile, window_size: int = 10000, psi_threshold: float = 0.2,
+                 ks_threshold: float = 0.1, metrics: StreamingMetrics = STREAMING_METRICS, on_drift=None):
+        self.profile = profile
+        self.window_size = window_size
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.metrics = metrics
+        self.on_drift = on_drift
+        self.counts = {name: [0] * binning.num_bins for name, binning in profile.binnings.items()}
+        self.window_events = 0
+        self.windows = 0
+        self.last_report = {}
+
+    def update(self, features: dict, score: float = None):
+        """
+        Count one event: a dict of model features, plus the fraud score when the profile has one.
+        """
+        for name, binning in self.profile.binnings.items():
+            if name == SCORE_FEATURE:
+                if score is not None:
+                    self.counts[name][binning.bin(score)] += 1
+            elif name in features:
+                self.counts[name][binning.bin(features[name])] += 1
+        self._advance(1)
+
+    def update_frame(self, features_df, scores=None):
+        """
+        Count a micro-batch: one vectorised bin + bincount per feature.
+        """
+        import numpy as np
+
+        for name, binning in self.profile.binnings.items():
+            if name == SCORE_FEATURE:
+                values = scores
+            elif name in features_df.columns:
+                values = features_df[name].to_numpy()
+            else:
+                continue
+            if values is not None:
+                batch_counts = np.bincount(binning.bin_array(values), minlength=binning.num_bins).tolist()
+                self.counts[name] = [count + added for count, added in zip(self.counts[name], batch_counts)]
+        self._advance(len(features_df))
+
+    def _advance(self, events: int):
+        self.window_events += events
+        if self.window_events >= self.window_size:
+            self.evaluate()
+
+    def drift(self) -> dict:
+        """
+        feature -> {"psi", "ks"} for the current window; KS only for ordered (numeric) features.
+        """
+        report = {}
+        for name, counts in self.counts.items():
+            binning = self.profile.binnings[name]
+            expected = self.profile.expected[name]
+            report[name] = {"psi": population_stability_index(expected, counts)}
+            if binning.kind == "numeric":
+                report[name]["ks"] = ks_statistic(expected, counts)
+        return report
+
+    def evaluate(self) -> dict:
+        """
+        Close the window: export PSI / KS, report drifted features, reset the counters.
+        """
+        if not self.window_events:
+            return {}
+        report = self.drift()
+        drifted = {}
+        for name, stats in report.items():
+            self.metrics.drift_psi.labels(name).set(round(stats["psi"], 6))
+            if "ks" in stats:
+                self.metrics.drift_ks.labels(name).set(round(stats["ks"], 6))
+            if stats["psi"] > self.psi_threshold or stats.get("ks", 0.0) > self.ks_threshold:
+                drifted[name] = {key: round(value, 4) for key, value in stats.items()}
+
+        self.windows += 1
+        self.last_report = {"window": self.windows, "events": self.window_events, "at": time.time(), "drifted": drifted}
+        if drifted:
+            self.metrics.drift_alerts.inc()
+            logger.warning(f"Feature drift in {len(drifted)} of {len(report)} features over the last "
+                           f"{self.window_events} events: {sorted(drifted)}",
+                           extra={"drifted": drifted, "window_events": self.window_events})
+            if self.on_drift is not None:
+                try:
+                    self.on_drift(self.last_report)
+                except Exception as e:
+                    logger.error(f"Drift alert failed: {e}")
+
+        for counts in self.counts.values():
+            counts[:] = [0] * len(counts)
+        self.window_events = 0
+        return report
+
+
+def load_drift_monitor(drift_config, metrics: StreamingMetrics = STREAMING_METRICS, on_drift=None):
+    """
+    DriftMonitor over the reference profile written at training time, or None if training has not produced one.
+    """
+    if not os.path.exists(drift_config.reference_profile_file):
+        logger.warning(f"No reference profile at {drift_config.reference_profile_file}; drift monitoring disabled")
+        return None
+    return DriftMonitor(FeatureProfile.load(drift_config.reference_profile_file), drift_config.window_size,
+                        drift_config.psi_threshold, drift_config.ks_threshold, metrics=metrics, on_drift=on_drift)
@@ -1,50 +1,106 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
 from geopy.distance import geodesic
+from fraud_detection.logger.log import get_sampled_logger
+from fraud_detection.streaming.metrics import register_cache
 
+# A malformed feed would otherwise log one failure per message
+failure_logger = get_sampled_logger(__name__, every=100)
 
-def transform_transaction(txn: dict) -> pd.DataFrame:
+# Categorical model features, encoded with the vocabulary produced by FeatureEngineering
+CATEGORICAL_FEATURES = ["category", "job", "gender"]
+
+# Bounded LRU caches for values that repeat across a card's transactions
+CARD_CACHE_SIZE = 65536
+DISTANCE_CACHE_SIZE = 262144
+
+
+@register_cache("card_profile")
+@lru_cache(maxsize=CARD_CACHE_SIZE)
+def card_profile(vocabulary, cc_num, dob: str, gender: str, job: str):
+    """
+    Static per-card attributes: parsed date of birth and the gender / job codes.
+    The attributes are part of the key, so a card whose details change is never served stale values.
+    """
+    return (datetime.strptime(dob, '%Y-%m-%d'),
+            vocabulary.encode_value("gender", gender),
+            vocabulary.encode_value("job", job))
+
+
+@register_cache("age")
+@lru_cache(maxsize=CARD_CACHE_SIZE)
+def age_on(dob: datetime, txn_date: str) -> int:
+    """
+    Age in whole years (days // 365, as at training time) on the transaction's calendar day.
+    """
+    return (datetime.fromisoformat(txn_date) - dob).days // 365
+
+
+@register_cache("distance")
+@lru_cache(maxsize=DISTANCE_CACHE_SIZE)
+def distance_km(lat: float, long: float, merch_lat: float, merch_long: float) -> float:
+    """
+    Geodesic customer -> merchant distance; repeat visits from a card's home location hit the cache.
+    """
+    return geodesic((lat, long), (merch_lat, merch_long)).km
+
+
+def transaction_features(txn: dict, vocabulary) -> dict:
+    """
+    Model features of one raw transaction. Raises if the transaction is malformed.
+    """
+    # 'YYYY-MM-DD HH:MM:SS' is ISO 8601, which fromisoformat parses far faster than strptime
+    txn_time = datetime.fromisoformat(txn["trans_date_trans_time"])
+    dob, gender_code, job_code = card_profile(vocabulary, txn["cc_num"], txn["dob"], txn["gender"], txn["job"])
+    return {
+        "category": vocabulary.encode_value("category", txn["category"]),
+        "job": job_code,
+        "gender": gender_code,
+        "city_pop": txn["city_pop"],
+        "lat": txn["lat"],
+        "long": txn["long"],
+        "merch_lat": txn["merch_lat"],
+        "merch_long": txn["merch_long"],
+        "log_amt": np.log1p(txn["amt"]),
+        "is_large_transaction": int(txn["amt"] > 200),
+        "hour": txn_time.hour,
+        "day": txn_time.day,
+        "weekday": txn_time.weekday(),
+        "age": age_on(dob, txn["trans_date_trans_time"][:10]),
+        "distance_km": distance_km(txn["lat"], txn["long"], txn["merch_lat"], txn["merch_long"])
+    }
+
+
+def transform_transaction(txn: dict, vocabulary) -> pd.DataFrame:
     """
     Transforms a raw transaction dict into model-ready features as a DataFrame.
     Args:
         txn (dict): Raw transaction from Kafka.
+        vocabulary (CategoricalVocabulary): Encoding saved at feature engineering time.
     Returns:
         pd.DataFrame: Single-row dataframe with transformed features.
     """
     try:
-        # Parse dates
-        txn_time = datetime.strptime(txn["trans_date_trans_time"], '%Y-%m-%d %H:%M:%S')
-        dob = datetime.strptime(txn["dob"], '%Y-%m-%d')
-        # Geolocation
-        cust_loc = (txn["lat"], txn["long"])
-        merch_loc = (txn["merch_lat"], txn["merch_long"])
-        distance_km = geodesic(cust_loc, merch_loc).km
-        # Feature dictionary
-        features = {
-            "category": txn["category"],
-            "job": txn["job"],
-            "gender": txn["gender"],
-            "city_pop": txn["city_pop"],
-            "lat": txn["lat"],
-            "long": txn["long"],
-            "merch_lat": txn["merch_lat"],
-            "merch_long": txn["merch_long"],
-            "log_amt": np.log1p(txn["amt"]),
-            "is_large_transaction": int(txn["amt"] > 200),
-            "hour": txn_time.hour,
-            "day": txn_time.day,
-            "weekday": txn_time.weekday(),
-            "age": (txn_time - dob).days // 365,
-            "distance_km": distance_km
-        }
-        df = pd.DataFrame([features])
-        # Set categorical columns
-        categorical_cols = ["category", "job", "gender"]
-        for col in categorical_cols:
-            df[col] = df[col].astype("category")
-        return df
+        return pd.DataFrame([transaction_features(txn, vocabulary)])
     
     except Exception as e:
-        print(f"❌ Feature transformation failed: {e}")
-        return None
\ No newline at end of file
+        failure_logger.warning(f"Feature transformation failed: {e!r}")
+        return None
+
+
+def transform_transactions(txns: list, vocabulary):
+    """
+    Micro-batch version of transform_transaction: one DataFrame for the whole batch.
+    Returns (features DataFrame or None, positions in txns of the rows it holds); malformed transactions are left out.
+    """
+    rows = []
+    kept = []
+    for i, txn in enumerate(txns):
+        try:
+            rows.append(transaction_features(txn, vocabulary))
+            kept.append(i)
+        except Exception as e:
+            failure_logger.warning(f"Feature transformation failed: {e!r}")
+    return (pd.DataFrame(rows) if rows else None), kept
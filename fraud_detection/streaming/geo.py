@@ -0,0 +1,133 @@
+import math
+import argparse
+from dotenv import load_dotenv
+from fraud_detection.logger.log import logging
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FIELD = "location"
+# Continental US, where the producer places cards and merchants: (min_lon, min_lat, max_lon, max_lat)
+DEFAULT_BBOX = (-125.0, 24.0, -66.0, 50.0)
+# Cells across the wider side of the viewport; bounds the map to GRID_CELLS ** 2 markers at any zoom
+GRID_CELLS = 64
+
+
+def geo_point(txn: dict):
+    """
+    GeoJSON Point for the transaction's lat / long ([longitude, latitude] order), or None if they are missing or out of range.
+    """
+    try:
+        lat, lon = float(txn["lat"]), float(txn["long"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def add_location(txn: dict) -> dict:
+    point = geo_point(txn)
+    if point is not None:
+        txn[LOCATION_FIELD] = point
+    return txn
+
+
+def create_geo_indexes(collection):
+    collection.create_index([(LOCATION_FIELD, "2dsphere")])
+
+
+def bbox_polygon(bbox) -> dict:
+    """
+    GeoJSON Polygon for a (min_lon, min_lat, max_lon, max_lat) viewport, usable with the 2dsphere index.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def within_bbox(bbox, match: dict = None) -> dict:
+    return {LOCATION_FIELD: {"$geoWithin": {"$geometry": bbox_polygon(bbox)}}, **(match or {})}
+
+
+def cell_size(bbox, cells: int = GRID_CELLS) -> float:
+    """
+    Cell side in degrees so the viewport's wider side spans `cells` cells, snapped to a power of two
+    so neighbouring viewports at the same zoom share cell boundaries.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    span = max(max_lon - min_lon, max_lat - min_lat, 1e-6)
+    return 2.0 ** math.floor(math.log2(span / cells))
+
+
+def grid_pipeline(bbox, cell: float, match: dict = None) -> list:
+    """
+    Aggregation that bins the frauds inside bbox into cell x cell degree squares. Returns one document per
+    non-empty cell (count, amount sum / max, centroid), so its size depends on the viewport, not the data.
+    """
+    lon = {"$arrayElemAt": [f"${LOCATION_FIELD}.coordinates", 0]}
+    lat = {"$arrayElemAt": [f"${LOCATION_FIELD}.coordinates", 1]}
+    return [
+        {"$match": within_bbox(bbox, match)},
+        {"$group": {
+            "_id": {"x": {"$floor": {"$divide": [lon, cell]}}, "y": {"$floor": {"$divide": [lat, cell]}}},
+            "count": {"$sum": 1},
+            "amt_sum": {"$sum": "$amt"},
+            "amt_max": {"$max": "$amt"},
+            "lon": {"$avg": lon},
+            "lat": {"$avg": lat},
+        }},
+        {"$project": {"_id": 0, "count": 1, "amt_sum": 1, "amt_max": 1, "lon": 1, "lat": 1}},
+    ]
+
+
+def grid_cells(collection, bbox=DEFAULT_BBOX, match: dict = None, cells: int = GRID_CELLS) -> list:
+    return list(collection.aggregate(grid_pipeline(bbox, cell_size(bbox, cells), match)))
+
+
+def points_in_bbox(collection, bbox, match: dict = None, limit: int = 2000, projection: dict = None) -> list:
+    """
+    Individual frauds inside the viewport, newest first, for drill-down once a viewport is small enough.
+    """
+    cursor = collection.find(within_bbox(bbox, match), projection or {"_id": 0})
+    return list(cursor.sort("trans_date_trans_time", -1).limit(limit))
+
+
+def backfill_locations(collection) -> int:
+    """
+    Add `location` to documents written before it existed; runs server side as one pipeline update.
+    """
+    result = collection.update_many(
+        {LOCATION_FIELD: {"$exists": False}, "lat": {"$type": "number", "$gte": -90, "$lte": 90},
+         "long": {"$type": "number", "$gte": -180, "$lte": 180}},
+        [{"$set": {LOCATION_FIELD: {"type": "Point", "coordinates": ["$long", "$lat"]}}}])
+    return result.modified_count
+
+
+def main():
+    """
+    python -m fraud_detection.streaming.geo: backfill locations and create the 2dsphere indexes.
+    """
+    import os
+    from pymongo import MongoClient
+    from fraud_detection.config.configuration import get_configuration_manager
+
+    parser = argparse.ArgumentParser(description="Backfill GeoJSON locations and create the 2dsphere indexes.")
+    parser.add_argument("--non-fraud", action="store_true", help="Also backfill the non-fraud collection.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    streaming_config = get_configuration_manager().get_streaming_config()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client[streaming_config.mongo_db]
+    names = [streaming_config.fraud_collection] + ([streaming_config.non_fraud_collection] if args.non_fraud else [])
+    try:
+        for name in names:
+            modified = backfill_locations(db[name])
+            create_geo_indexes(db[name])
+            logger.info(f"{name}: added location to {modified} documents, 2dsphere index ready")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import time
+from collections import OrderedDict
+from fraud_detection.logger.log import logging
+from fraud_detection.utils.bloom_filter import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+def mongo_exact_lookup(collections: list, field: str, query: dict = None):
+    """
+    key -> bool check against MongoDB, used only when a filter answers "maybe".
+    """
+    def lookup(key) -> bool:
+        for collection in collections:
+            for value in {key, _as_int(key)} - {None}:
+                if collection.find_one({field: value, **(query or {})}, {"_id": 1}) is not None:
+                    return True
+        return False
+    return lookup
+
+
+def _as_int(key):
+    # Card numbers may be stored as numbers (CSV imports) or strings (the producer)
+    try:
+        return int(key)
+    except (TypeError, ValueError):
+        return None
+
+
+def rebuild_from_mongo(collections: list, field: str, capacity: int, error_rate: float, query: dict = None) -> BloomFilter:
+    """
+    Stream every value of `field` out of the collections into a new filter.
+    """
+    start = time.perf_counter()
+    bloom = BloomFilter(capacity, error_rate)
+    for collection in collections:
+        collection.create_index(field)
+        cursor = collection.find(query or {}, {field: 1, "_id": 0}).batch_size(10000)
+        bloom.update(str(doc[field]) for doc in cursor if field in doc)
+    logger.info(f"Rebuilt {field} filter from MongoDB in {time.perf_counter() - start:.1f}s: {bloom.describe()}")
+    if bloom.is_full:
+        logger.warning(f"{field} filter holds {bloom.count} keys, above its capacity of {capacity}; raise the capacity")
+    return bloom
+
+
+def load_or_rebuild(file_path: str, rebuild, force_rebuild: bool = False) -> BloomFilter:
+    """
+    Load a persisted filter, or rebuild it (from MongoDB) and persist it when missing, unreadable or forced.
+    """
+    if not force_rebuild and os.path.exists(file_path):
+        try:
+            bloom = BloomFilter.load(file_path)
+            logger.info(f"Loaded filter {file_path}: {bloom.describe()}")
+            return bloom
+        except Exception as e:
+            logger.warning(f"Could not load {file_path}, rebuilding: {e}")
+    bloom = rebuild()
+    bloom.save(file_path)
+    return bloom
+
+
+class GuardedSet:
+    """
+    Bloom filter in front of an exact lookup: most non-members are answered from memory,
+    and only "maybe" answers pay for exact_lookup (a Mongo query, a set, ...).
+    exact_lookup=None trusts the filter, accepting its false-positive rate.
+    """
+
+    def __init__(self, name: str, bloom: BloomFilter, exact_lookup=None):
+        self.name = name
+        self.bloom = bloom
+        self.exact_lookup = exact_lookup
+        self.negatives = 0
+        self.exact_checks = 0
+        self.false_positives = 0
+
+    def add(self, key):
+        self.bloom.add(str(key))
+
+    def __contains__(self, key) -> bool:
+        key = str(key)
+        if key not in self.bloom:
+            self.negatives += 1
+            return False
+        if self.exact_lookup is None:
+            return True
+        self.exact_checks += 1
+        found = self.exact_lookup(key)
+        if not found:
+            self.false_positives += 1
+        return found
+
+    def stats(self) -> dict:
+        return {"negatives": self.negatives, "exact_checks": self.exact_checks,
+                "false_positives": self.false_positives, **self.bloom.describe()}
+
+
+class TransactionDeduplicator:
+    """
+    "Have we seen this transaction_id before?" for at-least-once delivery.
+    A filter miss means new. On a hit, recently seen ids are confirmed from an in-memory LRU and older
+    ones with exact_lookup, so a false positive never drops a genuine transaction.
+    The consumers check ids with contains() and record() them only once the transactions are persisted,
+    so a batch whose write failed is not dropped as duplicates when it is redelivered.
+    """
+
+    def __init__(self, bloom: BloomFilter, exact_lookup=None, recent_size: int = 100000):
+        self.bloom = bloom
+        self.exact_lookup = exact_lookup
+        self.recent_size = recent_size
+        self.recent = OrderedDict()
+        self.duplicates = 0
+        self.false_positives = 0
+
+    def _remember(self, key):
+        self.recent[key] = None
+        if len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+
+    def contains(self, transaction_id) -> bool:
+        """
+        True if the id was recorded before; nothing is recorded.
+        """
+        if transaction_id is None:
+            return False
+        key = str(transaction_id)
+        if key not in self.bloom:
+            return False
+        if key in self.recent or (self.exact_lookup is not None and self.exact_lookup(key)):
+            self.duplicates += 1
+            return True
+        self.false_positives += 1
+        return False
+
+    def record(self, transaction_ids):
+        """
+        Mark ids as seen.
+        """
+        for transaction_id in transaction_ids:
+            if transaction_id is not None:
+                key = str(transaction_id)
+                self.bloom.add(key)
+                self._remember(key)
+
+    def seen(self, transaction_id) -> bool:
+        """
+        True if the id was seen before; otherwise records it and returns False.
+        """
+        if self.contains(transaction_id):
+            return True
+        self.record([transaction_id])
+        return False
+
+    def stats(self) -> dict:
+        return {"duplicates": self.duplicates, "false_positives": self.false_positives, **self.bloom.describe()}
+
+
+def build_membership(db, streaming_config, membership_config):
+    """
+    Deduplicator over the scored-transaction collections and the configured watchlists, loaded from
+    membership_config.filter_dir or rebuilt from MongoDB at startup.
+    Returns (TransactionDeduplicator, {watchlist name: GuardedSet}).
+    """
+    scored = [db[streaming_config.fraud_collection], db[streaming_config.non_fraud_collection]]
+    dedup = membership_config.dedup
+    dedup_bloom = load_or_rebuild(
+        os.path.join(membership_config.filter_dir, "transaction_ids.bloom"),
+        lambda: rebuild_from_mongo(scored, "transaction_id", dedup["capacity"], dedup["error_rate"]),
+        force_rebuild=membership_config.rebuild_on_start)
+    deduplicator = TransactionDeduplicator(dedup_bloom, mongo_exact_lookup(scored, "transaction_id"),
+                                           recent_size=dedup["recent_ids"])
+    return deduplicator, build_watchlists(db, membership_config)
+
+
+def build_watchlists(db, membership_config, names=None) -> dict:
+    """
+    {watchlist name: GuardedSet} for the configured watchlists (only `names` when given), loaded from
+    membership_config.filter_dir or rebuilt from MongoDB.
+    """
+    watchlists = {}
+    for name, watchlist in membership_config.watchlists.items():
+        if names is not None and name not in names:
+            continue
+        collection = db[watchlist["collection"]]
+        bloom = load_or_rebuild(
+            os.path.join(membership_config.filter_dir, f"watchlist_{name}.bloom"),
+            lambda: rebuild_from_mongo([collection], watchlist["field"], watchlist["capacity"], watchlist["error_rate"]),
+            force_rebuild=membership_config.rebuild_on_start)
+        watchlists[name] = GuardedSet(name, bloom, mongo_exact_lookup([collection], watchlist["field"]))
+    return watchlists
+
+
+def save_membership(deduplicator: TransactionDeduplicator, membership_config):
+    """
+    Persist the dedup filter so a restart without rebuild_on_start keeps the ids seen so far.
+    """
+    deduplicator.bloom.save(os.path.join(membership_config.filter_dir, "transaction_ids.bloom"))
+    logger.info(f"Saved dedup filter: {deduplicator.stats()}")
@@ -0,0 +1,266 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fraud_detection.logger.log import logging
+
+# Latency buckets in seconds, from sub-millisecond scoring up to multi-minute consumer lag
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+# name -> functools.lru_cache-wrapped function whose hit/miss counts are exported by StreamingMetrics
+CACHES = {}
+
+
+def register_cache(name: str):
+    """
+    Decorator exporting the cache_info() of an lru_cache-wrapped function as fraud_cache_* gauges.
+    """
+    def decorator(cached_function):
+        CACHES[name] = cached_function
+        return cached_function
+    return decorator
+
+
+class Counter:
+    """
+    Monotonic counter. Updates are plain attribute increments from the consumer thread;
+    readers (HTTP endpoint, log summary) may see a value that is one update stale, which is fine for metrics.
+    """
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, "", self.value
+
+
+class Gauge:
+    """
+    Point-in-time value, optionally split by one label (e.g. partition) via labels().
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_name: str = None):
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        self.value = 0.0
+        self._children = {}
+
+    def set(self, value):
+        self.value = value
+
+    def labels(self, label_value):
+        child = self._children.get(label_value)
+        if child is None:
+            child = self._children[label_value] = Gauge(self.name, self.documentation)
+        return child
+
+    def samples(self):
+        if self.label_name is None:
+            yield self.name, "", self.value
+        else:
+            for label_value, child in list(self._children.items()):
+                yield self.name, f'{{{self.label_name}="{label_value}"}}', child.value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect plus three in-place updates; buckets are preallocated.
+    """
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """
+        Estimate a quantile by linear interpolation inside the bucket that contains it.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.bounds[-1]
+
+    def samples(self):
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            cumulative += bucket_count
+            yield f"{self.name}_bucket", f'{{le="{bound}"}}', cumulative
+        yield f"{self.name}_bucket", '{le="+Inf"}', self.count
+        yield f"{self.name}_sum", "", self.sum
+        yield f"{self.name}_count", "", self.count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class StreamingMetrics:
+    """
+    Metrics for the consume -> transform -> score -> persist path.
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.consumed = r.register(Counter("fraud_messages_consumed_total", "Messages taken off the topic."))
+        self.scored = r.register(Counter("fraud_messages_scored_total", "Messages scored and persisted."))
+        self.duplicates = r.register(Counter("fraud_messages_duplicate_total", "Redelivered messages dropped by transaction_id dedup."))
+        self.skipped = r.register(Counter("fraud_messages_skipped_total", "Messages skipped because feature transformation failed."))
+        self.failed = r.register(Counter("fraud_messages_failed_total", "Messages that raised while being processed."))
+        self.invalid = r.register(Counter("fraud_messages_invalid_total", "Messages that failed to decode or failed schema validation, sent to the dead letters."))
+        self.validate = r.register(Histogram("fraud_validate_seconds", "Schema validation time per message or micro-batch."))
+        self.frauds = r.register(Counter("fraud_predictions_fraud_total", "Messages predicted as fraud."))
+        self.fraud_rate = r.register(Gauge("fraud_prediction_rate", "Share of scored messages predicted as fraud."))
+        self.produce_to_consume = r.register(Histogram("fraud_produce_to_consume_seconds", "Kafka message timestamp to consumer receipt."))
+        self.rules = r.register(Histogram("fraud_rules_seconds", "Rule engine evaluation time per micro-batch."))
+        self.rule_actions = {action: r.register(Counter(f"fraud_rule_{action}_total", f"Transactions whose deciding rule action was {action}."))
+                             for action in ("block", "allow", "flag")}
+        self.transform = r.register(Histogram("fraud_transform_seconds", "Decode and feature transformation time per message or micro-batch."))
+        self.score = r.register(Histogram("fraud_score_seconds", "Model scoring time per message or micro-batch."))
+        self.sink_write = r.register(Histogram("fraud_sink_write_seconds", "Time to persist a scored message or micro-batch."))
+        self.processing = r.register(Histogram("fraud_processing_seconds", "Receipt to persisted, inside the consumer."))
+        self.end_to_end = r.register(Histogram("fraud_end_to_end_seconds", "Kafka message timestamp to persisted."))
+        self.rollup_flush = r.register(Histogram("fraud_rollup_flush_seconds", "Time to upsert buffered rollup deltas."))
+        self.rollup_flush_failures = r.register(Counter("fraud_rollup_flush_failures_total", "Rollup flushes that failed and were kept for retry."))
+        self.archived = r.register(Counter("fraud_archived_total", "Non-fraud transactions buffered for the Parquet archive."))
+        self.archive_flush = r.register(Histogram("fraud_archive_flush_seconds", "Time to write buffered archive rows as Parquet part files."))
+        self.archive_flush_failures = r.register(Counter("fraud_archive_flush_failures_total", "Archive writes that failed and were kept for retry."))
+        self.overload_mode = r.register(Gauge("fraud_overload_mode", "Overload controller mode: 0 normal, higher is more degraded."))
+        self.overload_transitions = r.register(Counter("fraud_overload_transitions_total", "Overload mode changes, up or down."))
+        self.shed = r.register(Counter("fraud_messages_shed_total", "Low-amount messages settled without the primary model under load shedding."))
+        self.consumer_lag = r.register(Gauge("fraud_consumer_lag_messages", "High watermark minus consumed offset.", label_name="partition"))
+        self.drift_psi = r.register(Gauge("fraud_drift_psi", "Population stability index of the last drift window against the training profile.", label_name="feature"))
+        self.drift_ks = r.register(Gauge("fraud_drift_ks", "Binned Kolmogorov-Smirnov distance of the last drift window.", label_name="feature"))
+        self.drift_alerts = r.register(Counter("fraud_drift_alerts_total", "Drift windows with at least one feature over its threshold."))
+        self.cache_hits = r.register(Gauge("fraud_cache_hits", "Hot-path cache hits.", label_name="cache"))
+        self.cache_misses = r.register(Gauge("fraud_cache_misses", "Hot-path cache misses.", label_name="cache"))
+        self.cache_size = r.register(Gauge("fraud_cache_entries", "Entries held by each hot-path cache.", label_name="cache"))
+
+    def refresh_derived(self):
+        """
+        Derived gauges are computed when read, never on the hot path.
+        """
+        scored = self.scored.value
+        self.fraud_rate.set(self.frauds.value / scored if scored else 0.0)
+        for name, cached_function in list(CACHES.items()):
+            info = cached_function.cache_info()
+            self.cache_hits.labels(name).set(info.hits)
+            self.cache_misses.labels(name).set(info.misses)
+            self.cache_size.labels(name).set(info.currsize)
+
+    def cache_hit_rates(self) -> dict:
+        self.refresh_derived()
+        rates = {}
+        for name, hits in self.cache_hits._children.items():
+            total = hits.value + self.cache_misses.labels(name).value
+            rates[name] = hits.value / total if total else 0.0
+        return rates
+
+    def render(self) -> str:
+        self.refresh_derived()
+        return self.registry.render()
+
+    def summary(self) -> str:
+        self.refresh_derived()
+
+        def ms(histogram, q):
+            value = histogram.quantile(q)
+            return "n/a" if value is None else f"{value * 1000:.2f}ms"
+
+        lag = {label: child.value for label, child in self.consumer_lag._children.items()}
+        return (f"consumed={self.consumed.value} scored={self.scored.value} skipped={self.skipped.value} "
+                f"invalid={self.invalid.value} failed={self.failed.value} fraud_rate={self.fraud_rate.value:.4%} | "
+                f"transform p50={ms(self.transform, 0.5)} p99={ms(self.transform, 0.99)} | "
+                f"score p50={ms(self.score, 0.5)} p99={ms(self.score, 0.99)} | "
+                f"sink p50={ms(self.sink_write, 0.5)} p99={ms(self.sink_write, 0.99)} | "
+                f"end_to_end p50={ms(self.end_to_end, 0.5)} p99={ms(self.end_to_end, 0.99)} | "
+                f"produce_to_consume p99={ms(self.produce_to_consume, 0.99)} | lag={lag} | "
+                f"overload_mode={self.overload_mode.value} shed={self.shed.value} | "
+                f"cache_hit_rate={ {name: round(rate, 3) for name, rate in self.cache_hit_rates().items()} }")
+
+
+# Process-wide metrics used by the consumer path
+STREAMING_METRICS = StreamingMetrics()
+
+
+def start_metrics_server(metrics: StreamingMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve metrics.render() at /metrics on a daemon thread.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
+
+
+def start_metrics_logger(metrics: StreamingMetrics, interval_seconds: float) -> threading.Event:
+    """
+    Log metrics.summary() every interval_seconds on a daemon thread. Set the returned event to stop it.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval_seconds):
+            logging.info(f"Streaming metrics: {metrics.summary()}")
+
+    threading.Thread(target=run, name="metrics-logger", daemon=True).start()
+    return stop
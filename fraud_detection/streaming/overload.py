@@ -0,0 +1,169 @@
+import time
+from collections import namedtuple
+from fraud_detection.logger.log import logging
+from fraud_detection.streaming.metrics import STREAMING_METRICS, StreamingMetrics
+
+logger = logging.getLogger(__name__)
+
+# One operating mode. lag / latency_seconds: entry thresholds (either one reached enters the mode, None = unused);
+# batch_multiplier: consume() batch size factor; skip_drift: stop feeding the drift monitor;
+# slim_non_fraud: persist non-frauds with only non_fraud_fields; shed_below_amount: transactions under this amount
+# that no rule matched are settled without the primary model (fallback model, or not-fraud when there is none).
+OverloadMode = namedtuple("OverloadMode", ["name", "level", "lag", "latency_seconds", "batch_multiplier",
+                                           "skip_drift", "slim_non_fraud", "shed_below_amount"])
+
+NORMAL = OverloadMode("normal", 0, None, None, 1, False, False, None)
+
+
+def total_consumer_lag(metrics: StreamingMetrics) -> int:
+    """
+    Sum of the per-partition lag gauges (as of the last refresh_consumer_lag).
+    """
+    return sum(child.value for child in list(metrics.consumer_lag._children.values()))
+
+
+class OverloadController:
+    """
+    Picks the consumer's operating mode from consumer lag and end-to-end latency.
+    Modes are ordered from mildest to most degraded; update() enters the most degraded mode whose lag or latency
+    threshold is reached, at once. It steps back down one mode at a time, and only after both signals have stayed
+    under recover_ratio x the current mode's thresholds for recover_seconds, so a draining backlog does not flap.
+    Latency is smoothed with an exponential moving average (latency_smoothing = weight of the newest batch).
+    """
+
+    def __init__(self, modes: list, metrics: StreamingMetrics = STREAMING_METRICS, recover_ratio: float = 0.5,
+                 recover_seconds: float = 30.0, latency_smoothing: float = 0.2, fallback_scorer=None,
+                 non_fraud_fields: list = (), clock=time.monotonic):
+        self.modes = [NORMAL] + [mode._replace(level=level) for level, mode in enumerate(modes, start=1)]
+        self.metrics = metrics
+        self.recover_ratio = recover_ratio
+        self.recover_seconds = recover_seconds
+        self.latency_smoothing = latency_smoothing
+        self.fallback_scorer = fallback_scorer
+        self.non_fraud_fields = list(non_fraud_fields)
+        self.clock = clock
+        self.mode = NORMAL
+        self.lag = 0
+        self.latency = 0.0
+        self.pinned = False
+        self._calm_since = None
+        metrics.overload_mode.set(0)
+
+    @classmethod
+    def from_config(cls, overload_config, metrics: StreamingMetrics = STREAMING_METRICS, fallback_scorer=None,
+                    extra_fields: list = (), slim_non_fraud: bool = True):
+        """
+        extra_fields: kept on slimmed non-fraud documents as well (e.g. the rollup dimensions).
+        slim_non_fraud: False ignores the modes' slim_non_fraud (the non-fraud archive needs complete rows).
+        """
+        modes = [OverloadMode(name=spec["name"], level=None, lag=spec.get("lag"),
+                              latency_seconds=spec.get("latency_seconds"),
+                              batch_multiplier=int(spec.get("batch_multiplier", 1)),
+                              skip_drift=bool(spec.get("skip_drift", False)),
+                              slim_non_fraud=slim_non_fraud and bool(spec.get("slim_non_fraud", False)),
+                              shed_below_amount=spec.get("shed_below_amount"))
+                 for spec in overload_config.modes]
+        fields = list(overload_config.non_fraud_fields) + [field for field in extra_fields
+                                                           if field not in overload_config.non_fraud_fields]
+        return cls(modes, metrics, recover_ratio=overload_config.recover_ratio,
+                   recover_seconds=overload_config.recover_seconds,
+                   latency_smoothing=overload_config.latency_smoothing,
+                   fallback_scorer=fallback_scorer, non_fraud_fields=fields)
+
+    def _reached(self, mode: OverloadMode, lag, latency, ratio: float = 1.0) -> bool:
+        return ((mode.lag is not None and lag >= mode.lag * ratio)
+                or (mode.latency_seconds is not None and latency >= mode.latency_seconds * ratio))
+
+    def update(self, lag: int = None, latency: float = None) -> OverloadMode:
+        """
+        Feed the latest signals (either may be None when unknown) and return the mode to run the next batch in.
+        lag: total consumer lag in messages; latency: seconds from the oldest message's timestamp to persisted
+        """
+        if lag is not None:
+            self.lag = lag
+        if latency is not None:
+            self.latency += self.latency_smoothing * (latency - self.latency)
+        if self.pinned:
+            return self.mode
+
+        target = NORMAL
+        for mode in self.modes[1:]:
+            if self._reached(mode, self.lag, self.latency):
+                target = mode
+        if target.level > self.mode.level:
+            self._transition(target)
+        elif self.mode.level and not self._reached(self.mode, self.lag, self.latency, self.recover_ratio):
+            now = self.clock()
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recover_seconds:
+                self._transition(self.modes[self.mode.level - 1])
+        else:
+            self._calm_since = None
+        return self.mode
+
+    def pin(self, name: str):
+        """
+        Hold a mode regardless of the signals (replay, load tests).
+        """
+        mode = next((mode for mode in self.modes if mode.name == name), None)
+        if mode is None:
+            raise ValueError(f"Unknown overload mode '{name}', expected one of {[m.name for m in self.modes]}")
+        self._transition(mode)
+        self.pinned = True
+
+    def _transition(self, mode: OverloadMode):
+        previous, self.mode = self.mode, mode
+        self._calm_since = None
+        if mode == previous:
+            return
+        self.metrics.overload_mode.set(mode.level)
+        self.metrics.overload_transitions.inc()
+        message = (f"Overload mode {previous.name} -> {mode.name} (lag={self.lag}, latency={self.latency:.2f}s, "
+                   f"batch x{mode.batch_multiplier}, skip_drift={mode.skip_drift}, slim_non_fraud={mode.slim_non_fraud}, "
+                   f"shed_below_amount={mode.shed_below_amount})")
+        if mode.level > previous.level:
+            logger.warning(message, extra={"overload_mode": mode.name})
+        else:
+            logger.info(message, extra={"overload_mode": mode.name})
+
+    def batch_size(self, base: int) -> int:
+        return base * self.mode.batch_multiplier
+
+    def sheddable(self, txn: dict) -> bool:
+        threshold = self.mode.shed_below_amount
+        amount = txn.get("amt")
+        return threshold is not None and isinstance(amount, (int, float)) and amount < threshold
+
+    def settle_shed(self, txns: list):
+        """
+        Decide shed transactions without the primary model: scored by the fallback model when one is loaded,
+        otherwise recorded as not fraud (rules were still applied to them).
+        Returns the positions settled; the fallback model skips transactions it cannot transform.
+        """
+        self.metrics.shed.inc(len(txns))
+        if self.fallback_scorer is None:
+            for txn in txns:
+                txn["is_fraud"] = 0
+                txn["decision_source"] = "shed"
+            return list(range(len(txns)))
+
+        features_df, kept = self.fallback_scorer.transform_many(txns)
+        if features_df is not None:
+            predictions, probabilities = self.fallback_scorer.score(features_df)
+            for position, prediction, probability in zip(kept, predictions, probabilities):
+                txn = txns[position]
+                txn["is_fraud"] = int(prediction)
+                txn["fraud_score"] = round(float(probability), 6)
+                txn["decision_source"] = "fallback_model"
+        return kept
+
+    def for_sink(self, txns: list) -> list:
+        """
+        Documents to persist: in a slim_non_fraud mode, non-frauds keep only non_fraud_fields.
+        """
+        if not self.mode.slim_non_fraud:
+            return txns
+        fields = self.non_fraud_fields
+        return [txn if txn["is_fraud"] == 1 else {field: txn[field] for field in fields if field in txn}
+                for txn in txns]
@@ -0,0 +1,237 @@
+import gc
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+from datetime import datetime
+from dotenv import load_dotenv
+from fraud_detection.config.configuration import get_configuration_manager
+from fraud_detection.logger.log import logging, restart_logging
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.utils.profiling import start_stack_snapshots
+
+logger = logging.getLogger(__name__)
+
+# smaps_rollup fields (kB) behind each figure of memory_usage
+_SMAPS_FIELDS = {"rss_mb": ("Rss",), "pss_mb": ("Pss",), "uss_mb": ("Private_Clean", "Private_Dirty"),
+                 "shared_mb": ("Shared_Clean", "Shared_Dirty")}
+
+
+def memory_usage(pid: int = None) -> dict:
+    """
+    Resident memory of a process in MB: rss, pss (shared pages divided among the processes sharing them),
+    uss (pages only this process has) and shared. Only rss where smaps_rollup is unavailable; None off Linux.
+    """
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            values = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    values[parts[0].rstrip(":")] = int(parts[1])
+        return {name: round(sum(values.get(field, 0) for field in fields) / 1024, 1)
+                for name, fields in _SMAPS_FIELDS.items()}
+    except OSError:
+        pass
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return {"rss_mb": round(int(line.split()[1]) / 1024, 1)}
+    except OSError:
+        pass
+    return None
+
+
+def warm_up(shared):
+    """
+    Score one transaction with every loaded model, so what the first call builds lazily is built before the fork
+    and shared with the workers too.
+    """
+    from fraud_detection.data_generator.producer import generate_transaction
+
+    scorers = [shared.scorer]
+    if shared.overload is not None and shared.overload.fallback_scorer is not None:
+        scorers.append(shared.overload.fallback_scorer)
+    for scorer in scorers:
+        features_df = scorer.transform(generate_transaction())
+        if features_df is not None:
+            scorer.score(features_df)
+
+
+class PreforkSupervisor:
+    """
+    Runs `workers` copies of target(index) in processes forked from this one, so everything loaded here beforehand
+    (the model, vocabulary, validator) is inherited copy-on-write instead of being loaded again by every worker.
+    Workers that exit unexpectedly are restarted after restart_delay. SIGINT / SIGTERM are passed on to the workers
+    as SIGINT, which the consumers handle as a graceful stop; a second one kills them.
+    Every report_interval the memory of the supervisor and workers is logged and written to report_file.
+    """
+
+    def __init__(self, target, workers: int, report_file: str = None, report_interval: float = 60.0,
+                 restart_delay: float = 5.0):
+        self.target = target
+        self.workers = workers
+        self.report_file = report_file
+        self.report_interval = report_interval
+        self.restart_delay = restart_delay
+        self.children = {}
+        self._restarts = {}
+        self._signals = 0
+
+    def _fork(self, index: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            logger.info(f"Started worker {index} (pid {pid})")
+            return
+        # Worker: own process group, so a terminal's Ctrl-C reaches it once, through the supervisor
+        os.setpgid(0, 0)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        listener = restart_logging(f"_worker{index}")
+        status = 0
+        try:
+            self.target(index)
+        except KeyboardInterrupt:
+            pass
+        except BaseException as e:
+            logger.exception(f"Worker {index} failed: {e}")
+            status = 1
+        finally:
+            listener.stop()
+            os._exit(status)
+
+    def _on_signal(self, signum, frame):
+        self._signals += 1
+        sig = signal.SIGINT if self._signals == 1 else signal.SIGKILL
+        logger.info(f"Received signal {signum}, sending {sig.name} to {len(self.children)} workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+            index = self.children.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if self._signals:
+                logger.info(f"Worker {index} (pid {pid}) stopped with status {code}")
+            else:
+                logger.warning(f"Worker {index} (pid {pid}) exited with status {code}, "
+                               f"restarting in {self.restart_delay}s")
+                self._restarts[index] = time.monotonic() + self.restart_delay
+
+    def memory_report(self) -> dict:
+        """
+        Memory of the supervisor and each worker. pss_mb totals add up to what the group really occupies;
+        the rss_mb sum counts every shared page once per process.
+        """
+        workers = [{"index": index, "pid": pid, **(memory_usage(pid) or {})}
+                   for pid, index in sorted(self.children.items(), key=lambda item: item[1])]
+        supervisor = {"pid": os.getpid(), **(memory_usage() or {})}
+        processes = [supervisor] + workers
+        report = {"time": datetime.now().isoformat(timespec="seconds"), "supervisor": supervisor, "workers": workers}
+        for key in ("rss_mb", "pss_mb"):
+            if all(key in process for process in processes):
+                report[f"total_{key}"] = round(sum(process[key] for process in processes), 1)
+        return report
+
+    def write_memory_report(self) -> dict:
+        report = self.memory_report()
+        workers = report["workers"]
+        if workers and "pss_mb" in workers[0]:
+            logger.info(f"Memory of {len(workers)} workers: PSS total {report['total_pss_mb']}MB "
+                        f"(RSS sum {report['total_rss_mb']}MB), per worker USS "
+                        f"{', '.join(str(worker['uss_mb']) for worker in workers)}MB")
+        if self.report_file:
+            os.makedirs(os.path.dirname(self.report_file), exist_ok=True)
+            with open(self.report_file, "w") as f:
+                json.dump(report, f, indent=2)
+        return report
+
+    def run(self):
+        try:
+            # Whatever the collector would traverse in a worker stays shared: nothing loaded so far is collected
+            gc.collect()
+            gc.freeze()
+            signal.signal(signal.SIGINT, self._on_signal)
+            signal.signal(signal.SIGTERM, self._on_signal)
+            for index in range(self.workers):
+                self._fork(index)
+
+            next_report = time.monotonic() + self.report_interval
+            while self.children or (self._restarts and not self._signals):
+                time.sleep(0.5)
+                self._reap()
+                now = time.monotonic()
+                for index, restart_at in list(self._restarts.items()):
+                    if self._signals:
+                        self._restarts.clear()
+                    elif now >= restart_at:
+                        del self._restarts[index]
+                        self._fork(index)
+                if now >= next_report and self.children:
+                    self.write_memory_report()
+                    next_report = now + self.report_interval
+            logger.info("All workers stopped")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several consumers sharing one loaded model")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: prefork_config.workers)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run the asyncio consumer in each worker instead of the synchronous one")
+    parser.add_argument("--profile", nargs="?", const="all", default=None,
+                        help="Write periodic sampled stack snapshots of each worker to artifacts/reports/profiles "
+                             "(also enabled by the FRAUD_PROFILE env var)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    app_config = get_configuration_manager()
+    prefork_config = app_config.get_prefork_config()
+    metrics_port = app_config.get_streaming_config().metrics_port
+
+    # Kafka / Mongo clients and their threads are created after the fork, in each worker; only the models are loaded here
+    from fraud_detection.streaming import consumer
+
+    shared = consumer.load_shared_artifacts(app_config)
+    warm_up(shared)
+    logger.info(f"Shared artifacts loaded, supervisor memory: {memory_usage()}")
+
+    def run_worker(index: int):
+        if args.use_async:
+            from fraud_detection.streaming import async_consumer
+
+            snapshots = start_stack_snapshots(app_config.get_profiling_config(), f"async_consumer_{index}", args.profile)
+            try:
+                asyncio.run(async_consumer.serve(app_config, shared, metrics_port=metrics_port + index))
+            finally:
+                if snapshots is not None:
+                    snapshots.stop()
+        else:
+            consumer.serve(app_config, shared, metrics_port=metrics_port + index, run_name=f"consumer_{index}",
+                           profile=args.profile)
+
+    PreforkSupervisor(run_worker, args.workers or prefork_config.workers,
+                      report_file=os.path.join(prefork_config.memory_report_dir, "memory.json"),
+                      report_interval=prefork_config.memory_report_interval_seconds,
+                      restart_delay=prefork_config.restart_delay_seconds).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+from dotenv import load_dotenv
+from fraud_detection.config.configuration import get_configuration_manager
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.logger.log import logging
+from fraud_detection.streaming.archive import ArchivingSink, ParquetArchive
+from fraud_detection.streaming.consumer import process_batch, load_overload_controller, load_rule_engine, load_validator
+from fraud_detection.streaming.drift import DriftMonitor, load_drift_monitor
+from fraud_detection.streaming.membership import TransactionDeduplicator
+from fraud_detection.streaming.metrics import StreamingMetrics
+from fraud_detection.streaming.overload import OverloadController
+from fraud_detection.streaming.rule_engine import RuleEngine
+from fraud_detection.streaming.scorer import FraudScorer
+from fraud_detection.streaming.serialization import get_serializer
+from fraud_detection.streaming.sinks import MongoSink, MemorySink, NullSink, MemoryDeadLetterSink
+from fraud_detection.streaming.sources import CsvSource, JsonlSource, GeneratorSource
+from fraud_detection.utils.bloom_filter import BloomFilter
+from fraud_detection.utils.profiling import start_stack_snapshots
+from fraud_detection.utils.schema_validator import SchemaValidator
+
+
+class ReplayEngine:
+    """
+    Drives a source through the consumer's process_batch path (decode -> rules -> transform -> score -> persist)
+    and measures throughput, per-message latency and, for labelled sources, the confusion matrix.
+    rate: target messages per second, or None to run at full speed.
+    batch_size: messages per micro-batch; a message's latency is that of its batch.
+    metrics: the drift monitor's metrics, if one is given; by default a private set.
+    validator: optional SchemaValidator; rejected messages are kept in a MemoryDeadLetterSink and counted by reason.
+    overload: optional OverloadController, usually pinned to one mode to measure what that mode buys.
+    """
+
+    def __init__(self, scorer: FraudScorer, sink, rate: float = None, batch_size: int = 1, rule_engine: RuleEngine = None,
+                 deduplicator: TransactionDeduplicator = None, drift_monitor: DriftMonitor = None,
+                 metrics: StreamingMetrics = None, validator: SchemaValidator = None, overload: OverloadController = None):
+        self.scorer = scorer
+        self.sink = sink
+        self.rate = rate
+        self.batch_size = batch_size
+        self.rule_engine = rule_engine
+        self.deduplicator = deduplicator
+        self.drift_monitor = drift_monitor
+        self.validator = validator
+        self.overload = overload
+        self.dead_letters = MemoryDeadLetterSink(max_entries=100)
+        # A private metrics set, so a replay's stage timings are not mixed with anything else in the process
+        self.metrics = metrics or StreamingMetrics()
+
+    def run(self, source) -> dict:
+        latencies = []
+        labels = []
+        predictions = []
+        polled = skipped = errors = 0
+
+        start = time.perf_counter()
+        while True:
+            if self.rate:
+                # Pace against the schedule rather than sleeping a fixed gap, so processing time is absorbed
+                delay = start + polled / self.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            msgs = source.consume(self.overload.batch_size(self.batch_size) if self.overload is not None else self.batch_size, 0)
+            if not msgs:
+                if getattr(source, "exhausted", False):
+                    break
+                continue
+            polled += len(msgs)
+
+            t0 = time.perf_counter()
+            try:
+                txns = process_batch(msgs, self.scorer, self.sink, self.metrics, self.rule_engine, self.deduplicator,
+                                     self.drift_monitor, self.validator, self.dead_letters, self.overload)
+            except Exception as e:
+                errors += len(msgs)
+                logging.error(f"Replay error at offsets {msgs[0].offset()}-{msgs[-1].offset()}: {e}")
+                continue
+            latencies.extend([time.perf_counter() - t0] * len(msgs))
+
+            for msg, txn in zip(msgs, txns):
+                if txn is None:
+                    skipped += 1
+                elif getattr(msg, "label", None) is not None:
+                    labels.append(msg.label)
+                    predictions.append(txn["is_fraud"])
+
+        self.sink.flush()
+        elapsed = time.perf_counter() - start
+        if self.drift_monitor is not None:
+            # Close the last, partial window so short replays still get a drift report
+            self.drift_monitor.evaluate()
+        return self.build_report(polled, skipped, errors, elapsed, latencies, labels, predictions)
+
+    def build_report(self, polled, skipped, errors, elapsed, latencies, labels, predictions) -> dict:
+        invalid = self.dead_letters.written
+        report = {
+            "messages": polled,
+            "scored": polled - skipped - errors,
+            "skipped": skipped - invalid,
+            "invalid": invalid,
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "target_rate_per_s": self.rate,
+            "throughput_per_s": round(polled / elapsed, 2) if elapsed > 0 else None,
+            "batch_size": self.batch_size,
+        }
+        if invalid:
+            report["invalid_reasons"] = dict(self.dead_letters.reasons.most_common(20))
+        if self.deduplicator is not None:
+            report["dedup"] = self.deduplicator.stats()
+        if self.drift_monitor is not None:
+            report["drift"] = {
+                "windows": self.drift_monitor.windows,
+                "windows_with_drift": self.metrics.drift_alerts.value,
+                "last_window_psi": {child: gauge.value for child, gauge in self.metrics.drift_psi._children.items()},
+                "last_window_drifted": self.drift_monitor.last_report.get("drifted", {}),
+            }
+        if self.overload is not None:
+            report["overload"] = {"mode": self.overload.mode.name,
+                                  "batch_size": self.overload.batch_size(self.batch_size),
+                                  "shed": self.metrics.shed.value}
+        if self.rule_engine is not None:
+            report["rule_decisions"] = {action: counter.value for action, counter in self.metrics.rule_actions.items()}
+
+        if latencies:
+            latencies_ms = np.asarray(latencies) * 1000
+            report["latency_ms"] = {
+                "mean": round(float(latencies_ms.mean()), 4),
+                "p50": round(float(np.percentile(latencies_ms, 50)), 4),
+                "p90": round(float(np.percentile(latencies_ms, 90)), 4),
+                "p95": round(float(np.percentile(latencies_ms, 95)), 4),
+                "p99": round(float(np.percentile(latencies_ms, 99)), 4),
+                "max": round(float(latencies_ms.max()), 4),
+            }
+            report["stage_latency_ms"] = {
+                stage: {q: round(histogram.quantile(p) * 1000, 4) for q, p in (("p50", 0.5), ("p99", 0.99))}
+                for stage, histogram in (("validate", self.metrics.validate),
+                                         ("rules", self.metrics.rules),
+                                         ("transform", self.metrics.transform),
+                                         ("score", self.metrics.score),
+                                         ("sink_write", self.metrics.sink_write))
+                if histogram.count
+            }
+
+        if labels:
+            y_true = np.asarray(labels)
+            y_pred = np.asarray(predictions)
+            tp = int(((y_true == 1) & (y_pred == 1)).sum())
+            fp = int(((y_true == 0) & (y_pred == 1)).sum())
+            fn = int(((y_true == 1) & (y_pred == 0)).sum())
+            tn = int(((y_true == 0) & (y_pred == 0)).sum())
+            report["confusion_matrix"] = {"tn": tn, "fp": fp, "fn": fn, "tp": tp}
+            report["precision"] = round(tp / (tp + fp), 6) if tp + fp else None
+            report["recall"] = round(tp / (tp + fn), 6) if tp + fn else None
+            report["accuracy"] = round((tp + tn) / len(y_true), 6)
+
+        return report
+
+
+def build_source(args, topic: str):
+    serializer = get_serializer(args.wire_format)
+    if args.source == "csv":
+        return CsvSource(args.path, topic=topic, limit=args.limit, serializer=serializer)
+    if args.source == "jsonl":
+        return JsonlSource(args.path, topic=topic, limit=args.limit, serializer=serializer)
+    return GeneratorSource(topic=topic, limit=args.limit or 10000, serializer=serializer)
+
+
+def build_sink(args, streaming_config):
+    if args.sink == "mongo":
+        load_dotenv()
+        return MongoSink.from_uri(os.getenv("MONGO_URI"), streaming_config)
+    if args.sink == "memory":
+        return MemorySink(max_documents=10000)
+    return NullSink()
+
+
+def build_replay_deduplicator(membership_config) -> TransactionDeduplicator:
+    # No MongoDB offline: ids are confirmed only against the in-memory recent window
+    dedup = membership_config.dedup
+    return TransactionDeduplicator(BloomFilter(dedup["capacity"], dedup["error_rate"]), recent_size=dedup["recent_ids"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay transactions through the streaming scorer offline")
+    parser.add_argument("--source", choices=["csv", "jsonl", "generator"], default="csv")
+    parser.add_argument("--path", help="CSV/JSONL file to replay (defaults to clean_data.csv for --source csv)")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many messages")
+    parser.add_argument("--rate", type=float, default=None, help="Target messages/second (default: full speed)")
+    parser.add_argument("--sink", choices=["null", "memory", "mongo"], default="null")
+    parser.add_argument("--archive", action="store_true",
+                        help="Write non-frauds to the Parquet archive of archive_config, the sink getting its non_fraud_mongo documents")
+    parser.add_argument("--batch-size", type=int, default=1, help="Messages per micro-batch")
+    parser.add_argument("--no-rules", action="store_true", help="Score every message with the model, skipping the rule engine")
+    parser.add_argument("--dedup", action="store_true", help="Drop repeated transaction_ids with an in-memory filter")
+    parser.add_argument("--no-validate", action="store_true", help="Skip the schema.yaml checks on each message")
+    parser.add_argument("--wire-format", choices=["json", "binary"], default=None,
+                        help="Payload format of the replayed messages (default: streaming_config.wire_format)")
+    parser.add_argument("--drift", action="store_true", help="Compare the replayed features and scores with the training profile")
+    parser.add_argument("--overload-mode", help="Run the whole replay in this overload_config mode (e.g. shedding)")
+    parser.add_argument("--profile", nargs="?", const="all", default=None,
+                        help="Write sampled stack snapshots of the replay to artifacts/reports/profiles "
+                             "(also enabled by the FRAUD_PROFILE env var)")
+    args = parser.parse_args()
+
+    try:
+        app_config = get_configuration_manager()
+        streaming_config = app_config.get_streaming_config()
+        args.wire_format = args.wire_format or streaming_config.wire_format
+        if args.source == "csv" and not args.path:
+            args.path = os.path.join(app_config.get_data_validation_config().clean_data_dir, "clean_data.csv")
+
+        metrics = StreamingMetrics()
+        overload = None
+        if args.overload_mode:
+            overload = load_overload_controller(app_config, metrics)
+            if overload is None:
+                raise ValueError("--overload-mode needs overload_config.enabled")
+            overload.pin(args.overload_mode)
+        sink = build_sink(args, streaming_config)
+        if args.archive:
+            archive_config = app_config.get_archive_config()
+            archive = ParquetArchive.from_config(archive_config, app_config.get_data_validation_config().schema_file)
+            sink = ArchivingSink(sink, archive, archive_config.non_fraud_mongo, archive_config.mongo_fields, metrics)
+        engine = ReplayEngine(FraudScorer.from_config(app_config), sink, rate=args.rate,
+                              batch_size=args.batch_size,
+                              rule_engine=None if args.no_rules else load_rule_engine(streaming_config),
+                              deduplicator=build_replay_deduplicator(app_config.get_membership_config()) if args.dedup else None,
+                              drift_monitor=load_drift_monitor(app_config.get_drift_config(), metrics=metrics) if args.drift else None,
+                              metrics=metrics,
+                              validator=None if args.no_validate else load_validator(app_config, streaming_config),
+                              overload=overload)
+        snapshots = start_stack_snapshots(app_config.get_profiling_config(), "replay", args.profile)
+        try:
+            report = engine.run(build_source(args, streaming_config.topic))
+        finally:
+            if snapshots is not None:
+                snapshots.stop()
+        report["source"] = args.source if not args.path else f"{args.source}:{args.path}"
+        report["wire_format"] = args.wire_format
+
+        os.makedirs(streaming_config.replay_report_dir, exist_ok=True)
+        report_file = os.path.join(streaming_config.replay_report_dir,
+                                   f"replay_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.json")
+        with open(report_file, "w") as f:
+            json.dump(report, f, indent=2)
+
+        print(json.dumps(report, indent=2))
+        print(f"📄 Replay report saved to {report_file}")
+
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+
+if __name__ == "__main__":
+    main()
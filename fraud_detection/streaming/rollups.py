@@ -0,0 +1,220 @@
+import time
+from datetime import datetime, timezone
+from fraud_detection.logger.log import logging
+from fraud_detection.streaming.metrics import STREAMING_METRICS, StreamingMetrics
+
+logger = logging.getLogger(__name__)
+
+# Bucket start for each supported granularity, from the minute bucket
+TRUNCATE = {
+    "minute": lambda minute: minute,
+    "hour": lambda minute: minute.replace(minute=0),
+    "day": lambda minute: minute.replace(hour=0, minute=0),
+}
+ALL = "all"
+LABELS = ("non_fraud", "fraud")
+# Dashboard queries select by granularity and dimension over a bucket range
+ROLLUP_INDEX = [("granularity", 1), ("dimension", 1), ("bucket", 1)]
+
+
+def rollup_id(granularity: str, bucket, dimension: str, value) -> str:
+    """
+    Deterministic _id, so repeated flushes of the same bucket upsert one document.
+    """
+    bucket_key = bucket.strftime("%Y-%m-%dT%H:%M") if bucket is not None else ALL
+    return f"{granularity}|{bucket_key}|{dimension}|{value}"
+
+
+class RollupAggregator:
+    """
+    Incremental per-bucket counts, amount sums and amount maxima for fraud and non-fraud transactions,
+    by time bucket (event time, trans_date_trans_time) and by each dimension (category, state, ...),
+    plus "all" totals per bucket and all time. Deltas accumulate in memory and are drained as
+    $inc / $max upserts, so a flush costs O(buckets touched), not O(transactions).
+    """
+
+    def __init__(self, granularities=("minute", "hour"), dimensions=("category", "state", "gender"),
+                 flush_interval_seconds: float = 10.0):
+        unknown = set(granularities) - set(TRUNCATE)
+        if unknown:
+            raise ValueError(f"Unknown rollup granularities {sorted(unknown)}, expected {sorted(TRUNCATE)}")
+        self.granularities = tuple(granularities)
+        self.dimensions = tuple(dimensions)
+        self.flush_interval_seconds = flush_interval_seconds
+        # (granularity, bucket, dimension, value) -> [non_fraud count, sum, max, fraud count, sum, max]
+        self.deltas = {}
+        self.next_flush = time.monotonic() + flush_interval_seconds
+
+    def _bucket_starts(self, txn: dict):
+        try:
+            minute = datetime.fromisoformat(txn["trans_date_trans_time"][:16])
+        except (KeyError, TypeError, ValueError):
+            # Late or malformed event time: count it at processing time rather than dropping it
+            minute = datetime.now(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+        return [(granularity, TRUNCATE[granularity](minute)) for granularity in self.granularities]
+
+    def add(self, txn: dict):
+        try:
+            amount = float(txn.get("amt") or 0.0)
+        except (TypeError, ValueError):
+            amount = 0.0
+        offset = 3 if txn.get("is_fraud") == 1 else 0
+        keys = [(ALL, None, ALL, ALL)]
+        for granularity, bucket in self._bucket_starts(txn):
+            keys.append((granularity, bucket, ALL, ALL))
+            for dimension in self.dimensions:
+                keys.append((granularity, bucket, dimension, txn.get(dimension)))
+
+        deltas = self.deltas
+        for key in keys:
+            stats = deltas.get(key)
+            if stats is None:
+                stats = deltas[key] = [0, 0.0, 0.0, 0, 0.0, 0.0]
+            stats[offset] += 1
+            stats[offset + 1] += amount
+            if amount > stats[offset + 2]:
+                stats[offset + 2] = amount
+
+    def add_many(self, txns: list):
+        for txn in txns:
+            self.add(txn)
+
+    def due(self) -> bool:
+        return bool(self.deltas) and time.monotonic() >= self.next_flush
+
+    def drain(self) -> dict:
+        deltas, self.deltas = self.deltas, {}
+        self.next_flush = time.monotonic() + self.flush_interval_seconds
+        return deltas
+
+    def restore(self, deltas: dict):
+        """
+        Merge back deltas whose flush failed, so they are retried with the next one.
+        An unordered bulk write can fail part-way, so a retried flush may over-count the upserts that had landed.
+        """
+        for key, stats in deltas.items():
+            current = self.deltas.get(key)
+            if current is None:
+                self.deltas[key] = stats
+                continue
+            for offset in (0, 3):
+                current[offset] += stats[offset]
+                current[offset + 1] += stats[offset + 1]
+                current[offset + 2] = max(current[offset + 2], stats[offset + 2])
+
+    @staticmethod
+    def updates(deltas: dict) -> list:
+        """
+        One upsert per touched bucket.
+        """
+        from pymongo import UpdateOne
+
+        now = datetime.now(timezone.utc)
+        operations = []
+        for (granularity, bucket, dimension, value), stats in deltas.items():
+            increments, maxima = {}, {}
+            for offset, label in zip((0, 3), LABELS):
+                if stats[offset]:
+                    increments[f"{label}_count"] = stats[offset]
+                    increments[f"{label}_amt_sum"] = stats[offset + 1]
+                    maxima[f"{label}_amt_max"] = stats[offset + 2]
+            update = {
+                "$inc": increments,
+                "$setOnInsert": {"granularity": granularity, "bucket": bucket, "dimension": dimension, "value": value},
+                "$set": {"updated_at": now},
+            }
+            if maxima:
+                update["$max"] = maxima
+            operations.append(UpdateOne({"_id": rollup_id(granularity, bucket, dimension, value)}, update, upsert=True))
+        return operations
+
+
+def create_rollup_indexes(collection):
+    collection.create_index(ROLLUP_INDEX)
+
+
+class RollupSink:
+    """
+    Wraps a sink: everything written is passed through and folded into the aggregator, whose deltas are
+    upserted into `collection` every flush_interval_seconds and on flush() / close().
+    """
+
+    def __init__(self, sink, aggregator: RollupAggregator, collection, metrics: StreamingMetrics = STREAMING_METRICS):
+        self.sink = sink
+        self.aggregator = aggregator
+        self.collection = collection
+        self.metrics = metrics
+
+    def write(self, txn: dict):
+        self.write_many([txn])
+
+    def write_many(self, txns: list):
+        self.sink.write_many(txns)
+        self.aggregator.add_many(txns)
+        if self.aggregator.due():
+            self.flush_rollups()
+
+    def flush_rollups(self):
+        deltas = self.aggregator.drain()
+        if not deltas:
+            return
+        t0 = time.perf_counter()
+        try:
+            self.collection.bulk_write(self.aggregator.updates(deltas), ordered=False)
+        except Exception as e:
+            self.aggregator.restore(deltas)
+            self.metrics.rollup_flush_failures.inc()
+            logger.error(f"Rollup flush of {len(deltas)} buckets failed, will retry: {e}")
+            return
+        self.metrics.rollup_flush.observe(time.perf_counter() - t0)
+
+    def flush(self):
+        self.sink.flush()
+        self.flush_rollups()
+
+    def close(self):
+        self.flush_rollups()
+        self.sink.close()
+
+
+class AsyncRollupSink(RollupSink):
+    """
+    RollupSink for async sinks, flushing through an async (PyMongo AsyncMongoClient) collection.
+    """
+
+    async def write(self, txn: dict):
+        await self.sink.write(txn)
+        self.aggregator.add(txn)
+        if self.aggregator.due():
+            await self.flush_rollups()
+
+    async def write_many(self, txns: list):
+        for txn in txns:
+            await self.write(txn)
+
+    async def flush_rollups(self):
+        deltas = self.aggregator.drain()
+        if not deltas:
+            return
+        t0 = time.perf_counter()
+        try:
+            await self.collection.bulk_write(self.aggregator.updates(deltas), ordered=False)
+        except Exception as e:
+            self.aggregator.restore(deltas)
+            self.metrics.rollup_flush_failures.inc()
+            logger.error(f"Rollup flush of {len(deltas)} buckets failed, will retry: {e}")
+            return
+        self.metrics.rollup_flush.observe(time.perf_counter() - t0)
+
+    async def flush(self):
+        await self.sink.flush()
+        await self.flush_rollups()
+
+    async def close(self):
+        await self.flush_rollups()
+        await self.sink.close()
+
+
+def build_rollup_aggregator(rollup_config) -> RollupAggregator:
+    return RollupAggregator(rollup_config.granularities, rollup_config.dimensions,
+                            rollup_config.flush_interval_seconds)
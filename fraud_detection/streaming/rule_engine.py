@@ -0,0 +1,370 @@
+import sys
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from collections import namedtuple, OrderedDict, defaultdict
+import numpy as np
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.logger.log import logging
+from fraud_detection.utils.util import read_yaml_file
+
+# Precedence when several rules match the same transaction
+ACTION_SEVERITY = {"flag": 1, "allow": 2, "block": 3}
+SEVERITY_ACTION = {severity: action for action, severity in ACTION_SEVERITY.items()}
+# Actions that settle the label without running the model
+SHORT_CIRCUIT = {"allow": 0, "block": 1}
+
+THRESHOLD_OPS = (">", ">=", "<", "<=")
+
+# Fields computed from per-card state rather than read from the transaction
+TRAVEL_FIELDS = ("travel_speed_kmh", "travel_distance_km")
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Below this many transactions numpy's per-call overhead outweighs vectorizing; rules are checked one by one with bisect
+SCALAR_BATCH_SIZE = 16
+
+RuleDecision = namedtuple("RuleDecision", ["action", "rule", "matched"])
+
+
+class ThresholdGroup:
+    """
+    All threshold rules sharing a field and operator, sorted by threshold.
+    The rules a value matches are a prefix (> / >=) or suffix (< / <=) of the sorted thresholds,
+    so one searchsorted per transaction finds them, however many rules the group holds;
+    the most severe rule of every prefix/suffix is precomputed.
+    """
+
+    def __init__(self, op: str, thresholds: list, rule_indices: list, severities: list):
+        order = np.argsort(thresholds, kind="stable")
+        self.op = op
+        self.thresholds = np.asarray(thresholds, dtype=float)[order]
+        rule_indices = np.asarray(rule_indices)[order]
+        severities = np.asarray(severities)[order]
+
+        if op in (">", ">="):
+            best, positions = self._running_best(severities)
+        else:
+            best, positions = self._running_best(severities[::-1])
+            best, positions = best[::-1], (len(severities) - 1 - positions)[::-1]
+        self.best_severity = best
+        self.best_rule = rule_indices[positions]
+        # Plain-list copies for the scalar path
+        self._threshold_list = self.thresholds.tolist()
+        self._severity_list = best.tolist()
+        self._rule_list = self.best_rule.tolist()
+
+    @staticmethod
+    def _running_best(severities: np.ndarray):
+        """
+        Running maximum severity and the position of the first rule that reached it.
+        """
+        best = np.maximum.accumulate(severities)
+        raised = severities > np.concatenate(([-1], best[:-1]))
+        return best, np.maximum.accumulate(np.where(raised, np.arange(len(severities)), 0))
+
+    def evaluate(self, values: np.ndarray):
+        """
+        Returns (matched count, most severe rule's severity, its rule index) per value; NaN matches nothing.
+        """
+        n = len(self.thresholds)
+        if self.op in (">", ">="):
+            # '>' matches thresholds strictly below the value
+            count = np.searchsorted(self.thresholds, values, side="left" if self.op == ">" else "right")
+            idx = np.maximum(count - 1, 0)
+        else:
+            start = np.searchsorted(self.thresholds, values, side="right" if self.op == "<" else "left")
+            count = n - start
+            idx = np.minimum(start, n - 1)
+        count = np.where(np.isnan(values), 0, count)
+        severity = np.where(count > 0, self.best_severity[idx], 0)
+        return count, severity, self.best_rule[idx]
+
+
+    def evaluate_one(self, value: float):
+        """
+        Scalar evaluate() for a single value.
+        """
+        n = len(self._threshold_list)
+        if value != value:
+            return 0, 0, -1
+        if self.op in (">", ">="):
+            count = (bisect_left if self.op == ">" else bisect_right)(self._threshold_list, value)
+            idx = count - 1
+        else:
+            idx = (bisect_right if self.op == "<" else bisect_left)(self._threshold_list, value)
+            count = n - idx
+        if count == 0:
+            return 0, 0, -1
+        return count, self._severity_list[idx], self._rule_list[idx]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _numeric_column(txns: list, field: str) -> np.ndarray:
+    values = [txn.get(field) for txn in txns]
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([_to_float(value) for value in values], dtype=float)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class RuleEngine:
+    """
+    Declarative pre-filter evaluated on micro-batches of raw transactions before the model.
+    Rules (config/rules.yaml) are compiled once into:
+      - threshold groups per (field, op[, where field = value]) answered with a binary search;
+      - one dict per list-membership field (blocklists / allowlists);
+      - lookups in named watchlists (membership.GuardedSet, e.g. rebuilt from MongoDB) for large lists;
+      - derived impossible-travel fields from each card's previous transaction location and time.
+    Actions: block -> fraud without scoring, allow -> legit without scoring, flag -> scored, rule recorded.
+    """
+
+    def __init__(self, rules: list, travel_state_size: int = 1_000_000, watchlists: dict = None):
+        try:
+            self.rules = []
+            self.threshold_groups = {}
+            self.scoped_groups = {}
+            self.lists = {}
+            # (field, watchlist, rule index, severity)
+            self.watchlist_rules = []
+            self.travel_state_size = travel_state_size
+            # str(cc_num) -> (epoch seconds, merch_lat, merch_long), least recently seen first
+            self.travel_state = OrderedDict()
+
+            thresholds = defaultdict(list)
+            scoped = defaultdict(lambda: defaultdict(list))
+            for rule in rules:
+                if not rule.get("enabled", True):
+                    continue
+                action = rule["action"]
+                if action not in ACTION_SEVERITY:
+                    raise ValueError(f"Rule {rule['name']}: unknown action {action!r}")
+                if rule["op"] == "watchlist" and rule["watchlist"] not in (watchlists or {}):
+                    logging.warning(f"Rule {rule['name']}: watchlist {rule['watchlist']!r} is not loaded, rule skipped")
+                    continue
+                index = len(self.rules)
+                self.rules.append(rule)
+                severity = ACTION_SEVERITY[action]
+
+                if rule["op"] == "in":
+                    lookup = self.lists.setdefault(rule["field"], {})
+                    for value in rule["values"]:
+                        best_severity, best_index, count = lookup.get(str(value), (0, -1, 0))
+                        if severity > best_severity:
+                            best_severity, best_index = severity, index
+                        lookup[str(value)] = (best_severity, best_index, count + 1)
+                elif rule["op"] == "watchlist":
+                    self.watchlist_rules.append((rule["field"], watchlists[rule["watchlist"]], index, severity))
+                elif rule["op"] in THRESHOLD_OPS:
+                    entry = (float(rule["value"]), index, severity)
+                    where = rule.get("where")
+                    if where:
+                        (where_field, where_value), = where.items()
+                        scoped[(rule["field"], rule["op"], where_field)][str(where_value)].append(entry)
+                    else:
+                        thresholds[(rule["field"], rule["op"])].append(entry)
+                else:
+                    raise ValueError(f"Rule {rule['name']}: unknown op {rule['op']!r}")
+
+            for (field, op), entries in thresholds.items():
+                self.threshold_groups[(field, op)] = ThresholdGroup(op, *zip(*entries))
+            for (field, op, where_field), by_value in scoped.items():
+                self.scoped_groups[(field, op, where_field)] = {
+                    value: ThresholdGroup(op, *zip(*entries)) for value, entries in by_value.items()}
+
+            referenced = {field for field, _ in self.threshold_groups} | {field for field, _, _ in self.scoped_groups}
+            self.uses_travel = any(field in referenced for field in TRAVEL_FIELDS)
+            logging.info(f"Rule engine compiled {len(self.rules)} rules: {len(self.threshold_groups)} threshold groups, "
+                         f"{sum(len(g) for g in self.scoped_groups.values())} scoped groups, {len(self.lists)} list fields, "
+                         f"{len(self.watchlist_rules)} watchlist rules")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    @classmethod
+    def from_yaml(cls, file_path: str, watchlists: dict = None):
+        rules_config = read_yaml_file(file_path)
+        return cls(rules_config.get("rules") or [],
+                   travel_state_size=rules_config.get("travel_state_size", 1_000_000), watchlists=watchlists)
+
+    def advance_travel_state(self, txn: dict):
+        """
+        Record the transaction as its card's latest location and return the previous one
+        as (epoch seconds, merch_lat, merch_long), or None. Returns None for transactions without a usable location.
+        """
+        try:
+            current = (datetime.fromisoformat(txn["trans_date_trans_time"]).timestamp(),
+                       float(txn["merch_lat"]), float(txn["merch_long"]))
+        except (KeyError, TypeError, ValueError):
+            return None, None
+        card = str(txn.get("cc_num"))
+        previous = self.travel_state.pop(card, None)
+        self.travel_state[card] = current
+        if len(self.travel_state) > self.travel_state_size:
+            self.travel_state.popitem(last=False)
+        return previous, current
+
+    def travel_columns(self, txns: list) -> dict:
+        """
+        Distance and implied speed from each card's previous transaction, updating the per-card state in order.
+        """
+        n = len(txns)
+        previous_points = np.full((n, 3), np.nan)
+        current_points = np.full((n, 3), np.nan)
+        for i, txn in enumerate(txns):
+            previous, current = self.advance_travel_state(txn)
+            if previous is not None:
+                previous_points[i] = previous
+                current_points[i] = current
+
+        distance = haversine_km(previous_points[:, 1], previous_points[:, 2], current_points[:, 1], current_points[:, 2])
+        # Same-second or out-of-order events count as one second apart
+        hours = np.maximum(np.abs(current_points[:, 0] - previous_points[:, 0]), 1.0) / 3600
+        return {"travel_distance_km": distance, "travel_speed_kmh": distance / hours}
+
+    def travel_values(self, txn: dict) -> dict:
+        """
+        Scalar travel_columns for one transaction.
+        """
+        previous, current = self.advance_travel_state(txn)
+        if previous is None:
+            return {"travel_distance_km": math.nan, "travel_speed_kmh": math.nan}
+        lat1, lon1, lat2, lon2 = map(math.radians, (previous[1], previous[2], current[1], current[2]))
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+        hours = max(abs(current[0] - previous[0]), 1.0) / 3600
+        return {"travel_distance_km": distance, "travel_speed_kmh": distance / hours}
+
+    def evaluate_one(self, txn: dict):
+        """
+        RuleDecision (or None) for a single transaction, without numpy.
+        """
+        best_severity, best_rule, matched = 0, -1, 0
+        derived = self.travel_values(txn) if self.uses_travel else {}
+
+        def merge(count, severity, rule):
+            nonlocal best_severity, best_rule, matched
+            matched += count
+            if severity > best_severity:
+                best_severity, best_rule = severity, rule
+
+        for (field, _), group in self.threshold_groups.items():
+            value = derived[field] if field in derived else _to_float(txn.get(field))
+            merge(*group.evaluate_one(value))
+        for (field, _, where_field), groups in self.scoped_groups.items():
+            group = groups.get(str(txn.get(where_field)))
+            if group is not None:
+                value = derived[field] if field in derived else _to_float(txn.get(field))
+                merge(*group.evaluate_one(value))
+        for field, lookup in self.lists.items():
+            hit = lookup.get(str(txn.get(field)))
+            if hit is not None:
+                severity, rule, count = hit
+                merge(count, severity, rule)
+        for field, watchlist, rule, severity in self.watchlist_rules:
+            if txn.get(field) is not None and txn[field] in watchlist:
+                merge(1, severity, rule)
+
+        if not matched:
+            return None
+        return RuleDecision(SEVERITY_ACTION[best_severity], self.rules[best_rule]["name"], matched)
+
+    def evaluate(self, txns: list) -> list:
+        """
+        One RuleDecision (or None) per transaction, in order.
+        """
+        n = len(txns)
+        if n == 0 or not self.rules:
+            return [None] * n
+        if n <= SCALAR_BATCH_SIZE:
+            return [self.evaluate_one(txn) for txn in txns]
+        best_severity = np.zeros(n, dtype=np.int8)
+        best_rule = np.full(n, -1, dtype=np.int64)
+        matched = np.zeros(n, dtype=np.int64)
+        columns = self.travel_columns(txns) if self.uses_travel else {}
+
+        def column(field):
+            if field not in columns:
+                columns[field] = _numeric_column(txns, field)
+            return columns[field]
+
+        def merge(rows, count, severity, rule):
+            matched[rows] += count
+            better = severity > best_severity[rows]
+            best_severity[rows[better]] = severity[better]
+            best_rule[rows[better]] = rule[better]
+
+        all_rows = np.arange(n)
+        for (field, _), group in self.threshold_groups.items():
+            merge(all_rows, *group.evaluate(column(field)))
+
+        for (field, _, where_field), groups in self.scoped_groups.items():
+            rows_by_value = defaultdict(list)
+            for i, txn in enumerate(txns):
+                rows_by_value[str(txn.get(where_field))].append(i)
+            values = column(field)
+            for where_value, rows in rows_by_value.items():
+                group = groups.get(where_value)
+                if group is None:
+                    continue
+                if len(rows) > SCALAR_BATCH_SIZE:
+                    rows = np.asarray(rows)
+                    merge(rows, *group.evaluate(values[rows]))
+                    continue
+                for i in rows:
+                    count, severity, rule = group.evaluate_one(values[i])
+                    matched[i] += count
+                    if severity > best_severity[i]:
+                        best_severity[i], best_rule[i] = severity, rule
+
+        for field, lookup in self.lists.items():
+            for i, txn in enumerate(txns):
+                hit = lookup.get(str(txn.get(field)))
+                if hit is not None:
+                    severity, rule, count = hit
+                    matched[i] += count
+                    if severity > best_severity[i]:
+                        best_severity[i], best_rule[i] = severity, rule
+
+        for field, watchlist, rule, severity in self.watchlist_rules:
+            for i, txn in enumerate(txns):
+                if txn.get(field) is not None and txn[field] in watchlist:
+                    matched[i] += 1
+                    if severity > best_severity[i]:
+                        best_severity[i], best_rule[i] = severity, rule
+
+        return [RuleDecision(SEVERITY_ACTION[int(best_severity[i])], self.rules[best_rule[i]]["name"], int(matched[i]))
+                if matched[i] else None for i in range(n)]
+
+
+def watchlist_names(file_path: str) -> set:
+    """
+    Names of the watchlists the enabled rules of a rules file look up.
+    """
+    rules = read_yaml_file(file_path).get("rules") or []
+    return {rule["watchlist"] for rule in rules if rule.get("enabled", True) and rule.get("op") == "watchlist"}
+
+
+def apply_decision(txn: dict, decision: RuleDecision) -> bool:
+    """
+    Record a rule decision on the transaction. Returns True if it settled is_fraud, so the model can be skipped.
+    """
+    if decision is None:
+        return False
+    txn["rule_decision"] = decision._asdict()
+    if decision.action in SHORT_CIRCUIT:
+        txn["is_fraud"] = SHORT_CIRCUIT[decision.action]
+        txn["decision_source"] = "rule"
+        return True
+    return False
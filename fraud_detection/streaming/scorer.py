@@ -0,0 +1,78 @@
+import os
+from fraud_detection.logger.log import logging
+from fraud_detection.utils.util import read_yaml_file
+from fraud_detection.streaming.feature_transformer import transform_transaction, transform_transactions
+from fraud_detection.utils.vocabulary import CategoricalVocabulary
+
+
+def resolve_model_file(app_config) -> str:
+    """
+    trained_model.cbm, or the model optimization stage's selected variant when use_selected_model is on.
+    """
+    optimization_config = app_config.get_model_optimization_config()
+    if optimization_config.use_selected_model and os.path.exists(optimization_config.selection_file):
+        selection = read_yaml_file(optimization_config.selection_file)
+        logging.info(f"Scoring with the selected '{selection['variant']}' model variant")
+        return selection['model_file']
+    return app_config.get_model_training_config().model_file
+
+
+class FraudScorer:
+    """
+    Bundles the trained CatBoost model with the vocabulary used to encode its inputs.
+    """
+
+    def __init__(self, model, vocabulary: CategoricalVocabulary, model_path: str = None, vocabulary_path: str = None):
+        self.model = model
+        self.vocabulary = vocabulary
+        self.feature_names = list(model.feature_names_)
+        # Kept so worker processes can load their own copy instead of pickling the model
+        self.model_path = model_path
+        self.vocabulary_path = vocabulary_path
+
+    @classmethod
+    def from_artifacts(cls, model_path: str, vocabulary_path: str):
+        """
+        Load the model and vocabulary produced by the training pipeline.
+        """
+        from catboost import CatBoostClassifier
+
+        model = CatBoostClassifier()
+        model.load_model(model_path)
+        logging.info(f"Model loaded from: {model_path}")
+
+        vocabulary = CategoricalVocabulary.load(vocabulary_path)
+        logging.info(f"Vocabulary loaded from: {vocabulary_path}")
+        return cls(model, vocabulary, model_path=model_path, vocabulary_path=vocabulary_path)
+
+    @classmethod
+    def from_config(cls, app_config):
+        """
+        app_config: ConfigurationManager
+        """
+        return cls.from_artifacts(resolve_model_file(app_config), app_config.get_feature_engineering_config().vocabulary_file)
+
+    def transform(self, txn: dict):
+        """
+        Raw transaction -> single-row feature frame, or None if it could not be transformed.
+        """
+        return transform_transaction(txn, self.vocabulary)
+
+    def transform_many(self, txns: list):
+        """
+        Raw transactions -> (feature frame or None, positions of the transactions it holds).
+        """
+        return transform_transactions(txns, self.vocabulary)
+
+    def predict(self, features_df):
+        """
+        Predicted labels for a feature frame, with columns aligned to the training order.
+        """
+        return self.model.predict(features_df[self.feature_names]).astype(int)
+
+    def score(self, features_df):
+        """
+        (predicted labels, fraud probabilities) from one model call; labels match predict().
+        """
+        probabilities = self.model.predict_proba(features_df[self.feature_names])[:, 1]
+        return (probabilities > self.model.get_probability_threshold()).astype(int), probabilities
@@ -0,0 +1,470 @@
+import os
+import json
+import time
+import signal
+import argparse
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Full, Queue
+from dotenv import load_dotenv
+from fraud_detection.config.configuration import get_configuration_manager
+from fraud_detection.logger.log import logging, get_sampled_logger
+from fraud_detection.streaming.consumer import load_rule_engine, load_validator
+from fraud_detection.streaming.membership import build_watchlists
+from fraud_detection.streaming.metrics import Counter, Gauge, Histogram, MetricsRegistry
+from fraud_detection.streaming.rule_engine import RuleEngine, apply_decision, watchlist_names
+from fraud_detection.streaming.scorer import FraudScorer
+from fraud_detection.utils.schema_validator import SchemaValidator
+
+try:
+    import orjson
+except ImportError:  # optional: faster request parsing and responses
+    orjson = None
+
+logger = logging.getLogger(__name__)
+request_logger = get_sampled_logger(f"{__name__}.requests")
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _loads(body: bytes):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def _dumps(value) -> bytes:
+    return orjson.dumps(value) if orjson is not None else json.dumps(value).encode("utf-8")
+
+
+class Overloaded(Exception):
+    """
+    The batcher queue is full: the request is rejected at once rather than queued past its timeout.
+    """
+
+
+class ScoringMetrics:
+    """
+    Metrics for the scoring API, in the same Prometheus format as StreamingMetrics.
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.requests = r.register(Counter("fraud_api_requests_total", "Scoring requests received."))
+        self.scored = r.register(Counter("fraud_api_transactions_scored_total", "Transactions given a decision."))
+        self.invalid = r.register(Counter("fraud_api_invalid_total", "Requests rejected with 400 (bad JSON or schema)."))
+        self.rejected = r.register(Counter("fraud_api_rejected_total", "Requests rejected with 503 (concurrency limit or full queue)."))
+        self.timeouts = r.register(Counter("fraud_api_timeouts_total", "Requests answered 504 after request_timeout_ms."))
+        self.failed = r.register(Counter("fraud_api_failed_total", "Transactions whose batch raised or could not be transformed."))
+        self.latency = r.register(Histogram("fraud_api_request_seconds", "Request received to response written."))
+        self.queue_wait = r.register(Histogram("fraud_api_queue_wait_seconds", "Submitted to taken into a batch."))
+        self.batch_seconds = r.register(Histogram("fraud_api_batch_seconds", "Rules, transformation and model call per batch."))
+        self.batch_size = r.register(Histogram("fraud_api_batch_size", "Transactions per model batch.", buckets=BATCH_SIZE_BUCKETS))
+        self.in_flight = r.register(Gauge("fraud_api_in_flight", "Requests being served."))
+        self.queue_depth = r.register(Gauge("fraud_api_queue_depth", "Transactions waiting for a batch."))
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class DynamicBatcher:
+    """
+    Turns concurrent submit() calls into batched score_batch(items) calls on one worker thread.
+    A batch closes when it holds max_batch_size items, or max_wait seconds after its first item was submitted.
+    While a batch is being scored the next one fills up, so under load batches grow to what arrived during one
+    model call without any added wait. expected: optional callable giving how many requests are being served;
+    once the batch holds all of them it closes at once, so a lone request does not wait for the window.
+    At most max_queue items wait; past that submit() raises Overloaded. Items whose future was cancelled
+    (their request timed out) are dropped before scoring.
+    """
+
+    def __init__(self, score_batch, max_batch_size: int = 64, max_wait: float = 0.002, max_queue: int = 1024,
+                 metrics: ScoringMetrics = None, expected=None):
+        self.score_batch = score_batch
+        self.expected = expected
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait)
+        self.metrics = metrics or ScoringMetrics()
+        self.queue = Queue(maxsize=max_queue)
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="scoring-batcher", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopping.is_set()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        try:
+            self.queue.put_nowait((item, future, time.perf_counter()))
+        except Full:
+            raise Overloaded(f"scoring queue full ({self.queue.maxsize} waiting)")
+        return future
+
+    def next_batch(self) -> list:
+        """
+        Block for the first item, then take more until the batch is full or the first item's window closes.
+        Returns [] when stopping.
+        """
+        first = self.queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if self.expected is not None and len(batch) >= self.expected() and self.queue.empty():
+                break
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except Empty:
+                break
+            if entry is None:
+                # Stop after this batch
+                self._stopping.set()
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self.next_batch()
+            if not batch:
+                break
+            taken = time.perf_counter()
+            live = []
+            for item, future, submitted in batch:
+                if future.set_running_or_notify_cancel():
+                    self.metrics.queue_wait.observe(taken - submitted)
+                    live.append((item, future))
+            self.metrics.queue_depth.set(self.queue.qsize())
+            if not live:
+                continue
+            self.metrics.batch_size.observe(len(live))
+            try:
+                results = self.score_batch([item for item, _ in live])
+            except Exception as e:
+                logger.error(f"Scoring batch of {len(live)} failed: {e}")
+                for _, future in live:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.metrics.batch_seconds.observe(time.perf_counter() - taken)
+            for (_, future), result in zip(live, results):
+                future.set_result(result)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Finish the queued items, then stop the worker.
+        """
+        self.queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._stopping.set()
+
+
+class ScoringService:
+    """
+    Synchronous fraud decisions for single transactions, with the consumer's validation, rules and model:
+    validate() runs on the request thread, then the transaction joins a DynamicBatcher batch for
+    rules -> transform -> one model call.
+    mongo_client: the client behind the rule engine's watchlists, closed on stop().
+    """
+
+    def __init__(self, scorer: FraudScorer, rule_engine: RuleEngine = None, validator: SchemaValidator = None,
+                 max_batch_size: int = 64, max_wait: float = 0.002, max_queue: int = 1024, max_in_flight: int = 256,
+                 request_timeout: float = 0.1, metrics: ScoringMetrics = None, mongo_client=None):
+        self.scorer = scorer
+        self.mongo_client = mongo_client
+        self.rule_engine = rule_engine
+        self.validator = validator
+        self.request_timeout = request_timeout
+        self.metrics = metrics or ScoringMetrics()
+        self.batcher = DynamicBatcher(self.score_batch, max_batch_size, max_wait, max_queue, self.metrics,
+                                      expected=lambda: self._in_flight)
+        # Requests beyond this are turned away with 503 instead of piling up threads
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.ready = False
+
+    @classmethod
+    def from_config(cls, app_config, metrics: ScoringMetrics = None, apply_rules: bool = None):
+        """
+        apply_rules: defaults to serving_config.apply_rules. Watchlist rules get the same MongoDB-backed watchlists
+        as the Kafka consumer; without MONGO_URI they cannot be applied, and the service refuses to start.
+        """
+        serving_config = app_config.get_serving_config()
+        streaming_config = app_config.get_streaming_config()
+        rule_engine, mongo_client = None, None
+        if serving_config.apply_rules if apply_rules is None else apply_rules:
+            names = watchlist_names(streaming_config.rules_file)
+            if names:
+                missing = names - set(app_config.get_membership_config().watchlists)
+                if missing:
+                    raise ValueError(f"Rules use watchlists {sorted(missing)} that membership_config does not define")
+                if not os.getenv("MONGO_URI"):
+                    raise ValueError(f"Rules use the MongoDB watchlists {sorted(names)}: set MONGO_URI, "
+                                     f"or turn off serving_config.apply_rules (--no-rules)")
+                from pymongo import MongoClient
+
+                mongo_client = MongoClient(os.getenv("MONGO_URI"))
+                watchlists = build_watchlists(mongo_client[streaming_config.mongo_db],
+                                              app_config.get_membership_config(), names)
+            rule_engine = load_rule_engine(streaming_config, watchlists if names else None)
+        return cls(FraudScorer.from_config(app_config), rule_engine=rule_engine,
+                   validator=load_validator(app_config, streaming_config),
+                   max_batch_size=serving_config.max_batch_size, max_wait=serving_config.max_wait_seconds,
+                   max_queue=serving_config.max_queue, max_in_flight=serving_config.max_in_flight,
+                   request_timeout=serving_config.request_timeout_seconds, metrics=metrics, mongo_client=mongo_client)
+
+    def start(self, warmup: dict = None):
+        """
+        Start the batcher; with a warmup transaction, score it once first (the first model call is the slowest).
+        Ready afterwards.
+        """
+        self.batcher.start()
+        if warmup is not None:
+            self.batcher.submit(dict(warmup)).result()
+        self.ready = True
+        return self
+
+    def stop(self):
+        self.ready = False
+        self.batcher.stop()
+        if self.mongo_client is not None:
+            self.mongo_client.close()
+
+    def enter(self) -> bool:
+        """
+        Take an in-flight slot; False when all max_in_flight are taken.
+        """
+        if not self.slots.acquire(blocking=False):
+            return False
+        with self._in_flight_lock:
+            self._in_flight += 1
+            self.metrics.in_flight.set(self._in_flight)
+        return True
+
+    def leave(self):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+            self.metrics.in_flight.set(self._in_flight)
+        self.slots.release()
+
+    def readiness(self) -> tuple:
+        """
+        (ready, reason): the model is loaded and warm, the batcher is running and its queue has room.
+        """
+        if not self.ready:
+            return False, "starting or draining"
+        if not self.batcher.alive:
+            return False, "batcher stopped"
+        if self.batcher.queue.full():
+            return False, "queue full"
+        return True, "ready"
+
+    def score_batch(self, txns: list) -> list:
+        """
+        One decision per transaction: rules first, then one model call for everything they did not settle.
+        """
+        decided = set()
+        to_score = list(range(len(txns)))
+        if self.rule_engine is not None:
+            to_score = []
+            for i, (txn, decision) in enumerate(zip(txns, self.rule_engine.evaluate(txns))):
+                if apply_decision(txn, decision):
+                    decided.add(i)
+                else:
+                    to_score.append(i)
+
+        features_df, kept = self.scorer.transform_many([txns[i] for i in to_score]) if to_score else (None, [])
+        if features_df is not None:
+            predictions, probabilities = self.scorer.score(features_df)
+            for position, prediction, probability in zip(kept, predictions, probabilities):
+                txn = txns[to_score[position]]
+                txn["is_fraud"] = int(prediction)
+                txn["fraud_score"] = round(float(probability), 6)
+                txn["decision_source"] = "model"
+                decided.add(to_score[position])
+
+        decisions = []
+        for i, txn in enumerate(txns):
+            if i not in decided:
+                self.metrics.failed.inc()
+                decisions.append({"transaction_id": txn.get("transaction_id"), "error": "feature transformation failed"})
+                continue
+            decisions.append({"transaction_id": txn.get("transaction_id"), "is_fraud": txn["is_fraud"],
+                              "fraud_score": txn.get("fraud_score"), "decision_source": txn["decision_source"],
+                              "rule_decision": txn.get("rule_decision")})
+        self.metrics.scored.inc(len(decided))
+        return decisions
+
+    def decide(self, txn) -> tuple:
+        """
+        (HTTP status, response body) for one transaction: 200 with the decision, 400 with the validation reasons,
+        503 when the queue is full, 504 after request_timeout.
+        """
+        if self.validator is not None:
+            reasons = self.validator.validate(txn)
+            if reasons:
+                self.metrics.invalid.inc()
+                return 400, {"transaction_id": txn.get("transaction_id") if isinstance(txn, dict) else None,
+                             "error": "invalid transaction", "reasons": reasons}
+        elif not isinstance(txn, dict):
+            self.metrics.invalid.inc()
+            return 400, {"error": "invalid transaction", "reasons": ["record: not an object"]}
+        try:
+            future = self.batcher.submit(txn)
+        except Overloaded as e:
+            self.metrics.rejected.inc()
+            return 503, {"transaction_id": txn.get("transaction_id"), "error": str(e)}
+        try:
+            decision = future.result(timeout=self.request_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.metrics.timeouts.inc()
+            return 504, {"transaction_id": txn.get("transaction_id"),
+                         "error": f"no decision within {self.request_timeout * 1000:.0f}ms"}
+        except Exception as e:
+            self.metrics.failed.inc()
+            return 500, {"transaction_id": txn.get("transaction_id"), "error": f"scoring failed: {e}"}
+        return (500 if "error" in decision else 200), decision
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /score  a transaction (JSON object) -> its decision
+    GET  /health liveness: the process is serving HTTP
+    GET  /ready  readiness: 200 once the model is warm and while the queue has room, 503 otherwise
+    GET  /metrics Prometheus metrics
+    Connections are kept alive (HTTP/1.1), so a client pays the TCP handshake once.
+    """
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes: without TCP_NODELAY, Nagle plus the client's delayed ACK add ~40ms
+    disable_nagle_algorithm = True
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 30
+
+    @property
+    def service(self) -> ScoringService:
+        return self.server.service
+
+    def send_body(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self.send_body(200, _dumps({"status": "ok"}))
+        elif path == "/ready":
+            ready, reason = self.service.readiness()
+            self.send_body(200 if ready else 503, _dumps({"ready": ready, "reason": reason}))
+        elif path == "/metrics":
+            self.send_body(200, self.service.metrics.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self.send_body(404, _dumps({"error": f"no route {path}"}))
+
+    def do_POST(self):
+        start = time.perf_counter()
+        metrics = self.service.metrics
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.split("?")[0] != "/score":
+            self.send_body(404, _dumps({"error": f"no route {self.path}"}))
+            return
+        metrics.requests.inc()
+        if not self.service.enter():
+            metrics.rejected.inc()
+            self.send_body(503, _dumps({"error": "too many requests in flight"}))
+            return
+        try:
+            try:
+                txn = _loads(body)
+            except ValueError as e:
+                metrics.invalid.inc()
+                status, response = 400, {"error": f"invalid JSON: {e}"}
+            else:
+                status, response = self.service.decide(txn)
+            self.send_body(status, _dumps(response))
+        finally:
+            self.service.leave()
+            metrics.latency.observe(time.perf_counter() - start)
+        request_logger.info("%s %s in %.2fms", status, response.get("transaction_id"), (time.perf_counter() - start) * 1000)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Listen backlog: connections beyond it are refused by the kernel
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple, service: ScoringService):
+        self.service = service
+        super().__init__(address, ScoringRequestHandler)
+
+
+def start_scoring_server(service: ScoringService, host: str, port: int) -> ScoringServer:
+    """
+    Serve the scoring API on a daemon thread.
+    """
+    server = ScoringServer((host, port), service)
+    threading.Thread(target=server.serve_forever, name="scoring-http", daemon=True).start()
+    logger.info(f"Scoring API listening on http://{host}:{server.server_address[1]}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synchronous fraud decisions over HTTP")
+    parser.add_argument("--host", default=None, help="Default: serving_config.host")
+    parser.add_argument("--port", type=int, default=None, help="Default: serving_config.port")
+    parser.add_argument("--max-batch-size", type=int, default=None,
+                        help="Override serving_config.max_batch_size (1 turns batching off)")
+    parser.add_argument("--max-wait-ms", type=float, default=None, help="Override serving_config.max_wait_ms")
+    parser.add_argument("--no-rules", action="store_true", help="Score every transaction with the model, skipping the rule engine")
+    args = parser.parse_args()
+
+    load_dotenv()
+    app_config = get_configuration_manager()
+    serving_config = app_config.get_serving_config()
+    service = ScoringService.from_config(app_config, apply_rules=False if args.no_rules else None)
+    if args.max_batch_size is not None:
+        service.batcher.max_batch_size = max(1, args.max_batch_size)
+    if args.max_wait_ms is not None:
+        service.batcher.max_wait = args.max_wait_ms / 1000
+
+    from fraud_detection.data_generator.producer import generate_transaction
+
+    server = start_scoring_server(service, args.host or serving_config.host, args.port or serving_config.port)
+    service.start(warmup=generate_transaction())
+    logger.info(f"Scoring API ready (batches of up to {service.batcher.max_batch_size}, "
+                f"{service.batcher.max_wait * 1000:.1f}ms window)")
+
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+    stopping.wait()
+
+    # Drain: /ready turns 503 first, so a load balancer stops routing here, then the queued requests finish
+    logger.info("Stopping scoring API...")
+    service.ready = False
+    time.sleep(serving_config.drain_seconds)
+    server.shutdown()
+    service.stop()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import json
+import struct
+
+try:
+    import orjson
+except ImportError:  # in requirements.txt; the stdlib json module is the fallback
+    orjson = None
+
+# Kafka header naming the payload format, for tools and consumers that want it without peeking at the bytes
+CONTENT_TYPE_HEADER = "content-type"
+JSON_CONTENT_TYPE = b"application/json"
+# First byte of every binary payload; a JSON object always starts with "{" (or whitespace), never 0x00
+BINARY_MAGIC = 0
+
+# Joins the string fields of a binary payload (ASCII unit separator); strings containing it are sent as JSON
+STRING_SEPARATOR = "\x1f"
+
+# Wire types: f64 / i64 fixed width, str separator-joined text, key = str or int (cc_num, zip), sent as text plus an int flag
+WIRE_TYPES = ("f64", "i64", "str", "key")
+
+
+def _loads(value: bytes):
+    if orjson is not None:
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            # Python's json also accepts NaN / Infinity, which older producers may have sent
+            pass
+    return json.loads(value)
+
+
+def _dumps(record: dict) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(record).encode("utf-8")
+
+
+class WireSchema:
+    """
+    One version of the binary transaction layout:
+
+        magic u8 | version u16 | absent u32 | null u32 | int-key u32 | f64 * n | i64 * n | extras u32
+        | UTF-8 text of the string fields joined by STRING_SEPARATOR | JSON of fields not in the schema (usually empty)
+
+    Field names are not sent, and all strings come back from one bytes.decode() and one str.split().
+    Decoded records list their fields in wire order (numbers, then strings), not schema order.
+    Masks have one bit per field (schema order): absent keys are left out on decode, nulls come back as None,
+    and int-key fields come back as int.
+    """
+
+    def __init__(self, version: int, fields: list):
+        """
+        fields: list of (name, wire type) in schema order; append only, so a new version is a superset of the last.
+        """
+        if len(fields) > 32:
+            raise ValueError("A wire schema holds at most 32 fields")
+        unknown = {kind for _, kind in fields} - set(WIRE_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown wire types {sorted(unknown)}, expected one of {WIRE_TYPES}")
+        self.version = version
+        self.fields = list(fields)
+        self.names = [name for name, _ in fields]
+        self.bits = {name: 1 << i for i, name in enumerate(self.names)}
+        self.floats = [name for name, kind in fields if kind == "f64"]
+        self.ints = [name for name, kind in fields if kind == "i64"]
+        self.strings = [name for name, kind in fields if kind in ("str", "key")]
+        self.keys = [name for name, kind in fields if kind == "key"]
+        self.known = set(self.names)
+
+        self.wire_order = self.floats + self.ints + self.strings
+        self.header = struct.Struct(f"<BHIII{len(self.floats)}d{len(self.ints)}qI")
+
+    def encode(self, record: dict) -> bytes:
+        """
+        Binary payload, or None when a value does not fit its wire type (the caller falls back to JSON,
+        so the consumer's validation still sees the original value).
+        """
+        absent = nulls = int_keys = 0
+        numbers = []
+        for names, accepted in ((self.floats, (float, int)), (self.ints, (int,))):
+            for name in names:
+                value = record.get(name)
+                if value is None:
+                    absent |= self.bits[name] if name not in record else 0
+                    nulls |= self.bits[name] if name in record else 0
+                    numbers.append(0)
+                elif type(value) in accepted:
+                    numbers.append(value)
+                else:
+                    return None
+        strings = []
+        for name in self.strings:
+            value = record.get(name)
+            if value is None:
+                absent |= self.bits[name] if name not in record else 0
+                nulls |= self.bits[name] if name in record else 0
+                strings.append("")
+            elif type(value) is str and STRING_SEPARATOR not in value:
+                strings.append(value)
+            elif type(value) is int and name in self.keys:
+                int_keys |= self.bits[name]
+                strings.append(str(value))
+            else:
+                return None
+        extras = {name: value for name, value in record.items() if name not in self.known}
+        extras = _dumps(extras) if extras else b""
+        try:
+            header = self.header.pack(BINARY_MAGIC, self.version, absent, nulls, int_keys, *numbers, len(extras))
+        except struct.error:
+            # Integer outside int64
+            return None
+        return header + STRING_SEPARATOR.join(strings).encode("utf-8") + extras
+
+    def decode(self, value: bytes) -> dict:
+        head = self.header.unpack_from(value)
+        _, _, absent, nulls, int_keys = head[:5]
+        extras_size = head[-1]
+        text = value[self.header.size:len(value) - extras_size].decode("utf-8")
+        values = head[5:-1] + tuple(text.split(STRING_SEPARATOR))
+        record = dict(zip(self.wire_order, values))
+        if int_keys:
+            for name in self.keys:
+                if int_keys & self.bits[name]:
+                    record[name] = int(record[name])
+        if nulls or absent:
+            for name in self.names:
+                if nulls & self.bits[name]:
+                    record[name] = None
+                elif absent & self.bits[name]:
+                    del record[name]
+        if extras_size:
+            record.update(_loads(value[len(value) - extras_size:]))
+        return record
+
+
+class SchemaRegistry:
+    """
+    Local stand-in for a schema registry: every wire schema version this build can read.
+    Producers write with `latest`; consumers keep older versions registered so in-flight messages still decode.
+    """
+
+    def __init__(self, schemas: list = ()):
+        self.schemas = {}
+        for schema in schemas:
+            self.register(schema)
+
+    def register(self, schema: WireSchema):
+        if schema.version in self.schemas:
+            raise ValueError(f"Wire schema version {schema.version} is already registered")
+        self.schemas[schema.version] = schema
+
+    @property
+    def latest(self) -> WireSchema:
+        return self.schemas[max(self.schemas)]
+
+    def get(self, version: int) -> WireSchema:
+        try:
+            return self.schemas[version]
+        except KeyError:
+            raise ValueError(f"Unknown wire schema version {version}") from None
+
+
+# The producer's transaction (see data_generator.producer.generate_transaction)
+TRANSACTION_V1 = WireSchema(1, [
+    ("transaction_id", "str"), ("trans_date_trans_time", "str"), ("cc_num", "key"), ("merchant", "str"),
+    ("category", "str"), ("amt", "f64"), ("first", "str"), ("last", "str"), ("gender", "str"), ("street", "str"),
+    ("city", "str"), ("state", "str"), ("zip", "key"), ("lat", "f64"), ("long", "f64"), ("city_pop", "i64"),
+    ("job", "str"), ("dob", "str"), ("merch_lat", "f64"), ("merch_long", "f64"),
+])
+
+SCHEMA_REGISTRY = SchemaRegistry([TRANSACTION_V1])
+
+
+class JsonSerializer:
+    name = "json"
+
+    def encode(self, record: dict) -> bytes:
+        return _dumps(record)
+
+    def headers(self, payload: bytes) -> list:
+        return [(CONTENT_TYPE_HEADER, JSON_CONTENT_TYPE)]
+
+
+class BinarySerializer:
+    """
+    Writes the registry's latest WireSchema; records that do not fit it are sent as JSON instead.
+    """
+    name = "binary"
+
+    def __init__(self, registry: SchemaRegistry = SCHEMA_REGISTRY):
+        self.schema = registry.latest
+        self.content_type = f"application/vnd.fraud.txn.v{self.schema.version}+binary".encode()
+
+    def encode(self, record: dict) -> bytes:
+        payload = self.schema.encode(record)
+        return payload if payload is not None else _dumps(record)
+
+    def headers(self, payload: bytes) -> list:
+        is_binary = payload[:1] == b"\x00"
+        return [(CONTENT_TYPE_HEADER, self.content_type if is_binary else JSON_CONTENT_TYPE)]
+
+
+SERIALIZERS = {"json": JsonSerializer, "binary": BinarySerializer}
+
+
+def get_serializer(wire_format: str = "json"):
+    try:
+        return SERIALIZERS[wire_format]()
+    except KeyError:
+        raise ValueError(f"Unknown wire format {wire_format!r}, expected one of {sorted(SERIALIZERS)}") from None
+
+
+def decode(value: bytes, registry: SchemaRegistry = SCHEMA_REGISTRY):
+    """
+    Decode a txn_data payload in either format: the first byte tells binary (0x00) from JSON,
+    so consumers read both during a rollout without looking at headers.
+    """
+    if value[:1] == b"\x00":
+        return registry.get(int.from_bytes(value[1:3], "little")).decode(value)
+    return _loads(value)
@@ -0,0 +1,291 @@
+import json
+import time
+import asyncio
+from collections import Counter
+from fraud_detection.streaming.geo import add_location
+
+
+def dead_letter(reasons: list, payload, msg=None) -> dict:
+    """
+    Dead-letter entry for a message that could not be scored: why, what was received, and where it came from.
+    payload: the decoded transaction, or the raw message text when it could not be decoded
+    """
+    entry = {"reasons": reasons, "payload": payload, "received_at": time.time()}
+    if msg is not None:
+        entry.update(topic=msg.topic(), partition=msg.partition(), offset=msg.offset())
+    return entry
+
+
+class MongoSink:
+    """
+    Persists scored transactions into the fraud / non-fraud MongoDB collections,
+    with lat / long also stored as a GeoJSON `location` for the 2dsphere index.
+    """
+
+    def __init__(self, fraud_collection, non_fraud_collection, client=None):
+        self.fraud_collection = fraud_collection
+        self.non_fraud_collection = non_fraud_collection
+        self.client = client
+
+    @classmethod
+    def from_uri(cls, mongo_uri: str, streaming_config):
+        """
+        Open a MongoClient and bind the collections named in streaming_config.
+        """
+        from pymongo import MongoClient
+
+        client = MongoClient(mongo_uri)
+        db = client[streaming_config.mongo_db]
+        return cls(db[streaming_config.fraud_collection], db[streaming_config.non_fraud_collection], client=client)
+
+    def write(self, txn: dict):
+        add_location(txn)
+        if txn["is_fraud"] == 1:
+            self.fraud_collection.insert_one(txn)
+        else:
+            self.non_fraud_collection.insert_one(txn)
+
+    def write_many(self, txns: list):
+        """
+        One unordered bulk insert per collection for a micro-batch.
+        """
+        for txn in txns:
+            add_location(txn)
+        frauds = [txn for txn in txns if txn["is_fraud"] == 1]
+        non_frauds = [txn for txn in txns if txn["is_fraud"] != 1]
+        if frauds:
+            self.fraud_collection.insert_many(frauds, ordered=False)
+        if non_frauds:
+            self.non_fraud_collection.insert_many(non_frauds, ordered=False)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+
+
+class MemorySink:
+    """
+    Keeps scored transactions in process, split like the Mongo collections. Used by the replay engine.
+    max_documents bounds how many documents are retained per collection (None keeps everything).
+    """
+
+    def __init__(self, max_documents: int = None):
+        self.max_documents = max_documents
+        self.fraud = []
+        self.non_fraud = []
+        self.written = 0
+
+    def write(self, txn: dict):
+        self.written += 1
+        target = self.fraud if txn["is_fraud"] == 1 else self.non_fraud
+        if self.max_documents is None or len(target) < self.max_documents:
+            target.append(txn)
+
+    def write_many(self, txns: list):
+        for txn in txns:
+            self.write(txn)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullSink:
+    """
+    Discards everything; measures the scoring path without any persistence cost.
+    """
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, txn: dict):
+        self.written += 1
+
+    def write_many(self, txns: list):
+        self.written += len(txns)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncMongoSink:
+    """
+    MongoSink on PyMongo's native asyncio client, so many inserts can be in flight on one event loop.
+    """
+
+    def __init__(self, fraud_collection, non_fraud_collection, client=None):
+        self.fraud_collection = fraud_collection
+        self.non_fraud_collection = non_fraud_collection
+        self.client = client
+
+    @classmethod
+    def from_uri(cls, mongo_uri: str, streaming_config):
+        from pymongo import AsyncMongoClient
+
+        client = AsyncMongoClient(mongo_uri)
+        db = client[streaming_config.mongo_db]
+        return cls(db[streaming_config.fraud_collection], db[streaming_config.non_fraud_collection], client=client)
+
+    async def write(self, txn: dict):
+        add_location(txn)
+        if txn["is_fraud"] == 1:
+            await self.fraud_collection.insert_one(txn)
+        else:
+            await self.non_fraud_collection.insert_one(txn)
+
+    async def write_many(self, txns: list):
+        """
+        One unordered bulk insert per collection.
+        """
+        for txn in txns:
+            add_location(txn)
+        frauds = [txn for txn in txns if txn["is_fraud"] == 1]
+        non_frauds = [txn for txn in txns if txn["is_fraud"] != 1]
+        if frauds:
+            await self.fraud_collection.insert_many(frauds, ordered=False)
+        if non_frauds:
+            await self.non_fraud_collection.insert_many(non_frauds, ordered=False)
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+
+class MongoDeadLetterSink:
+    """
+    Stores dead-letter entries in their own collection, optionally also publishing them to a Kafka topic
+    so another service can repair and replay them.
+    """
+
+    def __init__(self, collection, producer=None, topic: str = None):
+        self.collection = collection
+        self.producer = producer
+        self.topic = topic
+        self.written = 0
+
+    @classmethod
+    def from_config(cls, db, streaming_config):
+        producer = None
+        if streaming_config.dead_letter_topic:
+            from fraud_detection.data_generator.producer import create_producer
+            producer = create_producer()
+        return cls(db[streaming_config.dead_letter_collection], producer, streaming_config.dead_letter_topic)
+
+    def write(self, entry: dict):
+        self.write_many([entry])
+
+    def publish(self, entries: list):
+        self.written += len(entries)
+        if self.producer is not None:
+            for entry in entries:
+                self.producer.produce(self.topic, value=json.dumps(entry, default=str).encode("utf-8"))
+            self.producer.poll(0)
+
+    def write_many(self, entries: list):
+        self.publish(entries)
+        self.collection.insert_many(entries, ordered=False)
+
+    def flush(self):
+        if self.producer is not None:
+            self.producer.flush()
+
+    def close(self):
+        self.flush()
+
+
+class AsyncMongoDeadLetterSink:
+    """
+    MongoDeadLetterSink on the asyncio client. The Kafka producer is non-blocking, so it is shared as is.
+    """
+
+    def __init__(self, collection, producer=None, topic: str = None):
+        self.sink = MongoDeadLetterSink(collection, producer, topic)
+        self.collection = collection
+
+    @classmethod
+    def from_config(cls, db, streaming_config):
+        sync_sink = MongoDeadLetterSink.from_config(db, streaming_config)
+        return cls(sync_sink.collection, sync_sink.producer, sync_sink.topic)
+
+    async def write(self, entry: dict):
+        await self.write_many([entry])
+
+    async def write_many(self, entries: list):
+        self.sink.publish(entries)
+        await self.collection.insert_many(entries, ordered=False)
+
+    async def flush(self):
+        self.sink.flush()
+
+    async def close(self):
+        self.sink.close()
+
+
+class MemoryDeadLetterSink:
+    """
+    Keeps dead-letter entries in process and counts them by reason. Used by the replay engine's report.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.entries = []
+        self.reasons = Counter()
+        self.written = 0
+
+    def write(self, entry: dict):
+        self.written += 1
+        self.reasons.update(entry["reasons"])
+        if self.max_entries is None or len(self.entries) < self.max_entries:
+            self.entries.append(entry)
+
+    def write_many(self, entries: list):
+        for entry in entries:
+            self.write(entry)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncSinkAdapter:
+    """
+    Exposes a blocking sink (MemorySink, NullSink, ...) through the async sink interface.
+    Writes run on `executor` (None = the loop's default thread pool) unless `inline` is set,
+    which is cheaper for in-memory sinks that never block.
+    """
+
+    def __init__(self, sink, executor=None, inline: bool = False):
+        self.sink = sink
+        self.executor = executor
+        self.inline = inline
+
+    async def write(self, txn: dict):
+        if self.inline:
+            self.sink.write(txn)
+        else:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.sink.write, txn)
+
+    async def write_many(self, txns: list):
+        if self.inline:
+            self.sink.write_many(txns)
+        else:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.sink.write_many, txns)
+
+    async def flush(self):
+        self.sink.flush()
+
+    async def close(self):
+        self.sink.close()
@@ -0,0 +1,146 @@
+import json
+import time
+import itertools
+import pandas as pd
+from fraud_detection.streaming.serialization import JsonSerializer
+
+# confluent_kafka.TIMESTAMP_CREATE_TIME, without importing the client
+TIMESTAMP_CREATE_TIME = 1
+
+
+class ReplayMessage:
+    """
+    In-process stand-in for confluent_kafka.Message, carrying the ground-truth label alongside the payload.
+    """
+    __slots__ = ("_value", "_key", "_topic", "_partition", "_offset", "_timestamp", "_headers", "label")
+
+    def __init__(self, value: bytes, key: bytes, topic: str, partition: int, offset: int, timestamp_ms: int, label=None,
+                 headers: list = None):
+        self._value = value
+        self._key = key
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._timestamp = timestamp_ms
+        self._headers = headers
+        self.label = label
+
+    def value(self):
+        return self._value
+
+    def key(self):
+        return self._key
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def timestamp(self):
+        return (TIMESTAMP_CREATE_TIME, self._timestamp)
+
+    def headers(self):
+        return self._headers
+
+    def error(self):
+        return None
+
+
+class ReplaySource:
+    """
+    Turns an iterable of transaction dicts into Kafka-like messages.
+    Implements the poll/consume/close subset of confluent_kafka.Consumer, so the consumer loop runs unchanged on it.
+    The label column is removed from the payload and kept on the message, so the scorer never sees it.
+    serializer: wire format of the payloads (streaming.serialization), JSON by default.
+    """
+    label_column = "is_fraud"
+
+    def __init__(self, records, topic: str = "txn_data", limit: int = None, serializer=None):
+        self._records = iter(records) if limit is None else itertools.islice(records, limit)
+        self.topic = topic
+        self.serializer = serializer or JsonSerializer()
+        self._offset = 0
+        self.exhausted = False
+
+    def _next_message(self):
+        try:
+            record = next(self._records)
+        except StopIteration:
+            self.exhausted = True
+            return None
+
+        label = record.pop(self.label_column, None)
+        value = self.serializer.encode(record)
+        msg = ReplayMessage(
+            value=value,
+            key=str(record.get("cc_num")).encode("utf-8"),
+            topic=self.topic,
+            partition=0,
+            offset=self._offset,
+            timestamp_ms=int(time.time() * 1000),
+            label=None if label is None or pd.isna(label) else int(label),
+            headers=self.serializer.headers(value)
+        )
+        self._offset += 1
+        return msg
+
+    def poll(self, timeout: float = None):
+        return None if self.exhausted else self._next_message()
+
+    def consume(self, num_messages: int = 1, timeout: float = None) -> list:
+        messages = []
+        while len(messages) < num_messages and not self.exhausted:
+            msg = self._next_message()
+            if msg is not None:
+                messages.append(msg)
+        return messages
+
+    def close(self):
+        pass
+
+
+def read_csv_records(file_path: str, chunksize: int = 10000):
+    """
+    Stream rows of a transactions CSV (e.g. clean_data.csv) as dicts, a chunk at a time.
+    Rows without a transaction_id get their row number, so replayed documents stay identifiable.
+    """
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        if "transaction_id" not in chunk.columns:
+            # The chunked reader keeps a running row index across chunks
+            chunk["transaction_id"] = chunk.index.astype(str)
+        yield from chunk.to_dict("records")
+
+
+def read_jsonl_records(file_path: str):
+    """
+    Stream one transaction dict per non-empty line of a JSONL file.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class CsvSource(ReplaySource):
+    def __init__(self, file_path: str, topic: str = "txn_data", limit: int = None, chunksize: int = 10000, serializer=None):
+        super().__init__(read_csv_records(file_path, chunksize), topic=topic, limit=limit, serializer=serializer)
+
+
+class JsonlSource(ReplaySource):
+    def __init__(self, file_path: str, topic: str = "txn_data", limit: int = None, serializer=None):
+        super().__init__(read_jsonl_records(file_path), topic=topic, limit=limit, serializer=serializer)
+
+
+class GeneratorSource(ReplaySource):
+    """
+    Replays the Faker load generator used by the Kafka producer (unlabelled).
+    """
+    def __init__(self, topic: str = "txn_data", limit: int = None, serializer=None):
+        from fraud_detection.data_generator.producer import generate_transaction
+
+        super().__init__((generate_transaction() for _ in itertools.count()), topic=topic, limit=limit, serializer=serializer)
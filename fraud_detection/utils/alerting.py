@@ -1,29 +1,38 @@
 import time
+import asyncio
 import smtplib
+import threading
 from dotenv import load_dotenv
 from email.mime.text import MIMEText
-from pymongo import MongoClient
-import logging
+from fraud_detection.logger.log import logging
 import os
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT")) 
 
-EMAIL_SENDER = os.getenv("EMAIL_SENDER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER")
+def load_email_settings() -> dict:
+    """
+    SMTP settings from the environment. Read when needed, not at import, so importing this module never fails.
+    """
+    return {
+        "server": os.getenv("SMTP_SERVER"),
+        "port": int(os.getenv("SMTP_PORT", "587")),
+        "sender": os.getenv("EMAIL_SENDER"),
+        "password": os.getenv("EMAIL_PASSWORD"),
+        "receiver": os.getenv("EMAIL_RECEIVER"),
+    }
 
-MONGO_URI = os.getenv("MONGO_URI")
-MONGO_DB = os.getenv("MONGO_DB")
-MONGO_COLLECTION = os.getenv("MONGO_COLLECTION")
+def create_fraud_collection(mongo_uri: str, streaming_config):
+    """
+    Connect to MongoDB and return the fraud alerts collection.
+    """
+    from pymongo import MongoClient
 
-client = MongoClient(MONGO_URI)
-db = client["txn_db"]
-collection = db["fraud_alerts"]
+    client = MongoClient(mongo_uri)
+    return client[streaming_config.mongo_db][streaming_config.fraud_collection]
 
-def send_email_alert(transaction):
+def send_email_alert(transaction, settings: dict = None):
+    settings = settings or load_email_settings()
     subject = "🚨 Fraud Alert: Suspicious Transaction Detected!"
     body = f"""
 🚨 FRAUD DETECTED 🚨
@@ -39,32 +48,118 @@ Location            : {transaction.get('street')}, {transaction.get('city')}, {t
 Please review this transaction immediately.
 """
 
+    sent = send_email(subject, body, settings)
+    if sent:
+        logger.info(f"Email alert sent for transaction {transaction.get('transaction_id')}")
+    return sent
+
+def send_email(subject: str, body: str, settings: dict) -> bool:
     msg = MIMEText(body, "plain")
     msg["Subject"] = subject
-    msg["From"] = EMAIL_SENDER
-    msg["To"] = EMAIL_RECEIVER
+    msg["From"] = settings["sender"]
+    msg["To"] = settings["receiver"]
 
     try:
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+        server = smtplib.SMTP(settings["server"], settings["port"])
         server.starttls()
-        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        server.sendmail(EMAIL_SENDER, EMAIL_RECEIVER, msg.as_string())
+        server.login(settings["sender"], settings["password"])
+        server.sendmail(settings["sender"], settings["receiver"], msg.as_string())
         server.quit()
-        print("📩 Email Alert Sent Successfully!")
+        return True
     except Exception as e:
-        logging.error(f"❌ Failed to send email: {e}")
+        logger.error(f"Failed to send email: {e}")
+        return False
+
+def send_drift_alert(report: dict, settings: dict = None):
+    """
+    Email a DriftMonitor window report listing the features whose distribution moved away from training.
+    """
+    settings = settings or load_email_settings()
+    lines = "\n".join(f"{name:<22}: " + ", ".join(f"{stat} {value:.4f}" for stat, value in stats.items())
+                      for name, stats in sorted(report["drifted"].items()))
+    body = f"""
+⚠️ FEATURE DRIFT DETECTED ⚠️
+---------------------------
+Window              : {report['window']} ({report['events']} events)
+Drifted features    : {len(report['drifted'])}
+---------------------------
+{lines}
+---------------------------
+Live transactions no longer match the training data; review the model before trusting its scores.
+"""
+    sent = send_email("⚠️ Drift Alert: Live features moved away from training data", body, settings)
+    if sent:
+        logger.info(f"Drift alert sent for window {report['window']}")
+    return sent
+
+def drift_alert_handler(cooldown_seconds: float = 3600.0):
+    """
+    on_drift callback for DriftMonitor that emails at most one report per cooldown, on a background thread so SMTP
+    never stalls the consumer. None when SMTP is not configured: drift is then only logged and exported as metrics.
+    """
+    if not os.getenv("SMTP_SERVER"):
+        return None
+    settings = load_email_settings()
+    last_sent = [float("-inf")]
 
-def monitor_fraud_transactions():
-    print("🚀 Monitoring MongoDB for Fraud Transactions...")
+    def on_drift(report: dict):
+        if time.monotonic() - last_sent[0] < cooldown_seconds:
+            return
+        last_sent[0] = time.monotonic()
+        threading.Thread(target=send_drift_alert, args=(report, settings), name="drift-alert", daemon=True).start()
+    return on_drift
+
+async def send_email_alert_async(transaction, settings: dict = None):
+    """
+    Non-blocking send_email_alert for the asyncio consumer; smtplib itself is blocking, so it runs on a worker thread.
+    """
+    await asyncio.to_thread(send_email_alert, transaction, settings)
+
+def build_alert_deduplicator(collection, membership_config):
+    """
+    Filter of transaction ids already alerted on, confirmed against the alerted_at marker in MongoDB,
+    so a restart does not re-send the latest alert.
+    """
+    from fraud_detection.streaming.membership import (TransactionDeduplicator, load_or_rebuild,
+                                                      mongo_exact_lookup, rebuild_from_mongo)
+
+    dedup = membership_config.dedup
+    alerted = {"alerted_at": {"$exists": True}}
+    bloom = load_or_rebuild(
+        os.path.join(membership_config.filter_dir, "alerted_ids.bloom"),
+        lambda: rebuild_from_mongo([collection], "transaction_id", dedup["capacity"], dedup["error_rate"], query=alerted),
+        force_rebuild=membership_config.rebuild_on_start)
+    return TransactionDeduplicator(bloom, mongo_exact_lookup([collection], "transaction_id", query=alerted),
+                                   recent_size=dedup["recent_ids"])
+
+def monitor_fraud_transactions(collection, settings: dict, deduplicator=None):
+    logger.info("Monitoring MongoDB for Fraud Transactions...")
     last_checked_id = None
 
     while True:
         latest_fraud = collection.find_one(sort=[("_id", -1)])
         if latest_fraud and latest_fraud["_id"] != last_checked_id:
-            print("🚨 New Fraud Transaction Detected:", latest_fraud)
-            send_email_alert(latest_fraud)
+            transaction_id = latest_fraud.get('transaction_id')
+            logger.info(f"New fraud transaction detected: {transaction_id}")
+            if deduplicator is not None and deduplicator.seen(transaction_id):
+                logger.info(f"Alert already sent for transaction {transaction_id}")
+            elif send_email_alert(latest_fraud, settings):
+                collection.update_one({"_id": latest_fraud["_id"]}, {"$set": {"alerted_at": time.time()}})
             last_checked_id = latest_fraud["_id"]
         time.sleep(10)
 
+def main():
+    from fraud_detection.config.configuration import get_configuration_manager
+
+    load_dotenv()
+    app_config = get_configuration_manager()
+    membership_config = app_config.get_membership_config()
+    collection = create_fraud_collection(os.getenv("MONGO_URI"), app_config.get_streaming_config())
+    deduplicator = build_alert_deduplicator(collection, membership_config)
+    try:
+        monitor_fraud_transactions(collection, load_email_settings(), deduplicator)
+    finally:
+        deduplicator.bloom.save(os.path.join(membership_config.filter_dir, "alerted_ids.bloom"))
+
 if __name__ == "__main__":
-    monitor_fraud_transactions()
\ No newline at end of file
+    main()
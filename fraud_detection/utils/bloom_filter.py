@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import math
+from hashlib import blake2b
+from fraud_detection.exception.exception_handler import CustomException
+
+_MAGIC = b"BLOOM1\n"
+
+
+class BloomFilter:
+    """
+    Fixed-capacity Bloom filter sized for a target false-positive rate.
+    "key in filter" is never wrong for keys that were added; for others it is wrong with probability error_rate
+    (while no more than `capacity` keys have been added), so a positive answer needs an exact check.
+    Keys are hashed with blake2b, so a saved filter gives the same answers in any process.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, bits: bytearray = None, count: int = 0):
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+        self.num_bits, self.num_hashes = self.optimal_size(self.capacity, self.error_rate)
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    @staticmethod
+    def optimal_size(capacity: int, error_rate: float):
+        """
+        (bits, hash functions) minimising memory for capacity keys at error_rate.
+        """
+        num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return num_bits, num_hashes
+
+    @classmethod
+    def bytes_per_million_keys(cls, error_rate: float) -> float:
+        return cls.optimal_size(1_000_000, error_rate)[0] / 8
+
+    def _positions(self, key):
+        digest = blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+        # Double hashing: k positions from two 64-bit hashes, reduced first to keep the arithmetic small
+        num_bits = self.num_bits
+        h1 = int.from_bytes(digest[:8], "little") % num_bits
+        h2 = int.from_bytes(digest[8:], "little") % num_bits or 1
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, key) -> bool:
+        """
+        Add a key. Returns False if every bit was already set (the key may have been added before).
+        """
+        bits = self.bits
+        new = False
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key) -> bool:
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def estimated_error_rate(self) -> float:
+        """
+        False-positive rate at the current fill, which exceeds error_rate once more than capacity keys are added.
+        """
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def describe(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "keys": self.count,
+            "error_rate": self.error_rate,
+            "estimated_error_rate": round(self.estimated_error_rate(), 8),
+            "hashes": self.num_hashes,
+            "memory_mib": round(self.memory_bytes / 2 ** 20, 3),
+            "mib_per_million_keys": round(self.bytes_per_million_keys(self.error_rate) / 2 ** 20, 3),
+        }
+
+    def save(self, file_path: str):
+        """
+        Persist as a one-line JSON header followed by the raw bit array.
+        """
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            header = json.dumps({"capacity": self.capacity, "error_rate": self.error_rate, "count": self.count})
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_MAGIC + header.encode("utf-8") + b"\n")
+                f.write(self.bits)
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str):
+        try:
+            with open(file_path, "rb") as f:
+                if f.readline() != _MAGIC:
+                    raise ValueError(f"{file_path} is not a saved BloomFilter")
+                header = json.loads(f.readline())
+                bits = bytearray(f.read())
+            bloom = cls(header["capacity"], header["error_rate"], bits=bits, count=header["count"])
+            if len(bits) != (bloom.num_bits + 7) // 8:
+                raise ValueError(f"{file_path} is truncated")
+            return bloom
+        except Exception as e:
+            raise CustomException(e, sys) from e
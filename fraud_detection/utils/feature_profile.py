@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import math
+from bisect import bisect_right
+from fraud_detection.exception.exception_handler import CustomException
+
+# Profile entry for the model's fraud probability, alongside the model features
+SCORE_FEATURE = "score"
+# Fraud scores pile up near 0, so quantile edges would collapse; the score is binned on fixed edges instead
+SCORE_EDGES = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9]
+# Floor for bin proportions in PSI, so an empty bin contributes a large but finite term
+PSI_EPSILON = 1e-4
+
+
+class FeatureBinning:
+    """
+    Fixed bins for one feature. Numeric features use sorted edges (bin = bisect_right(edges, x));
+    categorical features use their most frequent values, with everything else in a shared "other" bin.
+    The last bin always holds missing / unparseable values.
+    """
+
+    def __init__(self, name: str, kind: str, edges: list = None, values: list = None):
+        self.name = name
+        self.kind = kind
+        self.edges = [float(edge) for edge in edges or []]
+        self.values = list(values or [])
+        self.index = {value: i for i, value in enumerate(self.values)}
+        self.num_bins = (len(self.edges) + 1 if kind == "numeric" else len(self.values) + 1) + 1
+        self._edges_array = self._values_index = None
+
+    @property
+    def edges_array(self):
+        if self._edges_array is None:
+            import numpy as np
+            self._edges_array = np.asarray(self.edges)
+        return self._edges_array
+
+    @property
+    def values_index(self):
+        if self._values_index is None:
+            import pandas as pd
+            self._values_index = pd.Index(self.values)
+        return self._values_index
+
+    @property
+    def missing_bin(self) -> int:
+        return self.num_bins - 1
+
+    def bin(self, value) -> int:
+        """
+        Bin of a single value: a bisect over at most a few dozen edges, or one dict lookup.
+        """
+        if self.kind == "numeric":
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return self.missing_bin
+            if math.isnan(value):
+                return self.missing_bin
+            return bisect_right(self.edges, value)
+        if value is None:
+            return self.missing_bin
+        return self.index.get(value, len(self.values))
+
+    def bin_array(self, values):
+        """
+        Vectorised bin() for a column of a micro-batch.
+        """
+        import numpy as np
+        import pandas as pd
+
+        if self.kind == "numeric":
+            try:
+                values = np.asarray(values, dtype=float)
+            except (TypeError, ValueError):
+                values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+            bins = np.searchsorted(self.edges_array, values, side="right")
+            bins[np.isnan(values)] = self.missing_bin
+            return bins
+        bins = self.values_index.get_indexer(values)
+        bins[bins < 0] = len(self.values)
+        bins[pd.isna(values)] = self.missing_bin
+        return bins
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "edges": self.edges, "values": self.values}
+
+
+class FeatureProfile:
+    """
+    Reference distribution of each model feature (and of the fraud score) at training time:
+    the bins plus the share of training rows in each. Live traffic is binned the same way and compared with PSI / KS.
+    """
+
+    def __init__(self, binnings: dict, expected: dict, sample_size: int):
+        """
+        binnings: dict of feature -> FeatureBinning
+        expected: dict of feature -> list of bin proportions
+        """
+        self.binnings = binnings
+        self.expected = expected
+        self.sample_size = sample_size
+
+    @property
+    def features(self) -> list:
+        return list(self.binnings)
+
+    @classmethod
+    def fit(cls, df, categorical_columns: list, bins: int = 20, max_categories: int = 50):
+        """
+        Profile every column of a feature frame. Numeric edges are the training quantiles, so each bin holds
+        roughly 1/bins of the rows; features with at most `bins` distinct values get one bin per value.
+        df: pandas.DataFrame of model features
+        """
+        try:
+            profile = cls({}, {}, len(df))
+            for col in df.columns:
+                if col in categorical_columns:
+                    top = df[col].value_counts().index[:max_categories]
+                    profile.add(col, df[col], FeatureBinning(col, "categorical", values=[_plain(v) for v in top]))
+                else:
+                    profile.add(col, df[col], bins=bins)
+            return profile
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def add(self, name: str, values, binning: FeatureBinning = None, bins: int = 20, edges: list = None):
+        """
+        Add (or replace) the reference distribution of one feature, e.g. the model score after training.
+        """
+        import numpy as np
+
+        values = np.asarray(values)
+        if binning is None:
+            if edges is None:
+                numeric = values.astype(float)
+                numeric = numeric[~np.isnan(numeric)]
+                distinct = np.unique(numeric)
+                if len(distinct) <= bins:
+                    # Discrete feature (flags, weekday, ...): one bin per value, split at the midpoints
+                    edges = ((distinct[:-1] + distinct[1:]) / 2).tolist()
+                else:
+                    edges = sorted(set(np.quantile(numeric, np.linspace(0, 1, bins + 1)[1:-1]).tolist()))
+            binning = FeatureBinning(name, "numeric", edges=edges)
+        counts = np.bincount(binning.bin_array(values), minlength=binning.num_bins)
+        self.binnings[name] = binning
+        self.expected[name] = (counts / max(counts.sum(), 1)).tolist()
+
+    def save(self, file_path: str):
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            features = {name: {**binning.to_dict(), "expected": self.expected[name]}
+                        for name, binning in self.binnings.items()}
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump({"sample_size": self.sample_size, "features": features}, f)
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            binnings, expected = {}, {}
+            for name, feature in saved["features"].items():
+                binnings[name] = FeatureBinning(name, feature["kind"], feature["edges"], feature["values"])
+                expected[name] = feature["expected"]
+            return cls(binnings, expected, saved["sample_size"])
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+
+def _plain(value):
+    # numpy scalars -> Python values, so they survive JSON and match the codes seen when serving
+    return value.item() if hasattr(value, "item") else value
+
+
+def population_stability_index(expected: list, counts: list) -> float:
+    """
+    PSI = sum((actual - expected) * ln(actual / expected)) over bins; ~0.1 is a moderate shift, >0.2 a significant one.
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    psi = 0.0
+    for expected_share, count in zip(expected, counts):
+        e = max(expected_share, PSI_EPSILON)
+        a = max(count / total, PSI_EPSILON)
+        psi += (a - e) * math.log(a / e)
+    return psi
+
+
+def ks_statistic(expected: list, counts: list) -> float:
+    """
+    Kolmogorov-Smirnov distance between the binned distributions: the largest gap between their CDFs at a bin edge.
+    Only meaningful for ordered (numeric) bins.
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    gap = expected_cdf = actual_cdf = 0.0
+    for expected_share, count in zip(expected, counts):
+        expected_cdf += expected_share
+        actual_cdf += count / total
+        gap = max(gap, abs(actual_cdf - expected_cdf))
+    return gap
@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from fraud_detection.logger.log import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "FRAUD_PROFILE"
+# cprofile: deterministic per-function times (.pstats); sampling: periodic stack samples (.folded, for flame graphs);
+# memory: tracemalloc peak and top allocating lines
+PROFILERS = ("cprofile", "sampling", "memory")
+
+# tracemalloc is process-wide: traced while at least one memory-profiled section is running
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def requested_profilers(cli_value: str = None) -> tuple:
+    """
+    Profilers asked for by --profile (cli_value) or else the FRAUD_PROFILE env var; () when profiling is off.
+    "1" / "all" enable every profiler, otherwise a comma-separated subset of PROFILERS.
+    """
+    value = (cli_value if cli_value is not None else os.getenv(PROFILE_ENV, "")).strip().lower()
+    if value in ("", "0", "false", "off", "no"):
+        return ()
+    if value in ("1", "true", "all", "on", "yes"):
+        return PROFILERS
+    names = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in names if name not in PROFILERS]
+    if unknown:
+        raise ValueError(f"Unknown profilers {unknown}, expected a subset of {list(PROFILERS)} or 'all'")
+    return names
+
+
+def frame_label(code) -> str:
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold_stack(frame, root: str = None) -> str:
+    """
+    The stack ending at frame as one folded line, outermost call first: "root;caller;callee".
+    """
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    if root:
+        labels.append(root)
+    return ";".join(reversed(labels))
+
+
+def write_folded(counts: Counter, path: str):
+    """
+    One "stack count" line per distinct stack: the collapsed format of flamegraph.pl, speedscope and inferno.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class StackSampler:
+    """
+    Samples Python stacks every interval seconds on a daemon thread and counts the folded stacks.
+    thread_ids: the threads to sample; None samples every thread but the sampler (and those in `ignored`),
+    each rooted at its thread name.
+    """
+
+    def __init__(self, interval: float, thread_ids: set = None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.ignored = set()
+        self.counts = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            names = {t.ident: t.name for t in threading.enumerate()} if self.thread_ids is None else None
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own or ident in self.ignored:
+                        continue
+                    if self.thread_ids is not None and ident not in self.thread_ids:
+                        continue
+                    self.counts[fold_stack(frame, names.get(ident, str(ident)) if names is not None else None)] += 1
+                self.samples += 1
+
+    def drain(self) -> Counter:
+        """
+        The counts since the last drain.
+        """
+        with self._lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.drain()
+
+
+class ProfiledCall:
+    """
+    func wrapped in a Profiler section; picklable when func is, so process-pool tasks are profiled in their worker.
+    """
+
+    def __init__(self, profiler, name: str, func):
+        self.profiler = profiler
+        self.name = name
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        with self.profiler.section(self.name):
+            return self.func(*args, **kwargs)
+
+
+class Profiler:
+    """
+    Profiles named sections (the training pipeline's tasks) with the requested profilers. Per section, in run_dir:
+    <name>.pstats (cprofile, for pstats / snakeviz), <name>.folded (sampling, for flame graphs) and
+    <name>.json (wall time, slowest functions by cumulative time, tracemalloc peak and top allocating lines).
+    cProfile and sampling follow the thread running the section. tracemalloc is process-wide, so memory figures
+    of sections that ran at the same time include each other's allocations.
+    """
+
+    def __init__(self, profilers: tuple, run_dir: str, sample_interval: float = 0.005, top_entries: int = 25):
+        self.profilers = tuple(profilers)
+        self.run_dir = run_dir
+        self.sample_interval = sample_interval
+        self.top_entries = top_entries
+
+    @classmethod
+    def from_config(cls, profiling_config, profilers: tuple, run_name: str):
+        run_dir = os.path.join(profiling_config.profile_dir, f"{run_name}_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}")
+        logger.info(f"Profiling ({', '.join(profilers)}) to: {run_dir}")
+        return cls(profilers, run_dir, sample_interval=profiling_config.sample_interval_seconds,
+                   top_entries=profiling_config.top_entries)
+
+    def wrap(self, name: str, func) -> ProfiledCall:
+        return ProfiledCall(self, name, func)
+
+    @contextmanager
+    def section(self, name: str):
+        profile, sampler, memory_start = None, None, None
+        if "cprofile" in self.profilers:
+            import cProfile
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Python 3.12+ allows one active cProfile per process; overlapping sections go without
+                logger.warning(f"No cProfile for {name}: {e}")
+                profile = None
+        if "sampling" in self.profilers:
+            sampler = StackSampler(self.sample_interval, thread_ids={threading.get_ident()}).start()
+        if "memory" in self.profilers:
+            memory_start = self._start_tracemalloc()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            # Stop measuring before the reporting below
+            counts = sampler.stop() if sampler is not None else None
+            if profile is not None:
+                profile.disable()
+            report = {"section": name, "pid": os.getpid(), "thread": threading.current_thread().name,
+                      "wall_seconds": round(wall, 3)}
+            os.makedirs(self.run_dir, exist_ok=True)
+            if profile is not None:
+                report["slowest_functions"] = self._slowest_functions(profile, os.path.join(self.run_dir, f"{name}.pstats"))
+            if counts is not None:
+                report["samples"] = sum(counts.values())
+                write_folded(counts, os.path.join(self.run_dir, f"{name}.folded"))
+            if memory_start is not None:
+                report["memory"] = self._stop_tracemalloc(memory_start)
+            with open(os.path.join(self.run_dir, f"{name}.json"), "w") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Profiled {name} ({wall:.2f}s) to: {self.run_dir}")
+
+    def _slowest_functions(self, profile, pstats_file: str) -> list:
+        import pstats
+
+        profile.dump_stats(pstats_file)
+        stats = pstats.Stats(profile).stats
+        slowest = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top_entries]
+        return [{"function": f"{function} ({os.path.basename(filename)}:{line})", "calls": calls,
+                 "tottime": round(tottime, 4), "cumtime": round(cumtime, 4)}
+                for (filename, line, function), (_, calls, tottime, cumtime, _) in slowest]
+
+    def _start_tracemalloc(self):
+        global _tracemalloc_users
+        import tracemalloc
+
+        with _tracemalloc_lock:
+            if not _tracemalloc_users:
+                tracemalloc.start()
+            _tracemalloc_users += 1
+            tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+    def _stop_tracemalloc(self, start_snapshot) -> dict:
+        """
+        Peak traced memory during the section, and the lines whose retained allocations grew the most.
+        """
+        global _tracemalloc_users
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        current, peak = tracemalloc.get_traced_memory()
+        with _tracemalloc_lock:
+            _tracemalloc_users -= 1
+            if not _tracemalloc_users:
+                tracemalloc.stop()
+
+        grown = [stat for stat in snapshot.compare_to(start_snapshot, "lineno") if stat.size_diff > 0]
+        return {
+            "peak_mb": round(peak / 1024 ** 2, 1),
+            "traced_mb": round(current / 1024 ** 2, 1),
+            "top_allocations": [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                                 "size_kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+                                for stat in grown[:self.top_entries]]
+        }
+
+
+class StackSnapshots:
+    """
+    Periodic sampled stack snapshots of a long-running process (the streaming consumers, replay): every thread is
+    sampled each sample_interval, and every snapshot_interval the counts are written to run_dir/stacks_<time>.folded
+    and reset, so each file is a flame graph of its window.
+    """
+
+    def __init__(self, run_dir: str, sample_interval: float, snapshot_interval: float):
+        self.run_dir = run_dir
+        self.snapshot_interval = snapshot_interval
+        self.sampler = StackSampler(sample_interval)
+        self._stop = threading.Event()
+
+    def start(self):
+        self.sampler.start()
+
+        def run():
+            while not self._stop.wait(self.snapshot_interval):
+                self.write(self.sampler.drain())
+
+        writer = threading.Thread(target=run, name="stack-snapshots", daemon=True)
+        writer.start()
+        self.sampler.ignored.add(writer.ident)
+        logger.info(f"Writing stack snapshots every {self.snapshot_interval}s to: {self.run_dir}")
+        return self
+
+    def write(self, counts: Counter):
+        if counts:
+            write_folded(counts, os.path.join(self.run_dir, f"stacks_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.folded"))
+
+    def stop(self):
+        self._stop.set()
+        self.write(self.sampler.stop())
+
+
+def start_stack_snapshots(profiling_config, run_name: str, cli_value: str = None):
+    """
+    Started StackSnapshots for a streaming process when profiling is requested (by --profile or FRAUD_PROFILE),
+    otherwise None. Only the sampling profiler applies to the streaming loop.
+    """
+    profilers = requested_profilers(cli_value)
+    if not profilers:
+        return None
+    if "sampling" not in profilers:
+        logger.info(f"Profilers {list(profilers)} apply to training stages; the streaming loop is profiled by sampling")
+    run_dir = os.path.join(profiling_config.profile_dir, f"{run_name}_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}")
+    return StackSnapshots(run_dir, profiling_config.sample_interval_seconds,
+                          profiling_config.snapshot_interval_seconds).start()
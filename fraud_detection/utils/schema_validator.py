@@ -0,0 +1,254 @@
+import sys
+import math
+from datetime import date, datetime
+from fraud_detection.exception.exception_handler import CustomException
+from fraud_detection.utils.util import read_yaml_file
+
+TYPES = ("string", "integer", "number", "datetime", "date")
+
+
+def _is_missing(value) -> bool:
+    return value is None or value == "" or (isinstance(value, float) and math.isnan(value))
+
+
+def _is_string(value) -> bool:
+    return isinstance(value, str)
+
+
+def _is_integer(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_datetime(value) -> bool:
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _is_date(value) -> bool:
+    try:
+        date.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+SCALAR_CHECKS = {"string": _is_string, "integer": _is_integer, "number": _is_number,
+                 "datetime": _is_datetime, "date": _is_date}
+
+
+class FieldRule:
+    """
+    Checks for one column: type (or union of types), required, numeric range and allowed values.
+    check() validates a single value; failures() validates a whole pandas column at once.
+    Both produce the same reason strings, e.g. "amt: above maximum 1000000".
+    """
+
+    def __init__(self, name: str, types, required: bool = True, minimum=None, maximum=None, allowed=None):
+        self.name = name
+        self.types = [types] if isinstance(types, str) else list(types)
+        unknown = set(self.types) - set(TYPES)
+        if unknown:
+            raise ValueError(f"{name}: unknown type {sorted(unknown)}, expected one of {TYPES}")
+        self.required = required
+        self.minimum = minimum
+        self.maximum = maximum
+        self.allowed = set(allowed) if allowed is not None else None
+        self._type_checks = [SCALAR_CHECKS[t] for t in self.types]
+        self._numeric = bool({"integer", "number"} & set(self.types))
+        self.reason_missing = f"{name}: missing"
+        self.reason_type = f"{name}: not {' or '.join(self.types)}"
+        self.reason_below = f"{name}: below minimum {minimum}"
+        self.reason_above = f"{name}: above maximum {maximum}"
+        self.reason_allowed = f"{name}: not one of {sorted(self.allowed, key=str)}" if self.allowed is not None else None
+        self.is_valid = self._compile_fast_path()
+
+    @classmethod
+    def from_spec(cls, name: str, spec: dict):
+        return cls(name, spec["type"], required=spec.get("required", True), minimum=spec.get("min"),
+                   maximum=spec.get("max"), allowed=spec.get("allowed"))
+
+    def _compile_fast_path(self):
+        """
+        value -> True for the common, clearly valid case, using exact type tests and one chained comparison.
+        False only means "run the full check", which also works out the reason.
+        """
+        lo = self.minimum if self.minimum is not None else -math.inf
+        hi = self.maximum if self.maximum is not None else math.inf
+        allowed = self.allowed
+        accepted = set()
+        for type_name in self.types:
+            accepted |= {"string": {str}, "integer": {int}, "number": {int, float}}.get(type_name, set())
+        accepted = frozenset(accepted)
+
+        if set(self.types) <= {"datetime", "date"}:
+            return lambda value: False
+        if self._numeric and str not in accepted:
+            if allowed is not None:
+                return lambda value: type(value) in accepted and value in allowed
+            return lambda value: type(value) in accepted and lo <= value <= hi
+        if allowed is not None:
+            return lambda value: type(value) in accepted and value in allowed
+        if int in accepted:
+            # [string, integer] identifiers: any non-empty string or in-range int
+            return lambda value: (type(value) is str and value != "") or (type(value) is int and lo <= value <= hi)
+        return lambda value: type(value) is str and value != ""
+
+    def check(self, value):
+        """
+        Reason the value is invalid, or None.
+        """
+        if self.is_valid(value):
+            return None
+        if _is_missing(value):
+            return self.reason_missing if self.required else None
+        if not any(type_check(value) for type_check in self._type_checks):
+            return self.reason_type
+        if self._numeric and _is_number(value):
+            if self.minimum is not None and value < self.minimum:
+                return self.reason_below
+            if self.maximum is not None and value > self.maximum:
+                return self.reason_above
+        if self.allowed is not None and value not in self.allowed:
+            return self.reason_allowed
+        return None
+
+    def _type_failures(self, series, missing):
+        """
+        Rows whose value matches none of the rule's types, as a boolean mask, plus the column as numbers (or None).
+        """
+        import numpy as np
+        import pandas as pd
+
+        numbers = None
+        bad = np.ones(len(series), dtype=bool)
+        for type_name in self.types:
+            if type_name in ("integer", "number"):
+                numbers = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+                ok = np.isfinite(numbers)
+                if series.dtype == object:
+                    # to_numeric reads True / False as 1 / 0; the scalar check rejects them, so do the same
+                    ok &= ~series.map(lambda value: isinstance(value, bool)).to_numpy(dtype=bool)
+                if type_name == "integer":
+                    ok &= np.mod(numbers, 1, where=ok, out=np.zeros_like(numbers)) == 0
+            elif type_name == "string":
+                if pd.api.types.is_string_dtype(series.dtype) and series.dtype != object:
+                    ok = np.ones(len(series), dtype=bool)
+                elif series.dtype == object:
+                    ok = series.map(_is_string, na_action="ignore").fillna(False).to_numpy(dtype=bool)
+                else:
+                    ok = np.zeros(len(series), dtype=bool)
+            else:
+                parse_format = "%Y-%m-%d" if type_name == "date" else "ISO8601"
+                ok = pd.to_datetime(series, format=parse_format, errors="coerce").notna().to_numpy()
+            bad &= ~ok
+        return bad & ~missing, numbers
+
+    def failures(self, series) -> list:
+        """
+        Vectorised check of a column: list of (boolean row mask, reason) for each kind of failure present.
+        """
+        import numpy as np
+
+        if series is None:
+            return [(None, self.reason_missing)] if self.required else []
+
+        missing = series.isna().to_numpy()
+        if series.dtype == object or str(series.dtype) in ("str", "string"):
+            missing = missing | (series == "").to_numpy(dtype=bool, na_value=False)
+        found = []
+        if self.required and missing.any():
+            found.append((missing, self.reason_missing))
+
+        bad_type, numbers = self._type_failures(series, missing)
+        if bad_type.any():
+            found.append((bad_type, self.reason_type))
+
+        if numbers is not None:
+            valid_numbers = ~missing & ~bad_type & np.isfinite(numbers)
+            if self.minimum is not None:
+                below = valid_numbers & (numbers < self.minimum)
+                if below.any():
+                    found.append((below, self.reason_below))
+            if self.maximum is not None:
+                above = valid_numbers & (numbers > self.maximum)
+                if above.any():
+                    found.append((above, self.reason_above))
+        if self.allowed is not None:
+            not_allowed = ~missing & ~bad_type & ~series.isin(self.allowed).to_numpy()
+            if not_allowed.any():
+                found.append((not_allowed, self.reason_allowed))
+        return found
+
+
+class SchemaValidator:
+    """
+    A schema.yaml section compiled into FieldRules.
+    validate() / validate_records() check decoded messages one by one (a handful of isinstance and comparison
+    calls per field, cheaper than building a frame for a micro-batch); validate_frame() checks a training chunk
+    column by column with pandas.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self._compiled = [(rule.name, rule.is_valid, rule) for rule in rules]
+
+    @classmethod
+    def from_yaml(cls, schema_file: str, section: str = "TRANSACTION_COLUMNS"):
+        try:
+            columns = read_yaml_file(schema_file)[section]
+            return cls([FieldRule.from_spec(name, spec) for name, spec in columns.items()])
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    @property
+    def columns(self) -> list:
+        return [rule.name for rule in self.rules]
+
+    def validate(self, record: dict) -> list:
+        """
+        Reasons the record is invalid; an empty list means it is valid.
+        """
+        if not isinstance(record, dict):
+            return ["record: not an object"]
+        get = record.get
+        reasons = []
+        for name, is_valid, rule in self._compiled:
+            value = get(name)
+            if not is_valid(value):
+                reason = rule.check(value)
+                if reason is not None:
+                    reasons.append(reason)
+        return reasons
+
+    def validate_records(self, records: list) -> list:
+        return [self.validate(record) for record in records]
+
+    def validate_frame(self, df, require: tuple = ()):
+        """
+        Check every row of a frame. require: extra columns that must be present and non-null (e.g. the target).
+        Returns (boolean numpy mask of valid rows, {row position: [reasons]} for the invalid rows).
+        """
+        import numpy as np
+
+        valid = np.ones(len(df), dtype=bool)
+        reasons = {}
+        for rule in self.rules:
+            if rule.name in require and not rule.required:
+                rule = FieldRule(rule.name, rule.types, True, rule.minimum, rule.maximum, rule.allowed)
+            for mask, reason in rule.failures(df[rule.name] if rule.name in df.columns else None):
+                if mask is None:
+                    # Whole column missing: every row fails
+                    mask = np.ones(len(df), dtype=bool)
+                valid &= ~mask
+                for position in np.flatnonzero(mask):
+                    reasons.setdefault(int(position), []).append(reason)
+        return valid, reasons
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+from fraud_detection.exception.exception_handler import CustomException
+
+
+# Code reserved for values that were not seen (or were too rare) at feature engineering time
+UNKNOWN_CODE = 0
+UNKNOWN_VALUE = "__unknown__"
+
+
+class CategoricalVocabulary:
+    """
+    Dictionary encoding for categorical columns.
+    Each column maps its known values to integer codes 1..n; anything else maps to UNKNOWN_CODE.
+    The same artifact is used to encode the training frame and to look up codes when serving.
+    """
+
+    def __init__(self, vocabularies: dict):
+        """
+        vocabularies: dict of column -> list of known values (code = position + 1)
+        """
+        self.vocabularies = {col: list(values) for col, values in vocabularies.items()}
+        self.lookups = {col: {value: code for code, value in enumerate(values, start=1)}
+                        for col, values in self.vocabularies.items()}
+        self.dtypes = {col: self._code_dtype(len(values)) for col, values in self.vocabularies.items()}
+
+    @staticmethod
+    def _code_dtype(size: int):
+        import numpy as np
+
+        if size < np.iinfo(np.int8).max:
+            return np.int8
+        if size < np.iinfo(np.int16).max:
+            return np.int16
+        return np.int32
+
+    @property
+    def columns(self) -> list:
+        return list(self.vocabularies)
+
+    @classmethod
+    def fit(cls, df, columns: list, min_count: int = 1):
+        """
+        Build the vocabulary from a frame. Values seen fewer than min_count times go to the unknown bucket.
+        df: pandas.DataFrame
+        columns: list of categorical column names
+        """
+        try:
+            vocabularies = {}
+            for col in columns:
+                counts = df[col].dropna().astype(str).value_counts()
+                vocabularies[col] = sorted(counts[counts >= min_count].index.tolist())
+            return cls(vocabularies)
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def encode_series(self, col: str, series):
+        """
+        Vectorised encoding of a whole column to compact integer codes.
+        """
+        import numpy as np
+        import pandas as pd
+
+        codes = pd.Categorical(series.astype(str), categories=self.vocabularies[col]).codes.astype(np.int32) + 1
+        # pd.Categorical marks unseen values with -1, which becomes UNKNOWN_CODE after the shift
+        return codes.astype(self.dtypes[col])
+
+    def encode_frame(self, df):
+        """
+        Encode every vocabulary column present in df, in place.
+        """
+        for col in self.vocabularies:
+            if col in df.columns:
+                df[col] = self.encode_series(col, df[col])
+        return df
+
+    def encode_value(self, col: str, value) -> int:
+        """
+        Single-value lookup for the serving path.
+        """
+        return self.lookups[col].get(value, UNKNOWN_CODE)
+
+    def decode_value(self, col: str, code: int) -> str:
+        if code == UNKNOWN_CODE or code > len(self.vocabularies[col]):
+            return UNKNOWN_VALUE
+        return self.vocabularies[col][code - 1]
+
+    def save(self, file_path: str):
+        """
+        Persist the vocabulary as JSON.
+        file_path: str
+        """
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump({"unknown_code": UNKNOWN_CODE, "columns": self.vocabularies}, f)
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        Load a vocabulary saved by CategoricalVocabulary.save.
+        file_path: str
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f)["columns"])
+        except Exception as e:
+            raise CustomException(e, sys) from e
@@ -1,10 +1,38 @@
 # Import the necessary modules
+import argparse
 from fraud_detection.pipeline.training_pipeline import TrainingPipeline
+from fraud_detection.components.stage_07_incremental_training import IncrementalTraining
+from fraud_detection.config.configuration import get_configuration_manager
+from fraud_detection.utils.profiling import Profiler, requested_profilers
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the fraud detection training pipeline")
+    parser.add_argument("--tune", action="store_true",
+                        help="Run the hyperparameter search stage before model training")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Build latency-optimized model variants after evaluation")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only refresh the current model from newly labeled streaming transactions")
+    parser.add_argument("--profile", nargs="?", const="all", default=None,
+                        help="Profile every stage into artifacts/reports/profiles: all (default) or a comma-separated "
+                             "subset of cprofile,sampling,memory (also enabled by the FRAUD_PROFILE env var)")
+    args = parser.parse_args()
+    profilers = requested_profilers(args.profile)
+
+    if args.incremental:
+        print("🔁 Starting Incremental Training...")
+        incremental_training = IncrementalTraining()
+        if profilers:
+            profiler = Profiler.from_config(get_configuration_manager().get_profiling_config(), profilers, "incremental")
+            with profiler.section("incremental_training"):
+                incremental_training.initiate_incremental_training()
+        else:
+            incremental_training.initiate_incremental_training()
+        return
+
     # Start training pipeline
     print("🚀 Starting Training Pipeline...")
-    training_pipeline = TrainingPipeline()
+    training_pipeline = TrainingPipeline(run_tuning=args.tune, run_optimization=args.optimize, profilers=profilers)
     training_pipeline.start_training_pipeline()
 
 if __name__ == "__main__":